@@ -0,0 +1,62 @@
+import argparse
+import time
+from common.CppHeaderUtils import build_include_graph, get_relative_headers_of_modules, INCLUDE_SCAN_ENGINES
+from common.TimeUtils import format_all_time
+
+# 默认的头文件目录（linux x86）
+DEFAULT_INCLUDE_DIRS = [
+    './arch/x86/include',
+    './arch/x86/include/generated',
+    './include',
+    './arch/x86/include/uapi',
+    './arch/x86/include/generated/uapi',
+    './include/uapi',
+    './include/generated/uapi',
+    './include/linux/compiler-version.h',
+    './include/linux/kconfig.h',
+    './include/linux/compiler_types.h'
+]
+
+
+def benchmark_engine(repo_path, modules, include_dirs, engine, rounds):
+    """
+    使用指定的扫描引擎计算模块的头文件闭包，返回最快一轮的耗时和结果
+    """
+    best_time_cost = None
+    for _ in range(rounds):
+        time_start = time.time()
+        include_graph = build_include_graph(repo_path, include_dirs, engine)
+        headers, unexist_headers, _ = get_relative_headers_of_modules(
+            repo_path, modules, include_dirs, include_graph=include_graph)
+        time_cost = time.time() - time_start
+        if best_time_cost is None or time_cost < best_time_cost:
+            best_time_cost = time_cost
+    return best_time_cost, include_graph, headers, unexist_headers
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark the include scan engines on the modules of a C/C++ repository.')
+    parser.add_argument('-r', '--repo', required=True,
+                        help='The path to the C/C++ repository.')
+    parser.add_argument('-m', '--modules', nargs='+', required=True,
+                        help='The modules to be scanned.')
+    parser.add_argument('-d', '--include_dirs', nargs='+', default=DEFAULT_INCLUDE_DIRS,
+                        help='The include directories relative to the repository.')
+    parser.add_argument('-n', '--rounds', type=int, default=3,
+                        help='The number of rounds of each engine, the fastest one is reported.')
+    args = parser.parse_args()
+
+    results = {}
+    for engine in INCLUDE_SCAN_ENGINES:
+        time_cost, include_graph, headers, unexist_headers = benchmark_engine(
+            args.repo, args.modules, args.include_dirs, engine, args.rounds)
+        results[engine] = (set(headers), set(unexist_headers))
+        print(f"[{engine}] time: {format_all_time(time_cost)}, "
+              f"headers: {len(headers)}, unexist_headers: {len(unexist_headers)}")
+        print(f"[{engine}] {include_graph.format_stats_msg()}")
+
+    bytes_headers, _ = results['bytes']
+    regex_headers, _ = results['regex']
+    print(f"headers only found by bytes: {sorted(bytes_headers - regex_headers)}")
+    print(f"headers only found by regex: {sorted(regex_headers - bytes_headers)}")
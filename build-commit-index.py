@@ -0,0 +1,30 @@
+from common.CommitIndex import build_commit_index, get_commit_index_path, DEFAULT_INDEX_REFS
+import argparse
+import os
+from common.Timer import Timer
+
+if __name__ == '__main__':
+    timer = Timer()
+    parser = argparse.ArgumentParser(
+        description='Build or incrementally update the commit index of a Git repository.')
+    parser.add_argument('-r', '--repo', required=True,
+                        help='The path to the Git repository.')
+    parser.add_argument('--ref', action='append', dest='refs',
+                        help='The ref to index, can be repeated. Defaults to HEAD. '
+                             'History queries only use an index that covers HEAD alone.')
+    parser.add_argument('--remove', action='store_true',
+                        help='Remove the commit index, history queries fall back to git log.')
+    args = parser.parse_args()
+
+    index_path = get_commit_index_path(args.repo)
+    if args.remove:
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        print(f"Commit index removed: {index_path}")
+    else:
+        indexed_count, total_count = build_commit_index(args.repo, refs=args.refs or DEFAULT_INDEX_REFS)
+        print(f"Commit index: {index_path}")
+        print(f"New indexed commits: {indexed_count}, total commits: {total_count}")
+
+    timer.end()
+    timer.show_time_cost()
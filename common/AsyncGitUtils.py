@@ -0,0 +1,153 @@
+import os
+import asyncio
+import subprocess
+
+# 默认最多同时运行的 git 进程数
+DEFAULT_MAX_CONCURRENCY = os.cpu_count() or 4
+
+
+async def run_git(repo_path, args, semaphore: asyncio.Semaphore) -> str:
+    """
+    异步运行 git 命令，同时运行的进程数由 semaphore 限制
+    :param repo_path: 仓库路径
+    :param args: git 参数列表
+    :return: 标准输出
+    """
+    async with semaphore:
+        proc = await asyncio.create_subprocess_exec(
+            'git', '-C', repo_path, *args,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        try:
+            stdout, stderr = await proc.communicate()
+        except asyncio.CancelledError:
+            # 被取消时结束 git 进程，避免遗留子进程
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+            raise
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(
+            proc.returncode, ['git', '-C', repo_path, *args],
+            stderr=stderr.decode('utf-8', errors='replace'))
+    return stdout.decode('utf-8', errors='replace')
+
+
+async def gather_or_cancel(coros) -> list:
+    """
+    并发运行多个协程，按顺序返回结果；任意一个出错时取消其余协程并抛出该异常
+    """
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    if not tasks:
+        return []
+    done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    for task in done:
+        if task.exception() is not None:
+            for pending_task in pending:
+                pending_task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            raise task.exception()
+    return [task.result() for task in tasks]
+
+
+async def async_get_commit_count(repo_path, semaphore, ref='HEAD', path=None) -> int:
+    """
+    git rev-list --count <ref> [--full-history -- <path>]，与 GitUtils.get_file_commits 一样不按路径简化历史
+    """
+    args = ['rev-list', '--count', ref]
+    if path is not None:
+        args.extend(['--full-history', '--', path])
+    return int(await run_git(repo_path, args, semaphore))
+
+
+async def async_get_file_commits(repo_path, file_relative_path, semaphore) -> list:
+    """
+    获取文件的提交记录，与 GitUtils.get_file_commits 一致使用 --full-history
+    """
+    stdout = await run_git(repo_path, ['log', '--full-history', '--pretty=format:%H', '--', file_relative_path],
+                           semaphore)
+    return stdout.split()
+
+
+async def async_get_commit_message(repo_path, commit_hash, semaphore):
+    """
+    获取指定提交的提交信息
+    """
+    stdout = await run_git(repo_path, ['log', '--format=%B', '-n', '1', commit_hash], semaphore)
+    return stdout.strip()
+
+
+async def async_get_commit_files(repo_path, commit_hash, semaphore) -> list:
+    """
+    获取指定提交修改的文件
+    """
+    stdout = await run_git(repo_path, ['show', '--name-only', '--pretty=format:', commit_hash], semaphore)
+    return stdout.splitlines()
+
+
+def run_concurrently(make_coro, items, max_concurrency=None) -> list:
+    """
+    在新的事件循环中对每个元素并发运行 make_coro(item, semaphore)，按顺序返回结果
+    :param make_coro: 接受 (元素, semaphore) 并返回协程的函数
+    :param items: 元素列表
+    :param max_concurrency: 最多同时运行的 git 进程数，为None时为 CPU 核数
+    """
+    async def run_all():
+        semaphore = asyncio.Semaphore(max_concurrency or DEFAULT_MAX_CONCURRENCY)
+        return await gather_or_cancel([make_coro(item, semaphore) for item in items])
+
+    return asyncio.run(run_all())
+
+
+def count_each_file_commits(repo_path, file_relative_paths, max_concurrency=None) -> dict:
+    """
+    并发统计每个文件（或目录）各自的提交数，结果与逐个运行 GitUtils.count_file_commits 一致
+    :return: 路径 -> 提交数
+    """
+    counts = run_concurrently(
+        lambda path, semaphore: async_get_commit_count(repo_path, semaphore, path=path),
+        file_relative_paths, max_concurrency)
+    return dict(zip(file_relative_paths, counts))
+
+
+def get_each_file_commits(repo_path, file_relative_paths, max_concurrency=None) -> dict:
+    """
+    并发获取每个文件（或目录）各自的提交记录，结果与逐个运行 GitUtils.get_file_commits 一致
+    :return: 路径 -> 提交记录列表
+    """
+    commits = run_concurrently(
+        lambda path, semaphore: async_get_file_commits(repo_path, path, semaphore),
+        file_relative_paths, max_concurrency)
+    return dict(zip(file_relative_paths, commits))
+
+
+def get_commits_messages(repo_path, commits, max_concurrency=None) -> dict:
+    """
+    并发获取多个提交的提交信息
+    :return: 提交哈希 -> 提交信息
+    """
+    messages = run_concurrently(
+        lambda commit, semaphore: async_get_commit_message(repo_path, commit, semaphore),
+        commits, max_concurrency)
+    return dict(zip(commits, messages))
+
+
+def get_commits_files(repo_path, commits, max_concurrency=None) -> dict:
+    """
+    并发获取多个提交修改的文件
+    :return: 提交哈希 -> 修改的文件列表
+    """
+    files = run_concurrently(
+        lambda commit, semaphore: async_get_commit_files(repo_path, commit, semaphore),
+        commits, max_concurrency)
+    return dict(zip(commits, files))
+
+
+def get_repos_commit_count(repo_paths, max_concurrency=None) -> dict:
+    """
+    并发统计多个仓库的提交数
+    :return: 仓库路径 -> 提交数
+    """
+    counts = run_concurrently(
+        lambda repo_path, semaphore: async_get_commit_count(repo_path, semaphore),
+        repo_paths, max_concurrency)
+    return dict(zip(repo_paths, counts))
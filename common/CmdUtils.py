@@ -1,3 +1,4 @@
+import tempfile
 import subprocess
 
 
@@ -34,3 +35,19 @@ def run_cmd(cmd, stdout_handler, stderr_handler, check=True):
 
         if check and returncode != 0:
             raise subprocess.CalledProcessError(returncode, cmd)
+
+
+def iter_cmd_lines(cmd, **popen_kwargs):
+    """
+    流式运行命令，逐行生成标准输出。
+    标准错误写入临时文件而不是管道，命令输出大量警告时不会因为标准错误的管道写满而阻塞
+    :param popen_kwargs: 传给 subprocess.Popen 的其他参数，如 text=True
+    :raise subprocess.CalledProcessError: 命令返回非 0，stderr 为标准错误的内容
+    """
+    with tempfile.TemporaryFile() as stderr_file:
+        with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file, **popen_kwargs) as proc:
+            yield from proc.stdout
+        if proc.returncode != 0:
+            stderr_file.seek(0)
+            raise subprocess.CalledProcessError(
+                proc.returncode, cmd, stderr=stderr_file.read().decode('utf-8', errors='replace'))
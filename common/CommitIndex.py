@@ -0,0 +1,339 @@
+import os
+import sqlite3
+import subprocess
+from contextlib import contextmanager
+from common.GitLog import iter_commit_records
+
+# 索引文件名
+COMMIT_INDEX_FILE_NAME = 'commit-index.sqlite'
+# 索引覆盖的引用，GitUtils 的查询都从 HEAD 开始，只使用只覆盖 HEAD 的索引
+DEFAULT_INDEX_REFS = ('HEAD',)
+# 索引结构版本，结构改变时旧索引需要重建
+INDEX_SCHEMA_VERSION = 2
+# 每批写入数据库的提交数
+INSERT_BATCH_SIZE = 5000
+# commit_index_batch 期间已经检查过的索引：仓库绝对路径 -> 索引文件路径，索引不可用时为None
+BATCH_INDEX_PATHS = {}
+
+
+def get_commit_index_path(repo_path):
+    """
+    获取仓库的提交索引文件路径，位于仓库 .git 目录下的 git-utils 目录
+    """
+    result = subprocess.run(
+        ['git', '-C', repo_path, 'rev-parse', '--absolute-git-dir'],
+        capture_output=True, text=True, check=True)
+    return os.path.join(result.stdout.strip(), 'git-utils', COMMIT_INDEX_FILE_NAME)
+
+
+def get_index_schema_version(index_path):
+    conn = sqlite3.connect(index_path)
+    try:
+        return conn.execute('PRAGMA user_version').fetchone()[0]
+    finally:
+        conn.close()
+
+
+class CommitIndex:
+    """
+    持久化的提交索引：记录引用可达的所有提交的元信息（父提交数、作者/提交时间、在 git log 中的顺序）以及每个提交修改的路径。
+    索引记录了建立索引时每个引用指向的提交（tip），引用都只是前进时只遍历新增的提交进行增量更新；
+    引用被改写（旧 tip 不再是祖先）或不再被索引时需要重建，重建只在显式调用 update(allow_rebuild=True) 时进行。
+
+    查询的语义与不使用索引的 git 命令一致：
+    提交按 git rev-list <引用> 的顺序排列；
+    路径查询与 git log --full-history -- <path> 一致，合并提交与至少一个父提交在路径上不同时归属该路径（git log -m）；
+    最早提交时间为根提交中最早的提交时间。
+    """
+
+    def __init__(self, repo_path, index_path=None, refs=DEFAULT_INDEX_REFS):
+        """
+        :param repo_path: 仓库路径
+        :param index_path: 索引文件路径，为None时使用仓库 .git 目录下的 git-utils 目录
+        :param refs: 索引覆盖的引用
+        """
+        self.repo_path = repo_path
+        self.index_path = index_path or get_commit_index_path(repo_path)
+        self.refs = tuple(refs)
+        index_dir = os.path.dirname(self.index_path)
+        if not os.path.exists(index_dir):
+            os.makedirs(index_dir)
+        self.conn = sqlite3.connect(self.index_path)
+        if self.conn.execute('PRAGMA user_version').fetchone()[0] != INDEX_SCHEMA_VERSION:
+            # 旧结构的索引直接丢弃，之后由 update 重建
+            self.conn.executescript('''
+                DROP TABLE IF EXISTS meta;
+                DROP TABLE IF EXISTS tips;
+                DROP TABLE IF EXISTS commit_paths;
+                DROP TABLE IF EXISTS paths;
+                DROP TABLE IF EXISTS commits;
+            ''')
+            self.conn.execute(f'PRAGMA user_version = {INDEX_SCHEMA_VERSION}')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS tips (
+                ref TEXT PRIMARY KEY, oid TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS commits (
+                id INTEGER PRIMARY KEY, oid TEXT NOT NULL UNIQUE,
+                seq INTEGER NOT NULL,
+                parent_count INTEGER NOT NULL,
+                author_time INTEGER NOT NULL, committer_time INTEGER NOT NULL,
+                committer_date TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS commits_seq ON commits (seq);
+            CREATE TABLE IF NOT EXISTS paths (
+                id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE);
+            CREATE TABLE IF NOT EXISTS commit_paths (
+                path_id INTEGER NOT NULL, commit_id INTEGER NOT NULL,
+                PRIMARY KEY (path_id, commit_id)) WITHOUT ROWID;
+        ''')
+        self.conn.commit()
+
+    def get_tips(self) -> dict:
+        """
+        :return: 已索引的引用 -> 建立索引时引用指向的提交
+        """
+        return dict(self.conn.execute('SELECT ref, oid FROM tips'))
+
+    def resolve_refs(self) -> dict:
+        """
+        :return: 索引覆盖的引用 -> 引用当前指向的提交，引用不存在时为None
+        """
+        tips = {}
+        for ref in self.refs:
+            result = subprocess.run(
+                ['git', '-C', self.repo_path, 'rev-parse', '--verify', '-q', f'{ref}^{{commit}}'],
+                capture_output=True, text=True)
+            tips[ref] = result.stdout.strip() if result.returncode == 0 else None
+        return tips
+
+    def is_ancestor(self, ancestor, descendant):
+        result = subprocess.run(
+            ['git', '-C', self.repo_path, 'merge-base', '--is-ancestor', ancestor, descendant],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return result.returncode == 0
+
+    def can_update_incrementally(self, old_tips: dict, tips: dict):
+        """
+        已索引的引用都仍被索引，且旧 tip 都是新 tip 的祖先时，索引中的提交都仍然可达，只需要遍历新增的提交
+        """
+        return bool(old_tips) and all(
+            ref in tips and (old_tip == tips[ref] or self.is_ancestor(old_tip, tips[ref]))
+            for ref, old_tip in old_tips.items())
+
+    def clear(self):
+        self.conn.executescript('''
+            DELETE FROM commit_paths;
+            DELETE FROM paths;
+            DELETE FROM commits;
+            DELETE FROM tips;
+        ''')
+
+    def update(self, allow_rebuild=True):
+        """
+        将索引更新到引用当前指向的提交
+        :param allow_rebuild: 不能增量更新时是否重建索引。查询时为False，不能增量更新的索引视为过期，查询改用 git 命令
+        :return: 新索引的提交数；不允许重建且不能增量更新时返回None
+        :raise ValueError: 允许重建但索引覆盖的引用不存在
+        """
+        tips = self.resolve_refs()
+        missing_refs = [ref for ref, tip in tips.items() if tip is None]
+        if missing_refs:
+            if not allow_rebuild:
+                return None
+            raise ValueError(f"Refs {', '.join(missing_refs)} do not exist in {self.repo_path}")
+        old_tips = self.get_tips()
+        if tips == old_tips:
+            return 0
+        if self.can_update_incrementally(old_tips, tips):
+            # 增量更新：只遍历所有旧 tip 都不可达的新提交，再按新 tip 重新计算所有提交的顺序
+            revisions = list(dict.fromkeys(tips.values())) + [f'^{oid}' for oid in dict.fromkeys(old_tips.values())]
+            indexed_count = self._index_commits(revisions)
+            self._reorder_commits(list(dict.fromkeys(tips.values())))
+        elif not allow_rebuild:
+            return None
+        else:
+            self.clear()
+            # 完整遍历的顺序即 git rev-list 的顺序，不需要重新计算
+            indexed_count = self._index_commits(list(dict.fromkeys(tips.values())))
+        self.conn.execute('DELETE FROM tips')
+        self.conn.executemany('INSERT INTO tips (ref, oid) VALUES (?, ?)', tips.items())
+        self.conn.commit()
+        return indexed_count
+
+    def _index_commits(self, revisions):
+        path_ids = {path: path_id for path_id, path in self.conn.execute(
+            'SELECT id, path FROM paths')}
+        next_commit_id, next_seq = self.conn.execute(
+            'SELECT COALESCE(MAX(id), 0) + 1, COALESCE(MAX(seq), 0) + 1 FROM commits').fetchone()
+        commit_rows = []
+        commit_path_rows = []
+        indexed_count = 0
+
+        def flush():
+            self.conn.executemany(
+                'INSERT INTO commits (id, oid, seq, parent_count, author_time, committer_time, committer_date) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)', commit_rows)
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO commit_paths (path_id, commit_id) VALUES (?, ?)', commit_path_rows)
+            commit_rows.clear()
+            commit_path_rows.clear()
+
+        try:
+            for record in iter_commit_records(self.repo_path, revisions, per_parent_files=True):
+                commit_id = next_commit_id
+                next_commit_id += 1
+                commit_rows.append((commit_id, record.oid, next_seq + indexed_count, record.parent_count,
+                                    record.author_time,
+                                    record.committer_time, record.committer_date))
+                indexed_count += 1
+                # git log -m 中同一文件可能与多个父提交都不同，重复的路径由 INSERT OR IGNORE 去重
+                for path in record.files:
+                    path_id = path_ids.get(path)
+                    if path_id is None:
+                        path_id = self.conn.execute(
+                            'INSERT INTO paths (path) VALUES (?)', (path,)).lastrowid
+                        path_ids[path] = path_id
+                    commit_path_rows.append((path_id, commit_id))
+                if len(commit_rows) >= INSERT_BATCH_SIZE:
+                    flush()
+        except subprocess.CalledProcessError:
+            self.conn.rollback()
+            raise
+        flush()
+        return indexed_count
+
+    def _reorder_commits(self, tips):
+        """
+        按 git rev-list <tips> 的顺序重新编号所有提交。
+        增量更新时新提交不一定都排在旧提交之前（如合并了提交时间较早的分支），需要按完整遍历的顺序重新编号
+        """
+        result = subprocess.run(['git', '-C', self.repo_path, 'rev-list', *tips],
+                                capture_output=True, text=True, check=True)
+        self.conn.execute(
+            'CREATE TEMP TABLE IF NOT EXISTS commit_order (oid TEXT PRIMARY KEY, seq INTEGER NOT NULL) WITHOUT ROWID')
+        self.conn.execute('DELETE FROM commit_order')
+        self.conn.executemany('INSERT INTO commit_order (oid, seq) VALUES (?, ?)',
+                              ((oid, seq) for seq, oid in enumerate(result.stdout.split(), 1)))
+        self.conn.execute(
+            'UPDATE commits SET seq = (SELECT o.seq FROM commit_order o WHERE o.oid = commits.oid)')
+        self.conn.execute('DELETE FROM commit_order')
+
+    def count_commits(self):
+        return self.conn.execute('SELECT COUNT(*) FROM commits').fetchone()[0]
+
+    def get_all_commits(self) -> list:
+        """
+        :return: 所有提交，按 git log 的顺序排列
+        """
+        return [row[0] for row in self.conn.execute(
+            'SELECT oid FROM commits ORDER BY seq')]
+
+    def get_path_commits(self, path) -> list:
+        """
+        获取修改过路径（文件或目录）的提交，按 git log 的顺序排列
+        :param path: 归一化的相对路径（不带前置 ./ 和结尾的 /）
+        """
+        # 目录下的文件：path/ <= 文件路径 < path0（'0' 是 '/' 的下一个字符）
+        return [row[0] for row in self.conn.execute(
+            'SELECT c.oid FROM commits c WHERE c.id IN ('
+            'SELECT cp.commit_id FROM commit_paths cp JOIN paths p ON p.id = cp.path_id '
+            'WHERE p.path = ? OR (p.path >= ? AND p.path < ?)) '
+            'ORDER BY c.seq',
+            (path, f'{path}/', f'{path}0'))]
+
+    def get_paths_commits(self, paths) -> list:
+        """
+        获取修改过任一路径的提交，按 git log 的顺序排列
+        :param paths: 归一化的相对路径列表
+        """
+        commit_seqs = {}
+        for path in paths:
+            commit_seqs.update(self.conn.execute(
+                'SELECT c.oid, c.seq FROM commits c '
+                'JOIN commit_paths cp ON cp.commit_id = c.id JOIN paths p ON p.id = cp.path_id '
+                'WHERE p.path = ? OR (p.path >= ? AND p.path < ?)',
+                (path, f'{path}/', f'{path}0')))
+        return sorted(commit_seqs, key=commit_seqs.get)
+
+    def get_earliest_commit_date(self):
+        """
+        与 git log --max-parents=0 一致，取根提交中最早的提交时间，相同时取 git log 中靠前的一个
+        :return: 最早的提交时间字符串（git log %ci 格式），没有提交时返回None
+        """
+        row = self.conn.execute(
+            'SELECT committer_date FROM commits WHERE parent_count = 0 '
+            'ORDER BY committer_time, seq LIMIT 1').fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+        return False
+
+
+def build_commit_index(repo_path, index_path=None, refs=DEFAULT_INDEX_REFS):
+    """
+    建立或更新仓库的提交索引，引用被改写时重建
+    :return: 新索引的提交数, 索引中的提交总数
+    """
+    with CommitIndex(repo_path, index_path, refs) as commit_index:
+        indexed_count = commit_index.update()
+        return indexed_count, commit_index.count_commits()
+
+
+def open_verified_commit_index(repo_path):
+    """
+    打开仓库的提交索引并增量更新到 HEAD 当前指向的提交，需要运行 git rev-parse 获取索引路径和 HEAD
+    :return: (索引文件路径, 打开的索引)；索引不可用时为 (索引文件路径或None, None)
+    """
+    try:
+        index_path = get_commit_index_path(repo_path)
+    except subprocess.CalledProcessError:
+        return None, None
+    if not os.path.exists(index_path) or get_index_schema_version(index_path) != INDEX_SCHEMA_VERSION:
+        return index_path, None
+    commit_index = CommitIndex(repo_path, index_path)
+    if commit_index.update(allow_rebuild=False) is None:
+        commit_index.close()
+        return index_path, None
+    return index_path, commit_index
+
+
+def open_commit_index_if_present(repo_path):
+    """
+    如果仓库已经建立了只覆盖 HEAD 的提交索引，则打开并增量更新到 HEAD 当前指向的提交；
+    没有索引，或索引过期（HEAD 被改写、索引覆盖了其他引用、索引结构已改变）时返回None，由调用方改用 git 命令。
+    查询时从不重建索引，过期的索引需要重新运行 build-commit-index.py。
+    在 commit_index_batch 中调用时不再检查 HEAD，直接打开批次开始时检查过的索引，不运行 git 命令
+    """
+    repo_key = os.path.abspath(repo_path)
+    if repo_key in BATCH_INDEX_PATHS:
+        index_path = BATCH_INDEX_PATHS[repo_key]
+        return CommitIndex(repo_path, index_path) if index_path is not None else None
+    return open_verified_commit_index(repo_path)[1]
+
+
+@contextmanager
+def commit_index_batch(repo_path):
+    """
+    批量查询时只在开始时解析一次 HEAD 并检查索引，批次内的 open_commit_index_if_present 都复用检查结果。
+    批次内 HEAD 不应改变；嵌套的批次复用最外层的检查结果
+    """
+    repo_key = os.path.abspath(repo_path)
+    if repo_key in BATCH_INDEX_PATHS:
+        yield
+        return
+    index_path, commit_index = open_verified_commit_index(repo_path)
+    if commit_index is not None:
+        commit_index.close()
+    BATCH_INDEX_PATHS[repo_key] = index_path if commit_index is not None else None
+    try:
+        yield
+    finally:
+        del BATCH_INDEX_PATHS[repo_key]
@@ -0,0 +1,154 @@
+import heapq
+
+# SHA-1 提交哈希的二进制长度
+DEFAULT_OID_SIZE = 20
+
+
+class CommitSet:
+    """
+    紧凑的提交哈希集合：提交哈希以定长二进制形式按序存放在一块连续的内存中，
+    每个提交只占 20 字节（SHA-256 仓库为 32 字节），而不是一个 40 字符的 str 加上 set 的开销。
+    交集、差集通过对两个有序序列的归并完成，判断是否包含通过二分查找完成
+    """
+    __slots__ = ('data', 'oid_size')
+
+    def __init__(self, data=b'', oid_size=DEFAULT_OID_SIZE):
+        """
+        :param data: 有序、不重复的二进制提交哈希拼接而成的 bytes 或 bytearray（不复制）
+        :param oid_size: 单个提交哈希的字节数
+        """
+        self.data = data if isinstance(data, (bytes, bytearray)) else bytes(data)
+        self.oid_size = oid_size
+
+    @classmethod
+    def from_hex(cls, commits, oid_size=None):
+        """
+        从十六进制提交哈希构建集合，commits 可以是生成器。
+        先按第一个字节把二进制提交哈希追加到 256 个桶中（不为每个提交保留对象），
+        再依次对每个桶排序去重后拼接，峰值内存约为结果大小的两倍
+        :param commits: 十六进制提交哈希的可迭代对象
+        :param oid_size: 单个提交哈希的字节数，为None时根据第一个提交哈希的长度确定
+        """
+        buckets = new_buckets()
+        for commit in commits:
+            if not commit:
+                continue
+            if oid_size is None:
+                oid_size = len(commit) // 2
+            oid = bytes.fromhex(commit)
+            buckets[oid[0]] += oid
+        oid_size = oid_size or DEFAULT_OID_SIZE
+        return cls(sort_buckets(buckets, oid_size), oid_size)
+
+    def __len__(self):
+        return len(self.data) // self.oid_size
+
+    def get_oid(self, index) -> bytes:
+        start = index * self.oid_size
+        return self.data[start:start + self.oid_size]
+
+    def __contains__(self, commit):
+        if isinstance(commit, str):
+            commit = bytes.fromhex(commit)
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self.get_oid(middle) < commit:
+                low = middle + 1
+            else:
+                high = middle
+        return low < len(self) and self.get_oid(low) == commit
+
+    def iter_oids(self):
+        """
+        按序生成二进制提交哈希
+        """
+        return iter_oids(self.data, self.oid_size)
+
+    def __iter__(self):
+        """
+        按序生成十六进制提交哈希
+        """
+        for oid in self.iter_oids():
+            yield oid.hex()
+
+    def intersection(self, other: 'CommitSet') -> 'CommitSet':
+        result = bytearray()
+        left, right = self.iter_oids(), other.iter_oids()
+        left_oid, right_oid = next(left, None), next(right, None)
+        while left_oid is not None and right_oid is not None:
+            if left_oid < right_oid:
+                left_oid = next(left, None)
+            elif left_oid > right_oid:
+                right_oid = next(right, None)
+            else:
+                result += left_oid
+                left_oid, right_oid = next(left, None), next(right, None)
+        return CommitSet(result, self.oid_size)
+
+    def difference(self, other: 'CommitSet') -> 'CommitSet':
+        result = bytearray()
+        left, right = self.iter_oids(), other.iter_oids()
+        left_oid, right_oid = next(left, None), next(right, None)
+        while left_oid is not None:
+            if right_oid is None or left_oid < right_oid:
+                result += left_oid
+                left_oid = next(left, None)
+            elif left_oid > right_oid:
+                right_oid = next(right, None)
+            else:
+                left_oid, right_oid = next(left, None), next(right, None)
+        return CommitSet(result, self.oid_size)
+
+    def union(self, other: 'CommitSet') -> 'CommitSet':
+        result = bytearray()
+        for oid in unique_sorted(heapq.merge(self.iter_oids(), other.iter_oids())):
+            result += oid
+        return CommitSet(result, self.oid_size)
+
+    __and__ = intersection
+    __sub__ = difference
+    __or__ = union
+
+    def __eq__(self, other):
+        return isinstance(other, CommitSet) and self.data == other.data
+
+    def __repr__(self):
+        return f"CommitSet({len(self)} commits)"
+
+
+def new_buckets() -> list:
+    """
+    按第一个字节分组的 256 个桶，定长记录追加到 buckets[record[0]] 中
+    """
+    return [bytearray() for _ in range(256)]
+
+
+def sort_buckets(buckets, record_size) -> bytearray:
+    """
+    依次对每个桶中的定长记录排序去重后拼接，得到整体有序、不重复的记录。
+    处理完的桶会被释放，峰值内存约为结果大小的两倍
+    :param buckets: new_buckets() 创建的桶
+    :param record_size: 单条记录的字节数
+    """
+    data = bytearray()
+    for i, bucket in enumerate(buckets):
+        data += b''.join(sorted(set(iter_oids(bytes(bucket), record_size))))
+        buckets[i] = None
+    return data
+
+
+def iter_oids(data, oid_size):
+    for start in range(0, len(data), oid_size):
+        yield data[start:start + oid_size]
+
+
+def unique_sorted(oids):
+    """
+    对有序序列去重
+    """
+    previous = None
+    for oid in oids:
+        if oid != previous:
+            yield oid
+            previous = oid
@@ -1,8 +1,14 @@
 import os
 import re
+import mmap
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from bisect import bisect_right
 from typing import Set, Tuple
 from tqdm import tqdm
-from common.GitUtils import get_file_commits, get_commit_diff
+from common.CmdUtils import iter_cmd_lines
+from common.GitUtils import list_tree_files, get_worktree_blob_oids, GitObjectReader
+from common.IncludeCache import IncludeCache, open_include_cache
 from common.Timer import Timer
 
 
@@ -63,107 +69,565 @@ def generate_include_header_regex():
     return re.compile(include_pattern)
 
 
-def find_all_headers(file_path, include_dirs) -> Tuple[Set[str], Set[str]]:
+# 超过该大小（字节）的文件使用 mmap 读取
+MMAP_THRESHOLD = 64 * 1024
+
+# 字节级扫描使用的正则：块注释、行注释、字符串/字符字面量，其中只有块注释会被记录下来，
+# 其余两种只是为了避免把其中的 /* 误认为块注释的开始（不使用分组，以保留正则的前缀字符优化）
+COMMENT_PATTERN = re.compile(
+    rb'/\*[^*]*\*+(?:[^/*][^*]*\*+)*/'
+    rb'|//[^\n]*'
+    rb'|"[^"\\\n]*(?:\\.[^"\\\n]*)*"'
+    rb"|'[^'\\\n]*(?:\\.[^'\\\n]*)*'")
+# 预处理指令，# 与指令之间允许有空白，是否位于行首在扫描时检查
+DIRECTIVE_PATTERN = re.compile(
+    rb'#[ \t]*(?:include[ \t]*[<"]([^">\n]+)[">]'
+    rb'|(ifdef|ifndef|if|elif|else|endif)\b([^\n/]*))')
+
+
+def scan_include_names_regex(file_path) -> list:
     """
-    递归查找给定C/C++源文件所包含的所有头文件。
-    只处理绝对路径，返回的也都是绝对路径
+    扫描文件中 #include 的头文件名，不做路径解析。
+    以 utf-8 解码整个文件后用正则匹配，不区分注释和 #if 0 区域。
 
-    :param file_path: C/C++源文件的绝对路径。
-    :param include_dirs: 需要搜索头文件的目录列表。
-    :return: headers, unexist_headers
+    :param file_path: 文件的绝对路径。
+    :return: 按出现顺序排列的头文件名列表。
     """
-    headers = set()
-    unexist_headers = set()
-    include_pattern = generate_include_header_regex()
+    with open(file_path, 'r', encoding='utf-8') as file:
+        return generate_include_header_regex().findall(file.read())
 
-    for dir in include_dirs:
-        # dir 是文件路径
-        if os.path.isfile(dir):
-            headers.add(dir)
+
+def find_block_comment_spans(content) -> Tuple[list, list]:
+    """
+    查找所有块注释的位置。
+
+    :param content: 文件内容，bytes 或 mmap 等支持 buffer 协议的对象。
+    :return: 块注释起始位置列表, 块注释结束位置列表（均为升序）
+    """
+    starts = []
+    ends = []
+    for match in COMMENT_PATTERN.finditer(content):
+        start, end = match.span()
+        # 以 /* 开头的才是块注释
+        if content[start + 1] == 0x2A:
+            starts.append(start)
+            ends.append(end)
+    return starts, ends
+
+
+def scan_include_names_from_bytes(content) -> list:
+    """
+    从原始字节内容中扫描 #include 的头文件名。
+    只识别位于行首（允许前置空白）的预处理指令，跳过块注释、行注释和 #if 0 区域。
+
+    :param content: 文件内容，bytes 或 mmap 等支持 buffer 协议的对象。
+    :return: 按出现顺序排列的头文件名列表。
+    """
+    directives = []
+    for match in DIRECTIVE_PATTERN.finditer(content):
+        pos = match.start()
+        if pos and content[pos - 1] != 0x0A:
+            line_start = content.rfind(b'\n', 0, pos) + 1
+            if content[line_start:pos].strip():
+                continue
+        directives.append(match)
+    if not directives:
+        return []
+
+    comment_starts, comment_ends = find_block_comment_spans(content) \
+        if content.find(b'/*') != -1 else ([], [])
+    include_names = []
+    # 处于 #if 0 区域中的嵌套层数，为 0 表示不在该区域中
+    skip_depth = 0
+    for match in directives:
+        pos = match.start()
+        index = bisect_right(comment_starts, pos) - 1
+        if index >= 0 and pos < comment_ends[index]:
             continue
+        include_name, cond, cond_arg = match.groups()
+        if include_name is not None:
+            if not skip_depth:
+                include_names.append(os.fsdecode(include_name))
+        elif skip_depth:
+            if cond in (b'if', b'ifdef', b'ifndef'):
+                skip_depth += 1
+            elif cond == b'endif':
+                skip_depth -= 1
+            elif skip_depth == 1:
+                # #if 0 对应的 #else / #elif
+                skip_depth = 0
+        elif cond == b'if' and cond_arg.strip() == b'0':
+            skip_depth = 1
+    return include_names
+
+
+def scan_include_names_bytes(file_path) -> list:
+    """
+    扫描文件中 #include 的头文件名，不做路径解析。
+    直接处理原始字节，不要求文件是 utf-8 编码，较大的文件使用 mmap 读取。
+
+    :param file_path: 文件的绝对路径。
+    :return: 按出现顺序排列的头文件名列表。
+    """
+    with open(file_path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0:
+            return []
+        if size < MMAP_THRESHOLD:
+            return scan_include_names_from_bytes(file.read())
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as content:
+            return scan_include_names_from_bytes(content)
+
+
+def scan_include_names_from_text(content) -> list:
+    """
+    以 utf-8 解码原始字节内容后用正则匹配 #include 的头文件名，与 scan_include_names_regex 一致。
+    """
+    return generate_include_header_regex().findall(content.decode('utf-8'))
+
 
-    def get_header_path(header_name):
+# 头文件名扫描引擎：引擎名 -> (按文件路径扫描, 按文件内容扫描)
+INCLUDE_SCAN_ENGINES = {
+    'bytes': (scan_include_names_bytes, scan_include_names_from_bytes),
+    'regex': (scan_include_names_regex, scan_include_names_from_text),
+}
+DEFAULT_INCLUDE_SCAN_ENGINE = 'bytes'
+
+
+def scan_include_names(file_path, engine=DEFAULT_INCLUDE_SCAN_ENGINE) -> list:
+    """
+    扫描文件中 #include 的头文件名，不做路径解析。
+
+    :param file_path: 文件的绝对路径。
+    :param engine: 扫描引擎，见 INCLUDE_SCAN_ENGINES。
+    :return: 按出现顺序排列的头文件名列表。
+    """
+    return INCLUDE_SCAN_ENGINES[engine][0](file_path)
+
+
+class WorkingTreeSource:
+    """
+    工作区中的文件，解析头文件时默认使用的文件来源。
+    """
+
+    def __init__(self, repo_path=None):
         """
-        在指定的目录列表中查找头文件的路径。
+        :param repo_path: 仓库路径，用于获取文件的 blob 哈希，为None时不提供 blob 哈希。
+        """
+        self.repo_path = normalize_path(
+            os.path.abspath(repo_path)) if repo_path else None
+        # 文件相对路径 -> blob 哈希，首次使用时加载
+        self.blob_oids = None
 
-        :param header_name: 头文件名。
-        :return: 头文件的绝对路径，如果未找到则返回None。
+    def get_blob_oid(self, file_path):
         """
-        for dir in include_dirs:
-            header_path = os.path.join(dir, header_name)
-            if os.path.exists(header_path):
-                return os.path.abspath(header_path)
-        return None
+        获取文件的 blob 哈希，未跟踪或已修改的文件返回None。
+        """
+        if self.repo_path is None:
+            return None
+        if self.blob_oids is None:
+            self.blob_oids = get_worktree_blob_oids(self.repo_path)
+        file_path = normalize_path(os.path.abspath(file_path))
+        if not file_path.startswith(self.repo_path + '/'):
+            return None
+        return self.blob_oids.get(file_path[len(self.repo_path) + 1:])
+
+    def is_file(self, path):
+        return os.path.isfile(path)
 
-    def parse_file(file_path):
+    def is_dir(self, path):
+        return os.path.isdir(path)
+
+    def exists(self, path):
+        return os.path.exists(path)
+
+    def walk_files(self, dir):
+        """
+        遍历目录下（包括子目录）的所有文件，返回归一化的路径。
         """
-        解析文件内容，递归处理每个包含的头文件。
+        for root, _, files in os.walk(dir):
+            root = normalize_path(root)
+            for file in files:
+                yield f"{root}/{file}"
+
+    def scan_include_names(self, file_path, engine=DEFAULT_INCLUDE_SCAN_ENGINE) -> list:
+        return scan_include_names(file_path, engine)
+
+    def close(self):
+        pass
+
 
-        :param file_path: 文件的绝对路径。
+class RevisionSource:
+    """
+    仓库指定版本的树中的文件。
+    通过 git ls-tree 列出文件，通过常驻的 git cat-file --batch 进程读取文件内容，不需要检出该版本。
+    路径与工作区一样使用 <仓库绝对路径>/<相对路径> 的形式，因此可以直接替换 WorkingTreeSource。
+    """
+
+    def __init__(self, repo_path, revision):
         """
-        file_path = normalize_path(file_path)
-        if not os.path.exists(file_path) or file_path in headers:
+        :param repo_path: 仓库路径。
+        :param revision: 版本，如提交哈希、分支名、标签名。
+        """
+        self.repo_path = normalize_path(os.path.abspath(repo_path))
+        self.revision = revision
+        # 文件相对路径 -> blob 哈希
+        self.files = list_tree_files(repo_path, revision)
+        self.dirs = {''}
+        for file_path in self.files:
+            dir = os.path.dirname(file_path)
+            while dir not in self.dirs:
+                self.dirs.add(dir)
+                dir = os.path.dirname(dir)
+        self.reader = None
+
+    def __getstate__(self):
+        # cat-file 进程不能跨进程传递，在子进程中按需重新创建
+        state = self.__dict__.copy()
+        state['reader'] = None
+        return state
+
+    def _to_relative(self, path):
+        path = normalize_path(os.path.abspath(path))
+        if path == self.repo_path:
+            return ''
+        if path.startswith(self.repo_path + '/'):
+            return path[len(self.repo_path) + 1:]
+        return None
+
+    def is_file(self, path):
+        return self._to_relative(path) in self.files
+
+    def is_dir(self, path):
+        return self._to_relative(path) in self.dirs
+
+    def exists(self, path):
+        relative_path = self._to_relative(path)
+        return relative_path in self.files or relative_path in self.dirs
+
+    def walk_files(self, dir):
+        """
+        遍历目录下（包括子目录）的所有文件，返回归一化的绝对路径。
+        """
+        relative_dir = self._to_relative(dir)
+        if relative_dir not in self.dirs:
             return
-        headers.add(file_path)
-        with open(file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-            for match in include_pattern.findall(content):
-                header_path = get_header_path(match)
-                if header_path:
-                    parse_file(header_path)
-                else:
-                    unexist_headers.add(match)
+        prefix = f"{relative_dir}/" if relative_dir else ''
+        for file_path in self.files:
+            if file_path.startswith(prefix):
+                yield f"{self.repo_path}/{file_path}"
+
+    def get_blob_oid(self, file_path):
+        return self.files.get(self._to_relative(file_path))
+
+    def read_file(self, file_path) -> bytes:
+        if self.reader is None:
+            self.reader = GitObjectReader(self.repo_path)
+        return self.reader.read_blob(self.files[self._to_relative(file_path)])
 
-    parse_file(file_path)
-    return headers, unexist_headers
+    def scan_include_names(self, file_path, engine=DEFAULT_INCLUDE_SCAN_ENGINE) -> list:
+        return INCLUDE_SCAN_ENGINES[engine][1](self.read_file(file_path))
 
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
 
-def find_src_include_headers(file_path, include_dirs) -> Tuple[Set[str], Set[str]]:
+
+# 进程池中每个子进程使用的文件来源，由 init_scan_worker 设置
+SCAN_WORKER_SOURCE = None
+
+
+def init_scan_worker(file_source):
+    global SCAN_WORKER_SOURCE
+    SCAN_WORKER_SOURCE = file_source
+
+
+def scan_include_names_in_worker(file_path, engine=DEFAULT_INCLUDE_SCAN_ENGINE) -> list:
     """
-    查找给定C/C++源文件所包含的所有头文件，不进行递归查找。
-    只处理绝对路径，返回的也都是绝对路径
+    在进程池的子进程中扫描文件中 #include 的头文件名。
+    定义在模块顶层，以便在进程池中调用。
+    """
+    return SCAN_WORKER_SOURCE.scan_include_names(file_path, engine)
 
-    :param file_path: C/C++源文件的绝对路径。
-    :param include_dirs: 需要搜索头文件的目录列表。
-    :return: 包含所有需要的头文件绝对路径的集合。
+
+class IncludePathIndex:
+    """
+    头文件搜索路径索引。
+    每次运行只构建一次，按 include_dirs 的搜索顺序建立 "include 相对名 -> 头文件绝对路径" 的映射，
+    并对找不到的头文件名做负缓存，避免每个 #include 都在每个目录下重复调用 os.path.exists。
     """
-    headers = set()
-    unexist_headers = set()
-    include_pattern = generate_include_header_regex()
 
-    for dir in include_dirs:
-        # dir 是文件路径
-        if os.path.isfile(dir):
-            headers.add(dir)
-            continue
+    def __init__(self, include_dirs, file_source=None):
+        """
+        :param include_dirs: 需要搜索头文件的目录列表（绝对路径），其中的文件路径会被视为强制包含的头文件。
+        :param file_source: 文件来源，为None时使用工作区（WorkingTreeSource）。
+        """
+        self.file_source = file_source if file_source is not None else WorkingTreeSource()
+        self.include_dirs = [normalize_path(dir) for dir in include_dirs]
+        # include_dirs 中直接给出的文件
+        self.forced_headers = []
+        # include 相对名 -> 头文件绝对路径
+        self.header_paths = {}
+        # 已确认找不到的头文件名
+        self.unresolved_names = set()
+        self.probe_count = 0
+        for dir in self.include_dirs:
+            if self.file_source.is_file(dir):
+                self.forced_headers.append(dir)
+            elif self.file_source.is_dir(dir):
+                self._index_dir(dir)
+
+    def _index_dir(self, dir):
+        abs_dir = normalize_path(os.path.abspath(dir))
+        prefix_len = len(abs_dir) + 1
+        for header_path in self.file_source.walk_files(abs_dir):
+            # 先出现的目录优先，与逐个目录查找的顺序保持一致
+            self.header_paths.setdefault(header_path[prefix_len:], header_path)
+
+    def _probe(self, header_name):
+        """
+        逐个目录查找头文件，用于索引中没有的名字（如带 .. 的相对路径、符号链接目录下的文件）。
+        """
+        for dir in self.include_dirs:
+            self.probe_count += 1
+            header_path = normalize_path(
+                os.path.abspath(os.path.join(dir, header_name)))
+            if self.file_source.exists(header_path):
+                return header_path
+        return None
 
-    def get_header_path(header_name):
+    def resolve(self, header_name):
         """
-        在指定的目录列表中查找头文件的路径。
+        在索引中查找头文件的路径。
 
-        :param header_name: 头文件名。
+        :param header_name: 头文件名，即 #include 中的名字。
         :return: 头文件的绝对路径，如果未找到则返回None。
         """
-        for dir in include_dirs:
-            header_path = os.path.join(dir, header_name)
-            if os.path.exists(header_path):
-                return os.path.abspath(header_path)
-        return None
+        header_path = self.header_paths.get(header_name)
+        if header_path is not None:
+            return header_path
+        if header_name in self.unresolved_names:
+            return None
+        header_path = self._probe(header_name)
+        if header_path is None:
+            self.unresolved_names.add(header_name)
+        else:
+            self.header_paths[header_name] = header_path
+        return header_path
 
-    file_path = normalize_path(file_path)
-    if not os.path.exists(file_path) or file_path in headers:
-        return
-    headers.add(file_path)
-    with open(file_path, 'r', encoding='utf-8') as file:
-        content = file.read()
-        for match in include_pattern.findall(content):
-            header_path = get_header_path(match)
+
+class IncludeGraph:
+    """
+    头文件包含关系图，节点为文件，边为解析成功的 #include。
+    图是惰性构建的，一次运行中每个文件只解析一次，各个源文件的头文件闭包都基于缓存的图计算。
+    """
+
+    def __init__(self, include_index: IncludePathIndex, engine=DEFAULT_INCLUDE_SCAN_ENGINE,
+                 include_cache: IncludeCache = None):
+        """
+        :param include_index: 头文件搜索路径索引。
+        :param engine: 头文件名扫描引擎，见 INCLUDE_SCAN_ENGINES。
+        :param include_cache: 持久化的头文件名缓存，为None时不使用缓存。关闭图时一并关闭。
+        """
+        if engine not in INCLUDE_SCAN_ENGINES:
+            raise ValueError(f"Unknown include scan engine: {engine}")
+        self.include_index = include_index
+        self.file_source = include_index.file_source
+        self.engine = engine
+        self.include_cache = include_cache
+        # 文件绝对路径 -> 包含的头文件绝对路径列表
+        self.edges = {}
+        # 文件绝对路径 -> 找不到的头文件名列表
+        self.unresolved_edges = {}
+        self.parse_count = 0
+        self.hit_count = 0
+
+    def add_file(self, file_path, include_names):
+        """
+        解析文件中的头文件名，记录该文件的所有出边。
+
+        :param file_path: 文件的绝对路径（已归一化）。
+        :param include_names: 文件中 #include 的头文件名列表。
+        """
+        self.parse_count += 1
+        includes = []
+        unresolved = []
+        for include_name in include_names:
+            header_path = self.include_index.resolve(include_name)
             if header_path:
-                header_path = normalize_path(header_path)
-                headers.add(header_path)
+                includes.append(header_path)
             else:
-                unexist_headers.add(match)
-    return headers, unexist_headers
+                unresolved.append(include_name)
+        self.edges[file_path] = includes
+        self.unresolved_edges[file_path] = unresolved
+
+    def get_cached_include_names(self, file_path):
+        """
+        从持久化缓存中获取文件的头文件名列表，未命中时返回None。
+
+        :return: include_names, blob_oid
+        """
+        if self.include_cache is None:
+            return None, None
+        blob_oid = self.file_source.get_blob_oid(file_path)
+        if blob_oid is None:
+            return None, None
+        return self.include_cache.get(blob_oid, self.engine), blob_oid
+
+    def parse_file(self, file_path):
+        """
+        解析文件内容，记录该文件的所有出边。
+
+        :param file_path: 文件的绝对路径（已归一化）。
+        """
+        include_names, blob_oid = self.get_cached_include_names(file_path)
+        if include_names is None:
+            include_names = self.file_source.scan_include_names(
+                file_path, self.engine)
+            if blob_oid is not None:
+                self.include_cache.put(blob_oid, self.engine, include_names)
+        self.add_file(file_path, include_names)
+
+    def prefetch(self, file_paths, recursive=True, workers=None):
+        """
+        使用进程池并行解析文件，按层扩展直到没有新文件，结果合并到当前图中。
+        解析得到的图与顺序解析完全一致，之后的闭包计算全部命中缓存。
+
+        :param file_paths: 根文件的绝对路径列表。
+        :param recursive: 是否继续解析根文件所包含的头文件。
+        :param workers: 进程数，为None时使用CPU核数。
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+        frontier = []
+        for file_path in file_paths:
+            file_path = normalize_path(file_path)
+            if file_path not in self.edges and self.file_source.exists(file_path) \
+                    and file_path not in self.include_index.forced_headers:
+                frontier.append(file_path)
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_scan_worker,
+                                 initargs=(self.file_source,)) as executor:
+            while frontier:
+                # 去重并排序，保证每层的解析顺序确定
+                frontier = sorted(set(frontier))
+                # 命中持久化缓存的文件不需要交给进程池解析
+                layer = {}
+                uncached = []
+                for file_path in frontier:
+                    include_names, blob_oid = self.get_cached_include_names(
+                        file_path)
+                    if include_names is None:
+                        uncached.append((file_path, blob_oid))
+                    else:
+                        layer[file_path] = include_names
+                chunksize = len(uncached) // (workers * 4) + 1
+                results = executor.map(
+                    partial(scan_include_names_in_worker, engine=self.engine),
+                    [file_path for file_path, _ in uncached], chunksize=chunksize)
+                for (file_path, blob_oid), include_names in zip(uncached, results):
+                    layer[file_path] = include_names
+                    if blob_oid is not None:
+                        self.include_cache.put(
+                            blob_oid, self.engine, include_names)
+                next_frontier = []
+                for file_path in frontier:
+                    self.add_file(file_path, layer[file_path])
+                    next_frontier.extend(self.edges[file_path])
+                if not recursive:
+                    break
+                frontier = [file_path for file_path in next_frontier
+                            if file_path not in self.edges
+                            and file_path not in self.include_index.forced_headers]
+
+    def get_includes(self, file_path) -> Tuple[list, list]:
+        """
+        获取文件直接包含的头文件，已解析过的文件直接使用缓存。
+
+        :param file_path: 文件的绝对路径（已归一化）。
+        :return: includes, unresolved_includes
+        """
+        if file_path in self.edges:
+            self.hit_count += 1
+        else:
+            self.parse_file(file_path)
+        return self.edges[file_path], self.unresolved_edges[file_path]
+
+    def get_closure(self, file_path, recursive=True) -> Tuple[Set[str], Set[str]]:
+        """
+        计算文件的头文件闭包。
+
+        :param file_path: C/C++源文件的绝对路径。
+        :param recursive: 是否递归查找头文件所包含的头文件。
+        :return: headers, unexist_headers
+        """
+        headers = set(self.include_index.forced_headers)
+        unexist_headers = set()
+        file_path = normalize_path(file_path)
+        if not self.file_source.exists(file_path) or file_path in headers:
+            return headers, unexist_headers
+        headers.add(file_path)
+        worklist = [file_path]
+        while worklist:
+            includes, unresolved = self.get_includes(worklist.pop())
+            unexist_headers.update(unresolved)
+            for header_path in includes:
+                if header_path in headers:
+                    continue
+                headers.add(header_path)
+                if recursive:
+                    worklist.append(header_path)
+        return headers, unexist_headers
+
+    def get_hit_ratio(self):
+        total = self.parse_count + self.hit_count
+        return self.hit_count / total if total else 0.0
+
+    def format_stats_msg(self):
+        msg = f"Include graph: parsed files: {self.parse_count}, " \
+              f"cache hits: {self.hit_count}, " \
+              f"hit ratio: {self.get_hit_ratio():.2%}"
+        if self.include_cache is not None:
+            msg += f"\n{self.include_cache.format_stats_msg()}"
+        return msg
+
+    def close(self):
+        """
+        释放文件来源占用的资源（如 git cat-file 进程），并写回持久化缓存
+        """
+        self.file_source.close()
+        if self.include_cache is not None:
+            self.include_cache.close()
+
+
+def find_all_headers(file_path, include_dirs, include_graph: IncludeGraph = None) -> Tuple[Set[str], Set[str]]:
+    """
+    递归查找给定C/C++源文件所包含的所有头文件。
+    只处理绝对路径，返回的也都是绝对路径
+
+    :param file_path: C/C++源文件的绝对路径。
+    :param include_dirs: 需要搜索头文件的目录列表。
+    :param include_graph: 头文件包含关系图，为None时根据 include_dirs 构建。
+    :return: headers, unexist_headers
+    """
+    if include_graph is None:
+        include_graph = IncludeGraph(IncludePathIndex(include_dirs))
+    return include_graph.get_closure(file_path, recursive=True)
+
+
+def find_src_include_headers(file_path, include_dirs, include_graph: IncludeGraph = None) -> Tuple[Set[str], Set[str]]:
+    """
+    查找给定C/C++源文件所包含的所有头文件，不进行递归查找。
+    只处理绝对路径，返回的也都是绝对路径
+
+    :param file_path: C/C++源文件的绝对路径。
+    :param include_dirs: 需要搜索头文件的目录列表。
+    :param include_graph: 头文件包含关系图，为None时根据 include_dirs 构建。
+    :return: 包含所有需要的头文件绝对路径的集合。
+    """
+    if include_graph is None:
+        include_graph = IncludeGraph(IncludePathIndex(include_dirs))
+    return include_graph.get_closure(file_path, recursive=False)
 
 
 def param_process(repo_path, cpp_file_relative_path, include_dirs_relative_pahts):
@@ -178,91 +642,167 @@ def param_process(repo_path, cpp_file_relative_path, include_dirs_relative_pahts
     return cpp_file_path, include_dirs
 
 
-def get_abs_headers(repo_path, cpp_file_relative_path, include_dirs_relative_pahts, shouldRecursion=True) -> Tuple[Set[str], Set[str]]:
+def build_include_graph(repo_path, include_dirs_relative_pahts,
+                        engine=DEFAULT_INCLUDE_SCAN_ENGINE, revision=None,
+                        use_cache=False, cache_dir=None) -> IncludeGraph:
+    """
+    根据仓库路径和头文件目录的相对路径构建头文件包含关系图，一次运行只需构建一次。
+    :param engine: 头文件名扫描引擎，见 INCLUDE_SCAN_ENGINES
+    :param revision: 解析指定版本（提交哈希、分支名等）的文件，不需要检出；为None时解析工作区的文件
+    :param use_cache: 是否使用以 blob 哈希为键的持久化头文件名缓存
+    :param cache_dir: 缓存目录，为None时使用仓库 .git 目录下的 git-utils 目录
+    """
+    include_dirs = [normalize_path(os.path.join(repo_path, dir))
+                    for dir in include_dirs_relative_pahts]
+    file_source = RevisionSource(
+        repo_path, revision) if revision else WorkingTreeSource(repo_path)
+    include_cache = open_include_cache(
+        repo_path, cache_dir) if use_cache else None
+    return IncludeGraph(IncludePathIndex(include_dirs, file_source), engine, include_cache)
+
+
+def get_abs_headers(repo_path, cpp_file_relative_path, include_dirs_relative_pahts, shouldRecursion=True,
+                    include_graph: IncludeGraph = None) -> Tuple[Set[str], Set[str]]:
     cpp_file_path, include_dirs = param_process(
         repo_path, cpp_file_relative_path, include_dirs_relative_pahts)
     if shouldRecursion:
-        return find_all_headers(cpp_file_path, include_dirs)
+        return find_all_headers(cpp_file_path, include_dirs, include_graph)
     else:
-        return find_src_include_headers(cpp_file_path, include_dirs)
+        return find_src_include_headers(cpp_file_path, include_dirs, include_graph)
 
 
-def get_relative_headers(repo_path, cpp_file_relative_path, include_dirs_relative_pahts, shouldRecursion=True) -> Tuple[list[str], list[str]]:
+def get_relative_headers(repo_path, cpp_file_relative_path, include_dirs_relative_pahts, shouldRecursion=True,
+                         include_graph: IncludeGraph = None) -> Tuple[list[str], list[str]]:
     headers, unexist_headers = get_abs_headers(
-        repo_path, cpp_file_relative_path, include_dirs_relative_pahts, shouldRecursion)
+        repo_path, cpp_file_relative_path, include_dirs_relative_pahts, shouldRecursion, include_graph)
     headers = convert_to_relative_path(repo_path, headers)
     return headers, list(unexist_headers)
 
 
-def get_relative_headers_of_files(repo_path, cpp_files, include_dirs_relative_pahts, shouldRecursion=True) -> Tuple[list[str], list[str]]:
-    headers_set = set()
-    unexist_headers_set = set()
-    for cpp_file in cpp_files:
-        headers, unexist_headers = get_relative_headers(
-            repo_path, cpp_file, include_dirs_relative_pahts, shouldRecursion)
-        headers_set.update(headers)
-        unexist_headers_set.update(unexist_headers)
-    return list(headers_set), list(unexist_headers_set)
-
-
-def get_relative_headers_of_modules(repo_path, modules, include_dirs_relative_pahts, shouldRecursion=True) -> Tuple[list[str], list[str], list[str]]:
+def get_relative_headers_of_files(repo_path, cpp_files, include_dirs_relative_pahts, shouldRecursion=True,
+                                  include_graph: IncludeGraph = None,
+                                  parallel=False, workers=None, revision=None) -> Tuple[list[str], list[str]]:
     """
-    :return: headers, unexist_headers, cpp_files
+    :param parallel: 是否使用进程池并行解析文件
+    :param workers: 进程数，为None时使用CPU核数
+    :param revision: 解析指定版本的文件，不需要检出；为None时解析工作区的文件。传入 include_graph 时忽略
+    :return: headers, unexist_headers
     """
-    headers_set = set()
-    unexist_headers_set = set()
-    cpp_files_set = set()
-    for module in modules:
-        module_path = os.path.join(repo_path, module)
-        # 获取模块下的所有C/CPP文件的相对路径
-        cpp_files = [os.path.relpath(os.path.join(root, file), repo_path) for root, _, files in os.walk(
-            module_path) for file in files if file.endswith('.c') or file.endswith('.cpp')]
+    should_close_graph = include_graph is None
+    if include_graph is None:
+        include_graph = build_include_graph(
+            repo_path, include_dirs_relative_pahts, revision=revision)
+    try:
+        if parallel:
+            include_graph.prefetch(
+                [os.path.join(repo_path, cpp_file) for cpp_file in cpp_files],
+                recursive=shouldRecursion, workers=workers)
+        headers_set = set()
+        unexist_headers_set = set()
         for cpp_file in cpp_files:
-            cpp_files_set.add(cpp_file)
             headers, unexist_headers = get_relative_headers(
-                repo_path, cpp_file, include_dirs_relative_pahts, shouldRecursion)
+                repo_path, cpp_file, include_dirs_relative_pahts, shouldRecursion, include_graph)
             headers_set.update(headers)
             unexist_headers_set.update(unexist_headers)
-    return list(headers_set), list(unexist_headers_set), list(cpp_files_set)
+    finally:
+        if should_close_graph:
+            include_graph.close()
+    # 排序，保证顺序解析和并行解析的输出一致
+    return sorted(headers_set), sorted(unexist_headers_set)
 
 
-def extract_include_header_changes(diff_text):
+def get_relative_headers_of_modules(repo_path, modules, include_dirs_relative_pahts, shouldRecursion=True,
+                                    include_graph: IncludeGraph = None,
+                                    parallel=False, workers=None, revision=None) -> Tuple[list[str], list[str], list[str]]:
     """
-    从差异内容中提取修改的头文件
+    :param parallel: 是否使用进程池并行解析文件
+    :param workers: 进程数，为None时使用CPU核数
+    :param revision: 解析指定版本的文件，不需要检出；为None时解析工作区的文件。传入 include_graph 时忽略
+    :return: headers, unexist_headers, cpp_files
+    """
+    should_close_graph = include_graph is None
+    if include_graph is None:
+        include_graph = build_include_graph(
+            repo_path, include_dirs_relative_pahts, revision=revision)
+    try:
+        cpp_files_set = set()
+        for module in modules:
+            module_path = os.path.join(repo_path, module)
+            # 获取模块下的所有C/CPP文件的相对路径
+            cpp_files_set.update(normalize_path(os.path.relpath(file, repo_path))
+                                 for file in include_graph.file_source.walk_files(module_path)
+                                 if file.endswith('.c') or file.endswith('.cpp'))
+        headers, unexist_headers = get_relative_headers_of_files(
+            repo_path, cpp_files_set, include_dirs_relative_pahts, shouldRecursion,
+            include_graph, parallel, workers)
+    finally:
+        if should_close_graph:
+            include_graph.close()
+    return headers, unexist_headers, sorted(cpp_files_set)
+
+
+# git log 输出中每个提交的起始标记
+COMMIT_START_MARKER = '\x01'
+
+
+def iter_include_header_changes(diff_lines):
+    """
+    逐行扫描差异内容，提取增删的 #include 中的头文件名
+    :param diff_lines: 差异内容的行迭代器
     """
     include_pattern = generate_include_header_regex()
-    changes = []
-
-    diff_lines = diff_text.splitlines()
     in_diff = False
+    # 位于 diff --git 与第一个 @@ 之间的文件头部（--- / +++ 等）
+    in_diff_header = False
 
     for line in diff_lines:
         if line.startswith('diff --git'):
             in_diff = True
-        elif in_diff and (line.startswith('---') or line.startswith('+++')):
-            continue
-        elif in_diff and (line.startswith('+') or line.startswith('-')):
+            in_diff_header = True
+        elif line.startswith('@@'):
+            in_diff_header = False
+        elif in_diff and not in_diff_header and (line.startswith('+') or line.startswith('-')):
             include_match = include_pattern.search(line)
             if include_match:
                 # 只提取头文件名部分
-                header_file = include_match.group(1)
-                changes.append(header_file)
+                yield include_match.group(1)
+
 
-    return changes
+def extract_include_header_changes(diff_text):
+    """
+    从差异内容中提取修改的头文件
+    """
+    return list(iter_include_header_changes(diff_text.splitlines()))
 
 
-def get_diff_headers_of_files_all_commits(repo_path, target_files: list) -> list:
-    commits = set()
-    for target_file in tqdm(target_files, desc="Processing target_files", unit="file"):
-        commits.update(get_file_commits(repo_path, target_file))
+def get_diff_headers_of_files_all_commits(repo_path, target_files: list, pickaxe=True) -> list:
+    """
+    获取目标文件所有提交历史中增删过的 #include 头文件。
+    只运行一次 git log -p --unified=0 并逐行流式处理，不缓存提交的完整差异
+    :param repo_path: 仓库路径
+    :param target_files: 目标文件相对路径列表，只扫描这些文件的差异
+    :param pickaxe: 是否使用 -G 预先过滤掉没有增删 #include 行的提交
+    """
+    if not target_files:
+        return []
+    cmd = ['git', '-C', repo_path, 'log', '-p', '--unified=0', '--no-color', '--no-ext-diff',
+           f'--format={COMMIT_START_MARKER}%H']
+    if pickaxe:
+        cmd.append('-G#include')
+    cmd.append('--')
+    cmd.extend(target_files)
 
     headers = set()
-
     # 使用tqdm显示进度条
-    for commit in tqdm(commits, desc="Processing commits", unit="commit"):
-        diff_text = get_commit_diff(repo_path, commit)
-        include_header_changes = extract_include_header_changes(diff_text)
-        headers.update(include_header_changes)
+    with tqdm(desc="Processing commits", unit="commit") as progress:
+        def diff_lines():
+            for line in iter_cmd_lines(cmd, text=True, errors='replace'):
+                if line.startswith(COMMIT_START_MARKER):
+                    progress.update(1)
+                    continue
+                yield line
+
+        headers.update(iter_include_header_changes(diff_lines()))
 
     return list(headers)
 
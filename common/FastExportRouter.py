@@ -0,0 +1,578 @@
+import os
+import subprocess
+from array import array
+from common.FilterRepoDriver import HistoryFilter
+
+# git fast-export 的参数：不导出文件内容（新仓库通过 alternates 借用原始仓库的对象），
+# 与 git filter-repo 一致地去掉签名、统一编码，导出原始提交哈希用于重新计算文件修改
+FAST_EXPORT_ARGS = ['fast-export', '--no-data', '--show-original-ids', '--signed-tags=strip',
+                    '--tag-of-filtered-object=rewrite', '--fake-missing-tagger',
+                    '--reencode=yes', '--use-done-feature']
+# 默认导出的引用
+DEFAULT_EXPORT_REFS = ['--branches', '--tags']
+
+# C 风格引用路径中的转义字符
+C_STYLE_ESCAPES = {ord('a'): 7, ord('b'): 8, ord('f'): 12, ord('n'): 10, ord('r'): 13,
+                   ord('t'): 9, ord('v'): 11, ord('"'): 34, ord('\\'): 92}
+
+
+def unquote_c_style(path: bytes) -> bytes:
+    """
+    还原 git 使用 C 风格引号包裹的路径（路径中包含特殊字符时），不带引号的路径原样返回
+    """
+    if not path.startswith(b'"'):
+        return path
+    result = bytearray()
+    i, end = 1, len(path) - 1
+    while i < end:
+        char = path[i]
+        if char != ord('\\'):
+            result.append(char)
+            i += 1
+        elif path[i + 1] in C_STYLE_ESCAPES:
+            result.append(C_STYLE_ESCAPES[path[i + 1]])
+            i += 2
+        else:
+            # \ooo 八进制表示的字节
+            result.append(int(path[i + 1:i + 4], 8))
+            i += 4
+    return bytes(result)
+
+
+def quote_c_style(path: bytes) -> bytes:
+    """
+    路径中包含引号、反斜杠或控制字符时使用 C 风格引号包裹，供 git fast-import 解析
+    """
+    if not any(char < 32 or char in (34, 92, 127) for char in path):
+        return path
+    escapes = {value: key for key, value in C_STYLE_ESCAPES.items()}
+    result = bytearray(b'"')
+    for char in path:
+        if char in escapes:
+            result += bytes((92, escapes[char]))
+        elif char < 32 or char == 127:
+            result += b'\\%03o' % char
+        else:
+            result.append(char)
+    result += b'"'
+    return bytes(result)
+
+
+class SplitTarget(HistoryFilter):
+    """
+    一个分割目标：新仓库路径，以及需要保留的路径和提交日期窗口
+    """
+
+    def __init__(self, new_repo_path, target_paths, path_globs=None, start_date=None, end_date=None):
+        """
+        :param new_repo_path: 新仓库路径，由 route_fast_export 初始化
+        其余参数同 HistoryFilter
+        """
+        super().__init__(target_paths, path_globs, start_date, end_date)
+        self.new_repo_path = new_repo_path
+
+
+class RouteStats:
+    """
+    一个分割目标的提交统计
+    """
+
+    def __init__(self):
+        self.written = 0
+        self.pruned = 0
+        self.skipped_by_date = 0
+        self.tags = 0
+        self.refs = 0
+
+    def __str__(self):
+        return f"commits written: {self.written}, pruned (empty): {self.pruned}, " \
+               f"skipped by date: {self.skipped_by_date}, tags: {self.tags}, refs: {self.refs}"
+
+
+class CommitGraph:
+    """
+    提交的父提交关系，标记号为下标。深度为到根提交的最长路径，用于判断祖先关系时提前结束遍历
+    """
+
+    def __init__(self):
+        self.depth = array('l')
+        self.first_parent = array('l')
+        self.other_parents = {}
+
+    def ensure_mark(self, mark):
+        missing = mark + 1 - len(self.depth)
+        if missing > 0:
+            zeros = array('l', bytes(missing * self.depth.itemsize))
+            self.depth.extend(zeros)
+            self.first_parent.extend(zeros)
+
+    def add_commit(self, mark, parents):
+        self.ensure_mark(mark)
+        self.depth[mark] = 1 + max((self.depth[parent] for parent in parents), default=0)
+        if parents:
+            self.first_parent[mark] = parents[0]
+            if len(parents) > 1:
+                self.other_parents[mark] = tuple(parents[1:])
+
+    def get_parents(self, mark):
+        first_parent = self.first_parent[mark]
+        if not first_parent:
+            return ()
+        return (first_parent, *self.other_parents.get(mark, ()))
+
+    def is_ancestor(self, ancestor, descendant):
+        """
+        ancestor 是否为 descendant 的祖先（或同一个提交），只遍历深度大于 ancestor 的提交
+        """
+        ancestor_depth = self.depth[ancestor]
+        stack = [descendant]
+        seen = set()
+        while stack:
+            mark = stack.pop()
+            if mark == ancestor:
+                return True
+            if mark in seen or self.depth[mark] <= ancestor_depth:
+                continue
+            seen.add(mark)
+            stack.extend(self.get_parents(mark))
+        return False
+
+
+class SourceHistory:
+    """
+    原始导出流中的提交：原始提交哈希和父提交关系，所有分割目标共用
+    """
+
+    def __init__(self, repo_path):
+        self.repo_path = repo_path
+        self.graph = CommitGraph()
+        # 标记号 -> 20 字节的原始提交哈希
+        self.oids = bytearray()
+        self.last_diff = None
+
+    def add_commit(self, commit):
+        self.graph.add_commit(commit.mark, [parent for parent in commit.parents if parent])
+        missing = (commit.mark + 1) * 20 - len(self.oids)
+        if missing > 0:
+            self.oids.extend(bytes(missing))
+        self.oids[commit.mark * 20:(commit.mark + 1) * 20] = bytes.fromhex(commit.oid.decode())
+
+    def get_oid(self, mark) -> str:
+        return self.oids[mark * 20:(mark + 1) * 20].hex()
+
+    def get_changes(self, from_mark, to_mark) -> list:
+        """
+        两个原始提交之间的文件修改（同 git filter-repo 的 GitUtils.get_file_changes），
+        相邻的分割目标通常需要同一个结果，缓存最近一次
+        :return: (文件修改行, 路径) 列表
+        """
+        key = (from_mark, to_mark)
+        if self.last_diff is not None and self.last_diff[0] == key:
+            return self.last_diff[1]
+        output = subprocess.run(
+            ['git', '-C', self.repo_path, 'diff-tree', '-r', '--no-renames', '-z',
+             self.get_oid(from_mark), self.get_oid(to_mark)],
+            capture_output=True, check=True).stdout
+        fields = output.split(b'\0')
+        changes = []
+        # :<旧模式> <新模式> <旧哈希> <新哈希> <状态>\0<路径>\0
+        for i in range(0, len(fields) - 1, 2):
+            _, mode, _, oid, status = fields[i][1:].split(b' ')
+            path = fields[i + 1]
+            if status == b'D':
+                changes.append((b'D ' + quote_c_style(path) + b'\n', path))
+            else:
+                changes.append((b'M ' + mode + b' ' + oid + b' ' + quote_c_style(path) + b'\n', path))
+        self.last_diff = (key, changes)
+        return changes
+
+
+class TargetWriter:
+    """
+    把过滤后的提交写入一个分割目标的 git fast-import 进程。
+    新提交沿用原始导出流中的标记号，mapping[原始标记] 为对应的新提交标记（0 表示没有对应的提交）。
+    与 git filter-repo 一致：日期窗口外的提交映射为 0，被裁剪的提交映射到代替它的父提交，
+    这两种提交记为被改写（rewritten），合并提交只去掉被改写、且成为其他父提交祖先的父提交
+    """
+
+    def __init__(self, target: SplitTarget, source: SourceHistory):
+        self.target = target
+        self.source = source
+        self.stats = RouteStats()
+        self.mapping = array('l')
+        self.rewritten = bytearray()
+        # 引用 -> 当前指向的新提交标记（0 表示不指向提交，结束时不创建该引用）
+        self.ref_marks = {}
+        # 已写入提交的父提交关系，用于判断合并提交的父提交之间是否有祖先关系
+        self.graph = CommitGraph()
+        args = ['git', '-C', target.new_repo_path, 'fast-import', '--quiet', '--force']
+        self.cat_blob = None
+        if target.has_date_window:
+            # 跳过的提交的修改不会写入，新提交的树可能与过滤后的原始提交不同，
+            # 判断是否裁剪时需要通过 ls 查询新的父提交中的文件（结果写入 cat-blob-fd）
+            read_fd, write_fd = os.pipe()
+            args.append(f'--cat-blob-fd={write_fd}')
+            try:
+                self.proc = subprocess.Popen(args, stdin=subprocess.PIPE, pass_fds=(write_fd,))
+            finally:
+                os.close(write_fd)
+            self.cat_blob = os.fdopen(read_fd, 'rb')
+        else:
+            self.proc = subprocess.Popen(args, stdin=subprocess.PIPE)
+
+    def ensure_mark(self, mark):
+        missing = mark + 1 - len(self.mapping)
+        if missing > 0:
+            self.mapping.extend(array('l', bytes(missing * self.mapping.itemsize)))
+            self.rewritten.extend(bytes(missing))
+        self.graph.ensure_mark(mark)
+
+    def trim_parents(self, parents, orig_parents):
+        """
+        同 git filter-repo 的 _maybe_trim_extra_parents：去掉被改写的重复父提交，
+        以及被改写、且在新历史中是其他父提交的祖先（在原始历史中不是）的父提交。
+        合并提交因此会变为非合并提交时保留全部父提交，并返回代替它的第一个父提交
+        :return: (父提交, 代替的第一个父提交，没有时为 0)
+        """
+        if len(parents) < 2:
+            return parents, 0
+        rewritten = [self.rewritten[parent] for parent in orig_parents]
+        seen = set()
+        kept = [i for i, parent in enumerate(parents)
+                if not (parent in seen or seen.add(parent)) or not rewritten[i]]
+        if len(kept) < 2:
+            return parents, parents[kept[0]]
+        removed = set()
+        for cur in kept:
+            if not rewritten[cur]:
+                continue
+            for other in kept:
+                if other != cur and self.graph.is_ancestor(parents[cur], parents[other]) \
+                        and not self.source.graph.is_ancestor(orig_parents[cur], orig_parents[other]):
+                    removed.add(cur)
+                    break
+        kept = [i for i in kept if i not in removed]
+        if len(kept) < 2:
+            return parents, parents[kept[0]]
+        return [parents[i] for i in kept], 0
+
+    def route_commit(self, commit):
+        """
+        过滤一个提交的文件修改并决定写入、裁剪还是跳过，与 git filter-repo 的默认选项
+        （--prune-empty=auto --prune-degenerate=auto）一致
+        """
+        self.ensure_mark(commit.mark)
+        if not self.target.in_date_window(commit.committer_timestamp):
+            # 跳过的提交不更新引用
+            self.mapping[commit.mark] = 0
+            self.rewritten[commit.mark] = 1
+            self.stats.skipped_by_date += 1
+            return
+        translated = [self.mapping[parent] if parent < len(self.mapping) else 0 for parent in commit.parents]
+        orig_parents = [parent for parent, mapped in zip(commit.parents, translated) if mapped]
+        parents, new_first_parent = self.trim_parents([mapped for mapped in translated if mapped], orig_parents)
+        first_parent = new_first_parent or (parents[0] if parents else 0)
+        if first_parent and first_parent != (translated[0] if translated else 0):
+            # 第一个父提交改变时，文件修改改为相对新的第一个父提交对应的（第一个）原始父提交
+            orig_first_parent = commit.parents[translated.index(first_parent)]
+            all_changes = self.source.get_changes(orig_first_parent, commit.mark)
+        else:
+            all_changes = commit.changes
+        changes = [change for change, path in all_changes
+                   if path is None or self.target.match_path(path)]
+        # 同 git filter-repo 的 _prunable
+        if len(parents) >= 2 and not new_first_parent:
+            prunable = False
+        elif len(parents) < 2 and not commit.changes:
+            # 原本就为空的提交只在父提交被去掉或被改写时裁剪
+            prunable = not changes and (len(parents) < len(commit.parents) or (
+                len(commit.parents) == 1 and self.rewritten[commit.parents[0]]))
+        elif not changes:
+            prunable = True
+        elif not parents or self.cat_blob is None:
+            # 没有日期窗口时新提交的树与过滤后的原始提交相同，文件修改总是与父提交不同
+            prunable = False
+        else:
+            prunable = self.is_unchanged(first_parent, changes)
+        if prunable:
+            # 引用改为指向代替它的提交
+            self.mapping[commit.mark] = first_parent
+            self.ref_marks[commit.ref] = first_parent
+            self.rewritten[commit.mark] = 1
+            self.stats.pruned += 1
+            return
+        self.write_commit(commit, parents, changes)
+
+    def is_unchanged(self, parent, changes):
+        """
+        每个文件修改都与新的父提交中的版本相同（同 git filter-repo 的 _prunable 通过 ls 比较）
+        """
+        for change in changes:
+            if change.startswith(b'D '):
+                path, expected = change[2:-1], None
+            elif change.startswith(b'M '):
+                # M <mode> <dataref> <path>
+                mode, oid, path = change[2:-1].split(b' ', 2)
+                expected = mode + (b' commit ' if mode == b'160000' else b' blob ') + oid
+            else:
+                return False
+            self.proc.stdin.write(b'ls :%d ' % parent + path + b'\n')
+            self.proc.stdin.flush()
+            # <mode> <type> <dataref>\t<path> 或 missing <path>
+            response = self.cat_blob.readline()
+            if expected is None:
+                if not response.startswith(b'missing '):
+                    return False
+            elif response.split(b'\t', 1)[0] != expected:
+                return False
+        return True
+
+    def write_commit(self, commit, parents, changes):
+        mark = commit.mark
+        self.mapping[mark] = mark
+        self.ref_marks[commit.ref] = mark
+        self.graph.add_commit(mark, parents)
+        chunk = bytearray()
+        if not parents:
+            # 新的根提交，避免 fast-import 把分支当前的提交作为父提交
+            chunk += b'reset ' + commit.ref + b'\n\n'
+        chunk += b'commit ' + commit.ref + b'\nmark :%d\n' % mark
+        for header in commit.headers:
+            chunk += header
+        chunk += b'data %d\n' % len(commit.message) + commit.message + b'\n'
+        for i, parent in enumerate(parents):
+            chunk += b'from :%d\n' % parent if i == 0 else b'merge :%d\n' % parent
+        for change in changes:
+            chunk += change
+        chunk += b'\n'
+        self.proc.stdin.write(chunk)
+        self.stats.written += 1
+
+    def route_reset(self, ref, mark):
+        """
+        :param mark: 原始导出流中的标记，没有 from 或指向导出流之外的提交时为 0
+        """
+        self.ref_marks[ref] = self.mapping[mark] if mark < len(self.mapping) else 0
+
+    def route_tag(self, name, target_mark, headers, message):
+        # 注释标签由 fast-import 创建 refs/tags/<name>，不再通过 reset 更新
+        self.ref_marks.pop(b'refs/tags/' + name, None)
+        mapped = self.mapping[target_mark] if target_mark < len(self.mapping) else 0
+        if not mapped:
+            return
+        chunk = bytearray(b'tag ' + name + b'\nfrom :%d\n' % mapped)
+        for header in headers:
+            chunk += header
+        chunk += b'data %d\n' % len(message) + message + b'\n'
+        self.proc.stdin.write(chunk)
+        self.stats.tags += 1
+
+    def finish(self):
+        """
+        更新所有引用，然后结束 fast-import。不指向提交的引用被删除（fast-import 可能已经用它写入过提交）
+        """
+        try:
+            for ref, mark in self.ref_marks.items():
+                if mark:
+                    self.proc.stdin.write(b'reset ' + ref + b'\nfrom :%d\n\n' % mark)
+                    self.stats.refs += 1
+                else:
+                    self.proc.stdin.write(b'reset ' + ref + b'\nfrom ' + b'0' * 40 + b'\n\n')
+            self.proc.stdin.write(b'done\n')
+        finally:
+            self.proc.stdin.close()
+            returncode = self.proc.wait()
+            if self.cat_blob is not None:
+                self.cat_blob.close()
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, self.proc.args)
+
+    def abort(self):
+        if self.proc.poll() is None:
+            self.proc.kill()
+            self.proc.wait()
+        if self.cat_blob is not None:
+            self.cat_blob.close()
+
+
+class ExportedCommit:
+    """
+    导出流中的一个提交
+    changes: (文件修改行, 路径) 列表，路径为None的修改（如 deleteall）写入所有分割目标
+    """
+    __slots__ = ('ref', 'mark', 'oid', 'headers', 'committer_timestamp', 'message', 'parents', 'changes')
+
+    def __init__(self, ref):
+        self.ref = ref
+        self.mark = 0
+        self.oid = b''
+        self.headers = []
+        self.committer_timestamp = 0
+        self.message = b''
+        self.parents = []
+        self.changes = []
+
+
+class FastExportReader:
+    """
+    逐条读取 git fast-export 的输出
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.pending_line = None
+
+    def read_line(self) -> bytes:
+        if self.pending_line is not None:
+            line, self.pending_line = self.pending_line, None
+            return line
+        return self.stream.readline()
+
+    def unread_line(self, line):
+        self.pending_line = line
+
+    def read_data(self, line) -> bytes:
+        # data <字节数>
+        return self.stream.read(int(line[5:]))
+
+    def read_commit(self, ref) -> ExportedCommit:
+        commit = ExportedCommit(ref)
+        while True:
+            line = self.read_line()
+            if line.startswith(b'data '):
+                commit.message = self.read_data(line)
+                break
+            if line.startswith(b'mark :'):
+                commit.mark = int(line[6:])
+            elif line.startswith(b'committer '):
+                # committer <name> <email> <时间戳> <时区>
+                commit.committer_timestamp = int(line.rsplit(b' ', 2)[1])
+                commit.headers.append(line)
+            elif line.startswith(b'original-oid '):
+                commit.oid = line[13:].rstrip(b'\n')
+            else:
+                commit.headers.append(line)
+        while True:
+            line = self.read_line()
+            if not line or line == b'\n':
+                break
+            if line.startswith(b'from ') or line.startswith(b'merge '):
+                commit.parents.append(parse_mark(line.split(b' ', 1)[1]))
+            elif line.startswith(b'M '):
+                # M <mode> <dataref> <path>
+                commit.changes.append((line, unquote_c_style(line.split(b' ', 3)[3].rstrip(b'\n'))))
+            elif line.startswith(b'D '):
+                commit.changes.append((line, unquote_c_style(line[2:].rstrip(b'\n'))))
+            elif line.startswith(b'deleteall'):
+                commit.changes.append((line, None))
+        return commit
+
+
+def parse_mark(commit_ish: bytes):
+    """
+    :<标记> 返回标记，其他形式（提交哈希）返回 0，视为不在导出流中的提交
+    """
+    commit_ish = commit_ish.strip()
+    return int(commit_ish[1:]) if commit_ish.startswith(b':') else 0
+
+
+def init_target_repo(new_repo_path, objects_dir):
+    """
+    初始化新仓库，并通过 alternates 借用原始仓库的对象
+    """
+    subprocess.run(['git', 'init', '--quiet', new_repo_path], check=True)
+    alternates_path = os.path.join(new_repo_path, '.git', 'objects', 'info', 'alternates')
+    with open(alternates_path, 'w') as f:
+        f.write(objects_dir + '\n')
+
+
+def dissociate_target_repo(new_repo_path):
+    """
+    把新仓库需要的对象从原始仓库复制到新仓库的包中，再移除 alternates（同 git clone --dissociate）
+    """
+    subprocess.run(['git', '-C', new_repo_path, 'repack', '-a', '-d', '-q'], check=True)
+    os.remove(os.path.join(new_repo_path, '.git', 'objects', 'info', 'alternates'))
+
+
+def route_fast_export(original_repo_path, objects_dir, targets: list, refs=None, head_ref=None) -> list:
+    """
+    只读取一次原始仓库的历史（git fast-export --no-data），把每个提交过滤后的文件修改分发到多个新仓库的
+    git fast-import，代替为每个新仓库复制仓库并运行一次 git filter-repo。
+    新仓库通过 alternates 借用原始仓库的对象，之后需要 dissociate_target_repo。
+    提交的裁剪、合并提交父提交的去除和引用的更新与 git filter-repo 的默认选项一致
+    （见 TargetWriter.route_commit），生成的提交树、父提交关系和引用与 split_files 相同；
+    不在导出流中的父提交（如 refs 为 A..B 时的边界提交）被去掉。新提交的哈希与原始提交不同
+    :param original_repo_path: 原始仓库路径
+    :param objects_dir: 原始仓库的对象目录
+    :param targets: SplitTarget 列表
+    :param refs: 导出的引用（git rev-list 参数），为None时导出所有分支和标签
+    :param head_ref: 新仓库的 HEAD 指向的引用，如 refs/heads/master
+    :return: 每个分割目标的 RouteStats
+    """
+    for target in targets:
+        init_target_repo(target.new_repo_path, objects_dir)
+    writers = []
+    export_proc = None
+    try:
+        source = SourceHistory(original_repo_path)
+        writers = [TargetWriter(target, source) for target in targets]
+        export_proc = subprocess.Popen(
+            ['git', '-C', original_repo_path, *FAST_EXPORT_ARGS, *(refs or DEFAULT_EXPORT_REFS)],
+            stdout=subprocess.PIPE)
+        reader = FastExportReader(export_proc.stdout)
+        while True:
+            line = reader.read_line()
+            if not line or line == b'done\n':
+                break
+            if line.startswith(b'commit '):
+                commit = reader.read_commit(line[7:].rstrip(b'\n'))
+                source.add_commit(commit)
+                for writer in writers:
+                    writer.route_commit(commit)
+            elif line.startswith(b'reset '):
+                ref = line[6:].rstrip(b'\n')
+                mark = 0
+                next_line = reader.read_line()
+                if next_line.startswith(b'from '):
+                    mark = parse_mark(next_line[5:])
+                    next_line = reader.read_line()
+                if next_line != b'\n':
+                    reader.unread_line(next_line)
+                for writer in writers:
+                    writer.route_reset(ref, mark)
+            elif line.startswith(b'tag '):
+                name = line[4:].rstrip(b'\n')
+                target_mark = 0
+                headers = []
+                while True:
+                    tag_line = reader.read_line()
+                    if tag_line.startswith(b'data '):
+                        message = reader.read_data(tag_line)
+                        break
+                    if tag_line.startswith(b'from '):
+                        target_mark = parse_mark(tag_line[5:])
+                    elif not tag_line.startswith(b'original-oid ') and not tag_line.startswith(b'mark '):
+                        headers.append(tag_line)
+                for writer in writers:
+                    writer.route_tag(name, target_mark, headers, message)
+        if export_proc.wait() != 0:
+            raise subprocess.CalledProcessError(export_proc.returncode, export_proc.args)
+        for writer in writers:
+            writer.finish()
+    except BaseException:
+        for writer in writers:
+            writer.abort()
+        if export_proc is not None and export_proc.poll() is None:
+            export_proc.kill()
+            export_proc.wait()
+        raise
+    for target in targets:
+        if head_ref:
+            # HEAD 指向的引用在新仓库中存在时才更新
+            result = subprocess.run(
+                ['git', '-C', target.new_repo_path, 'rev-parse', '--verify', '--quiet', head_ref],
+                capture_output=True)
+            if result.returncode == 0:
+                subprocess.run(['git', '-C', target.new_repo_path, 'symbolic-ref', 'HEAD', head_ref],
+                               check=True)
+    return [writer.stats for writer in writers]
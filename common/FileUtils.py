@@ -80,3 +80,131 @@ def remove_prefix_slash_and_dot(path: str):
     if path.startswith('./'):
         return remove_prefix_slash_and_dot(path[2:])
     return path
+
+
+class PathTrie:
+    """
+    按路径分量构建的前缀树，判断路径本身或它的某个上级目录是否为树中的路径（同 git filter-repo --path 的匹配规则），
+    每次匹配只需要按路径深度查找，与路径数量无关
+    """
+    # 标记节点对应一个完整的路径
+    END = None
+
+    def __init__(self, paths=(), sep=b'/'):
+        """
+        :param paths: 路径（bytes 或 str，与 sep 的类型一致），不带前置和结尾的分隔符
+        :param sep: 路径分隔符
+        """
+        self.root = {}
+        self.sep = sep
+        self.size = 0
+        for path in paths:
+            self.add(path)
+
+    def add(self, path):
+        node = self.root
+        for part in path.split(self.sep):
+            node = node.setdefault(part, {})
+        if PathTrie.END not in node:
+            node[PathTrie.END] = True
+            self.size += 1
+
+    def match(self, path):
+        node = self.root
+        for part in path.split(self.sep):
+            node = node.get(part)
+            if node is None:
+                return False
+            if PathTrie.END in node:
+                return True
+        return False
+
+    def __len__(self):
+        return self.size
+
+
+class CollapsedPaths:
+    """
+    归并后的目标路径，以及每一步消除的路径数
+    """
+
+    def __init__(self, paths, input_count, duplicates, covered, folded, folded_dirs):
+        self.paths = paths
+        self.input_count = input_count
+        self.duplicates = duplicates
+        self.covered = covered
+        self.folded = folded
+        self.folded_dirs = folded_dirs
+
+    @property
+    def eliminated(self):
+        return self.input_count - len(self.paths)
+
+    def __str__(self):
+        return f"Target paths: {self.input_count} -> {len(self.paths)}, eliminated: {self.eliminated} " \
+               f"(duplicates: {self.duplicates}, covered by directories: {self.covered}, " \
+               f"folded into {self.folded_dirs} fully covered directories: {self.folded})"
+
+
+def collapse_paths(paths, tree_files=None) -> CollapsedPaths:
+    """
+    归并目标路径（按 git filter-repo --path 的规则匹配，文件或目录前缀）：
+    1. 去重；
+    2. 去掉已被其上级目录覆盖的路径，如 mm 和 mm/memory.c 只保留 mm；
+    3. 提供 tree_files 时，把其中文件全部被覆盖的目录折叠为该目录，如 include/linux 下的文件都是目标时只保留 include/linux。
+    前两步不改变匹配的文件集合；第三步只保证 tree_files 中匹配的文件不变，
+    该目录下不在 tree_files 中的文件（如只存在于历史中的文件）折叠后也会被匹配
+    :param paths: 目标路径列表，使用 / 分隔，不带前置的 ./ 和 /
+    :param tree_files: 参照的文件列表（如 HEAD 树中的所有文件），为None时不折叠目录
+    """
+    unique_paths = list(dict.fromkeys(path.strip('/') for path in paths if path.strip('/')))
+    duplicates = len(paths) - len(unique_paths)
+    # 按路径分量数排序，上级目录先加入前缀树
+    path_trie = PathTrie(sep='/')
+    kept_paths = []
+    for path in sorted(unique_paths, key=lambda p: p.count('/')):
+        if not path_trie.match(path):
+            path_trie.add(path)
+            kept_paths.append(path)
+    covered = len(unique_paths) - len(kept_paths)
+
+    folded = 0
+    folded_dirs = 0
+    if tree_files is not None:
+        # 每个目录下的文件总数和被覆盖的文件数
+        total_counts = {}
+        covered_counts = {}
+        for file_path in tree_files:
+            is_covered = path_trie.match(file_path)
+            end = file_path.rfind('/')
+            while end > 0:
+                directory = file_path[:end]
+                total_counts[directory] = total_counts.get(directory, 0) + 1
+                if is_covered:
+                    covered_counts[directory] = covered_counts.get(directory, 0) + 1
+                end = file_path.rfind('/', 0, end)
+        full_dirs = PathTrie((directory for directory, count in covered_counts.items()
+                              if count == total_counts[directory]), sep='/')
+        if len(full_dirs):
+            # 每个路径最上层的完全被覆盖的目录
+            top_dirs = []
+            for path in kept_paths:
+                parts = path.split('/')
+                top_dir = path
+                for i in range(1, len(parts)):
+                    directory = '/'.join(parts[:i])
+                    if full_dirs.match(directory):
+                        top_dir = directory
+                        break
+                top_dirs.append(top_dir)
+            # 只折叠能替换至少两个路径的目录，只替换一个路径时折叠不能减少路径，反而扩大了历史中保留的文件
+            dir_counts = {}
+            for top_dir in top_dirs:
+                dir_counts[top_dir] = dir_counts.get(top_dir, 0) + 1
+            folded_paths = list(dict.fromkeys(
+                top_dir if dir_counts[top_dir] > 1 else path
+                for path, top_dir in zip(kept_paths, top_dirs)))
+            folded_dirs = len(set(folded_paths) - set(kept_paths))
+            folded = len(kept_paths) - len(folded_paths)
+            kept_paths = folded_paths
+    return CollapsedPaths(kept_paths, len(paths), duplicates, covered, folded, folded_dirs)
@@ -0,0 +1,261 @@
+import os
+import fnmatch
+import subprocess
+import git_filter_repo as fr
+from common.FileUtils import PathTrie
+from common.TimeUtils import date_to_utc_timestamp
+from common.GitUtils import get_git_dir
+
+
+class HistoryFilter:
+    """
+    提取历史时保留的路径和提交日期窗口。
+    路径使用前缀树匹配，日期边界预先转换为时间戳，过滤每个文件、每个提交时不再格式化日期或遍历所有路径
+    """
+
+    def __init__(self, target_paths, path_globs=None, start_date=None, end_date=None):
+        """
+        :param target_paths: 保留的文件或目录路径（同 git filter-repo --path）
+        :param path_globs: 保留的路径通配符（同 git filter-repo --path-glob）
+        :param start_date: 起始日期, 格式为 'YYYY-MM-DD'，更早提交的提交被跳过
+        :param end_date: 结束日期, 格式为 'YYYY-MM-DD'，更晚提交的提交被跳过
+        """
+        self.path_trie = PathTrie(path.encode('utf-8') for path in target_paths)
+        self.path_globs = []
+        for glob in path_globs or []:
+            glob = glob.encode('utf-8')
+            self.path_globs.append(glob)
+            # 与 git filter-repo --path-glob 一致，同时匹配通配符对应目录下的文件
+            if not glob.endswith(b'*'):
+                self.path_globs.append(glob + (b'*' if glob.endswith(b'/') else b'/*'))
+        self.start_timestamp = date_to_utc_timestamp(start_date) if start_date else None
+        self.end_timestamp = date_to_utc_timestamp(end_date) if end_date else None
+
+    @property
+    def has_date_window(self):
+        return self.start_timestamp is not None or self.end_timestamp is not None
+
+    def match_path(self, path: bytes):
+        """
+        路径本身或它的某个上级目录是目标路径，或者路径匹配某个通配符
+        """
+        if self.path_trie.match(path):
+            return True
+        return any(fnmatch.fnmatch(path, glob) for glob in self.path_globs)
+
+    def in_date_window(self, timestamp):
+        # 与原来 --commit-callback 中的比较一致：早于 start_date 0 点或晚于 end_date 0 点（UTC）的提交被跳过
+        if self.start_timestamp is not None and timestamp < self.start_timestamp:
+            return False
+        if self.end_timestamp is not None and timestamp > self.end_timestamp:
+            return False
+        return True
+
+
+class RedundantBoundaryParentError(Exception):
+    """
+    只过滤部分历史时，合并提交的某个父提交被替代为新仓库中的边界提交，且它是另一个父提交的祖先。
+    git filter-repo 把边界提交视为没有父提交的根提交，无法像完整过滤一样去掉这个冗余的父提交
+    """
+
+    def __init__(self, commit_hash):
+        super().__init__(f"merge {commit_hash.decode()} has a redundant parent replaced by a boundary commit")
+
+
+class FilterRepoStats:
+    """
+    进程内运行 git filter-repo 的过滤统计
+    """
+
+    def __init__(self):
+        self.commits = 0
+        self.skipped_by_date = 0
+        self.paths = 0
+        self.kept_paths = 0
+        # 原始提交哈希 -> 新提交哈希，被跳过的提交对应替代它的提交（祖先全部被跳过时为None），
+        # 只在 record_commit_map=True 时记录
+        self.commit_map = {}
+
+    def __str__(self):
+        return f"commits: {self.commits}, skipped by date: {self.skipped_by_date}, " \
+               f"distinct paths: {self.paths}, kept paths: {self.kept_paths}"
+
+
+def read_filter_repo_commit_map(repo_path='.') -> dict:
+    """
+    读取 git filter-repo 写入的 .git/filter-repo/commit-map，原始提交哈希 -> 新提交哈希（被删除的提交为None）
+    """
+    commit_renames = {}
+    with open(os.path.join(get_git_dir(repo_path), 'filter-repo', 'commit-map'), 'rb') as f:
+        f.readline()  # 跳过标题行
+        for line in f:
+            old_hash, new_hash = line.split()
+            commit_renames[old_hash] = None if new_hash == fr.deleted_hash else new_hash
+    return commit_renames
+
+
+# git_filter_repo 保存 mark 的分配和转换、被跳过的提交的模块级变量，同一进程多次过滤时需要重置
+FILTER_REPO_MODULE_STATE = ('_IDs', '_IDS', '_SKIPPED_COMMITS')
+
+
+def reset_filter_repo_state():
+    """
+    重置 git_filter_repo 的模块级状态，否则上一次过滤的 mark 转换会被错误地用于本次过滤。
+    这些是 git_filter_repo 的内部变量，不存在时（不兼容的版本）明确报错
+    """
+    missing_names = [name for name in FILTER_REPO_MODULE_STATE if not hasattr(fr, name)]
+    if missing_names:
+        raise RuntimeError(f"Unsupported git-filter-repo version for in-process filtering: "
+                           f"{', '.join(missing_names)} not found in {fr.__file__}")
+    fr._IDS = fr._IDs()
+    fr._SKIPPED_COMMITS = set()
+
+
+def is_ancestor(repo_path, ancestor: bytes, descendant: bytes):
+    result = subprocess.run(
+        ['git', '-C', repo_path, 'merge-base', '--is-ancestor', ancestor.decode(), descendant.decode()],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return result.returncode == 0
+
+
+def run_filter_repo(history_filter: HistoryFilter, preserve_commit_hashes=True,
+                    extra_args=None, commit_callbacks=None,
+                    record_commit_map=False, parent_map=None) -> FilterRepoStats:
+    """
+    在当前目录的仓库中通过 git_filter_repo.RepoFilter 进程内运行 git filter-repo，
+    路径过滤和日期过滤以 Python 回调的形式传入，不再生成 --path 参数和字符串形式的 --commit-callback
+    :param history_filter: 保留的路径和日期窗口
+    :param preserve_commit_hashes: 是否保留原始提交哈希
+    :param extra_args: 其他 git filter-repo 命令行参数
+    :param commit_callbacks: 额外的提交回调列表，每个回调接受 (commit, metadata)，在日期过滤之后依次调用
+    :param record_commit_map: 是否记录原始提交到新提交的对应关系（FilterRepoStats.commit_map）
+    :param parent_map: 只过滤部分历史（如 --refs <新的引用> ^<旧的引用>）时，边界提交（以哈希形式出现的父提交、
+                       引用和标签指向的提交）的原始提交哈希 -> 新提交哈希，支持 [] 取值，不存在时抛出 KeyError
+    """
+    stats = FilterRepoStats()
+    commit_callbacks = list(commit_callbacks or [])
+    # 过滤流中提交的 mark -> 原始提交哈希
+    id_hashes = {}
+    # 原始提交哈希 -> 回调结束时的父提交（本次过滤中的 mark 或新仓库中的提交哈希），
+    # 提交被清空删除时 git filter-repo 用其中一个父提交替代它，回调中跳过的提交为None
+    commit_parents = {}
+
+    # 已经转换得到的新仓库中的提交哈希：新提交被清空删除时 git filter-repo 用转换后的父提交替代它，
+    # 它的子提交的父提交即为新仓库中的提交哈希，不需要再转换
+    mapped_hashes = set()
+
+    def map_boundary_commit(commit_hash):
+        if not isinstance(commit_hash, bytes) or commit_hash in mapped_hashes:
+            return commit_hash
+        new_hash = parent_map[commit_hash]
+        if new_hash is not None:
+            mapped_hashes.add(new_hash)
+        return new_hash
+
+    # 本次过滤中提交的 mark -> 转换后的父提交
+    run_parents = {}
+
+    def is_boundary_ancestor(boundary_hash, commit_id):
+        # 边界提交是否是提交（本次过滤中的 mark 或新仓库中的提交哈希）的祖先，
+        # 沿本次过滤的父提交遍历到新仓库中的提交后由 git 判断
+        pending = [commit_id]
+        visited = set()
+        while pending:
+            commit_id = pending.pop()
+            if commit_id in visited:
+                continue
+            visited.add(commit_id)
+            if isinstance(commit_id, int):
+                pending.extend(run_parents.get(commit_id, ()))
+            elif commit_id == boundary_hash or is_ancestor(target_repo_path, boundary_hash, commit_id):
+                return True
+        return False
+
+    def filename_callback(filename):
+        # RepoFilter 按文件名缓存回调的结果，每个不同的路径只匹配一次
+        stats.paths += 1
+        if history_filter.match_path(filename):
+            stats.kept_paths += 1
+            return filename
+        return None
+
+    def commit_callback(commit, metadata):
+        stats.commits += 1
+        if record_commit_map:
+            id_hashes[commit.id] = commit.original_id
+            commit_parents[commit.original_id] = None
+        if parent_map is not None:
+            # 父提交转换为新仓库中的提交，去掉祖先全部被跳过的父提交和重复的父提交
+            parents = []
+            replaced_parents = [parent for parent in commit.parents if parent in mapped_hashes]
+            for parent in commit.parents:
+                parent = map_boundary_commit(parent)
+                if parent is not None and parent not in parents:
+                    parents.append(parent)
+            commit.parents = parents
+            for parent in replaced_parents:
+                if any(is_boundary_ancestor(parent, other) for other in parents if other != parent):
+                    raise RedundantBoundaryParentError(commit.original_id)
+            run_parents[commit.id] = parents
+        if history_filter.has_date_window:
+            # committer_date: b'<时间戳> <时区>'
+            timestamp = int(commit.committer_date.split(b' ', 1)[0])
+            if not history_filter.in_date_window(timestamp):
+                stats.skipped_by_date += 1
+                commit.skip()
+                return
+        for callback in commit_callbacks:
+            callback(commit, metadata)
+        if record_commit_map and not commit.dumped:
+            # git filter-repo 在调用回调前已去掉冗余的父提交，这里的父提交即之后判断是否删除时的父提交
+            commit_parents[commit.original_id] = list(commit.parents)
+
+    def ref_callback(ref, metadata):
+        # reset 和 tag 指向的边界提交
+        ref.from_ref = map_boundary_commit(ref.from_ref)
+        if ref.from_ref is None:
+            ref.skip()
+
+    args = ['--force']
+    if preserve_commit_hashes:
+        args.append('--preserve-commit-hashes')
+    args.extend(extra_args or [])
+    options = fr.FilteringOptions.parse_args(args)
+    target_repo_path = options.target or '.'
+    reset_filter_repo_state()
+    ref_callbacks = {}
+    if parent_map is not None:
+        ref_callbacks = {'reset_callback': ref_callback, 'tag_callback': ref_callback}
+    try:
+        fr.RepoFilter(options,
+                      filename_callback=filename_callback,
+                      commit_callback=commit_callback,
+                      **ref_callbacks).run()
+    except SystemExit as e:
+        # git filter-repo 出错时调用 sys.exit，转换为异常交给调用方处理
+        if e.code:
+            raise RuntimeError(f"git filter-repo failed: {e.code}") from e
+    if record_commit_map:
+        commit_renames = read_filter_repo_commit_map(target_repo_path)
+
+        def to_new_hash(parent):
+            # 父提交的 mark 已被 git filter-repo 转换为保留的提交，哈希形式的父提交已经是新仓库中的提交
+            return commit_renames.get(id_hashes.get(parent)) if isinstance(parent, int) else parent
+
+        for original_hash, parents in commit_parents.items():
+            new_hash = commit_renames.get(original_hash)
+            if new_hash is None and parents is not None:
+                # 被清空删除的提交由第一个父提交替代；合并提交只有在父提交冗余时才会被删除，
+                # 此时由不是其他父提交祖先的父提交替代（同 git filter-repo 的 _maybe_trim_extra_parents）
+                new_parents = []
+                for parent in parents:
+                    parent = to_new_hash(parent)
+                    if parent is not None and parent not in new_parents:
+                        new_parents.append(parent)
+                new_hash = new_parents[0] if new_parents else None
+                if len(new_parents) > 1:
+                    new_hash = next((parent for parent in new_parents
+                                     if not any(is_ancestor(target_repo_path, parent, other)
+                                                for other in new_parents if other != parent)), new_hash)
+            stats.commit_map[original_hash] = new_hash
+    return stats
@@ -1,10 +1,23 @@
 import os
 import sys
-from common.GitUtils import copy_dir, remove_dir, list_gitignore_files, get_repo_size_info, get_repo_size_change_info, remove_all_git_remotes, add_virtual_remote, create_branch, format_get_commit_count_msg, format_get_earliest_commit_date_msg
-from common.GitUtils import format_count_files_commits_msg
+import time
+import subprocess
+from common.GitUtils import copy_repo, COPY_STRATEGY_AUTO, COPY_STRATEGY_CLONE, remove_dir, list_gitignore_files, get_repo_size_info, get_repo_size_change_info, remove_all_git_remotes, add_virtual_remote, create_branch, branch_exists, checkout_branch, format_get_commit_count_msg, format_get_earliest_commit_date_msg
+from common.GitUtils import get_slim_repo_cmds, SLIM_LEVEL_AGGRESSIVE, SLIM_LEVEL_FAST, SLIM_LEVEL_NONE
+from common.GitUtils import format_count_files_commits_msg, ensure_commit_graph, write_commit_graph, get_commit_graph_info
+from common.GitUtils import get_objects_dir, list_tree_files
+from common.FilterRepoDriver import HistoryFilter, run_filter_repo, RedundantBoundaryParentError
+from common.IncrementalSplit import SplitState, SplitCommitMap, get_split_commit_map_path, get_refs, get_full_split_reason
+from common.IncrementalSplit import get_incremental_refs_args, count_new_commits, get_current_branch
+from common.SplitCheckpoint import SplitCheckpoint, SplitStage, get_split_checkpoint_path, STAGE_COPY, STAGE_FILTER, STAGE_SLIM, STAGE_COMMIT_GRAPH, STAGE_REMOTE, STAGE_BRANCH
+from common.SplitEstimate import SplitEstimate, SplitHistory, estimate_split, estimate_runtime, format_runtime_estimate_msg
+from common.SplitEstimate import get_split_history_path, get_reachable_blob_bytes, count_all_commits
+from common.CommitIndex import commit_index_batch
+from common.RefSelection import RefSelection, ALL_TAGS_PATTERN, prune_refs
+from common.FastExportRouter import SplitTarget, route_fast_export, dissociate_target_repo
 from common.PrintUtils import get_sep
-from common.FileUtils import remove_prefix_slash_and_dot, count_all_file_ext, format_file_ext_count_msg
-from common.CppHeaderUtils import get_relative_headers_of_files, get_relative_headers_of_files_all_commits, get_relative_headers_of_modules
+from common.FileUtils import collapse_paths, remove_prefix_slash_and_dot, count_all_file_ext, format_file_ext_count_msg
+from common.CppHeaderUtils import get_relative_headers_of_files, get_relative_headers_of_files_all_commits, get_relative_headers_of_modules, build_include_graph
 from common.Logger import LoggerFactory, LogMetaInfo
 from common.CmdUtils import run_cmd
 from common.Timer import Timer
@@ -18,12 +31,356 @@ TAG = log_meta_info.get_file_tag()
 LOG_FILE_PATH = log_meta_info.get_log_file_path()
 
 
+def get_subprocess_handlers(logger):
+    """
+    运行 git 命令时处理标准输出、标准错误的函数
+    """
+    def subprocess_stdout_handler(line):
+        if '\r' in line:
+            # 如果line中有\r，说明是进度信息，不换行
+            print(line, end='')
+        else:
+            print(line)
+
+    def subprocess_stderr_handler(line):
+        logger.log_msg(line.strip(), stdout=True)
+
+    return subprocess_stdout_handler, subprocess_stderr_handler
+
+
+def get_filter_repo_target(target_file):
+    """
+    把目标路径转换为 git filter-repo --path 使用的路径
+    """
+    # 处理路径分隔符
+    target_file = target_file.replace('\\', '/')
+    # 递归删除前置 '/' 和 './'
+    target_file = remove_prefix_slash_and_dot(target_file)
+    # 如果 target_file 路径中包含 .. 则使用文件名，否则使用文件路径
+    if '..' in target_file:
+        return target_file.split('/')[-1]
+    return target_file
+
+
+def collapse_filter_targets(target_paths, gitignore_files=(), regex_with_glob=False, tree_files=None):
+    """
+    把目标路径转换为 git filter-repo 使用的路径并归并（去重、去掉被上级目录覆盖的路径、折叠完全被覆盖的目录）
+    :param target_paths: 目标文件或目录路径列表
+    :param gitignore_files: 同时保留的 .gitignore 文件
+    :param regex_with_glob: 是否同时使用 */<路径> 通配符匹配路径
+    :param tree_files: 折叠目录时参照的文件列表（如原始仓库 HEAD 树中的所有文件），为None时不折叠
+    :return: (CollapsedPaths, 通配符列表)
+    """
+    filter_targets = [get_filter_repo_target(target_file) for target_file in target_paths]
+    path_globs = []
+    if regex_with_glob:
+        path_globs = [f'*/{target}' for target in collapse_paths(filter_targets, tree_files).paths]
+    return collapse_paths(filter_targets + list(gitignore_files), tree_files), path_globs
+
+
+def write_paths_file(paths_file, filter_targets, path_globs):
+    """
+    写入 git filter-repo --paths-from-file 使用的文件，每行一个路径或 glob: 开头的通配符
+    """
+    with open(paths_file, 'w', encoding='utf-8') as f:
+        for target in filter_targets:
+            f.write(f'literal:{target}\n')
+        for path_glob in path_globs:
+            f.write(f'glob:{path_glob}\n')
+
+
+def get_filter_repo_cmd(paths_file, start_date=None, end_date=None,
+                        preserve_commit_hashes=True):
+    """
+    git filter-repo 命令行形式的提取命令，日期过滤使用字符串形式的 --commit-callback
+    :param paths_file: write_paths_file 写入的路径文件，通过 --paths-from-file 传入，避免命令行参数过长
+    """
+    split_cmd = ['git', 'filter-repo', '--paths-from-file', paths_file]
+    # 添加日期过滤
+    # 实现上使用自定义回调函数
+    # 参阅https://htmlpreview.github.io/?https://github.com/newren/git-filter-repo/blob/docs/html/git-filter-repo.html#CALLBACKS
+    # 在 git-filter-repo 中使用 --commit-callback 参数，传入一个自定义的回调函数（字符串形式的python代码）
+    # 提供了start_date或者end_date
+    should_skip_condition = ""
+    if start_date:
+        should_skip_condition += f' commit_date < "{start_date}T00:00:00" or'
+    if end_date:
+        should_skip_condition += f' commit_date > "{end_date}T00:00:00" or'
+    if should_skip_condition:
+        # 去掉前置空格
+        should_skip_condition = should_skip_condition[1:]
+        # 去掉最后一个 or
+        should_skip_condition = should_skip_condition[:-2]
+        commit_callback = f"\
+        import datetime\n\
+        timestamp = int(commit.committer_date.split()[0])\n\
+        commit_date = datetime.datetime.utcfromtimestamp(timestamp).strftime(\"%Y-%m-%dT%H:%M:%S\")\n\
+        if {should_skip_condition}:\n\
+        \tcommit.skip()"
+        split_cmd.extend(['--commit-callback', commit_callback])
+    # 保留原始提交哈希，而不是生成新的提交哈希
+    if preserve_commit_hashes:
+        split_cmd.extend(['--preserve-commit-hashes'])
+    split_cmd.extend(['--force'])
+    return split_cmd
+
+
+def slim_repo(logger, slim_level=SLIM_LEVEL_AGGRESSIVE, repack_window=None, repack_depth=None,
+              repack_threads=None, write_bitmap=False):
+    """
+    在当前目录的仓库中按瘦身级别清理、重新打包对象，并显示仓库大小的变化
+    """
+    subprocess_stdout_handler, subprocess_stderr_handler = get_subprocess_handlers(logger)
+
+    # 仓库瘦身
+    logger.info_print(get_sep("仓库瘦身"))
+    repo_size_before = get_repo_size_info()
+    # 清理未使用的对象
+    # 如 aggressive 级别: git reflog expire --expire=now --all && git gc --prune=now --aggressive
+    logger.info_print(f"Slim level: {slim_level}, write bitmap: {write_bitmap}")
+    slim_time_start = time.time()
+    for slim_cmd in get_slim_repo_cmds(slim_level, repack_window, repack_depth,
+                                       repack_threads, write_bitmap):
+        logger.info(f"Running command: {' '.join(slim_cmd)}")
+        run_cmd(
+            cmd=slim_cmd,
+            stdout_handler=subprocess_stdout_handler,
+            stderr_handler=subprocess_stderr_handler,
+            check=True
+        )
+    slim_seconds = time.time() - slim_time_start
+    repo_size_after = get_repo_size_info()
+    change_info = get_repo_size_change_info(
+        repo_size_before, repo_size_after, slim_seconds)
+    logger.info_print(change_info)
+
+
+def start_stage(checkpoint, timer, stage_name, message):
+    """
+    开始运行流水线的一个阶段：检查点中该阶段已完成且输入不变时跳过（计时中标记为 skipped），否则记录阶段开始
+    :param checkpoint: 分割检查点，为None时不跳过
+    :return: 是否跳过该阶段
+    """
+    if checkpoint is None:
+        return False
+    if checkpoint.is_done(stage_name):
+        timer.lap_and_show(message, skipped=True)
+        return True
+    checkpoint.start(stage_name)
+    return False
+
+
+def finish_stage(checkpoint, stage_name, outputs=None):
+    if checkpoint is not None:
+        checkpoint.finish(stage_name, outputs)
+
+
+def finish_new_repo(logger, timer, new_repo_name, new_branch_name, commit_graph=True,
+                    slim_level=SLIM_LEVEL_AGGRESSIVE, repack_window=None, repack_depth=None,
+                    repack_threads=None, write_bitmap=False, checkpoint=None):
+    """
+    在当前目录的新仓库中完成分割的收尾工作：仓库瘦身、写入 commit-graph、添加虚拟远程仓库、创建新分支。
+    参数含义同 split_files
+    :param checkpoint: 分割检查点，跳过其中已完成的阶段，为None时全部运行
+    """
+    if not start_stage(checkpoint, timer, STAGE_SLIM, "Slim repo"):
+        slim_repo(logger, slim_level, repack_window, repack_depth, repack_threads, write_bitmap)
+        finish_stage(checkpoint, STAGE_SLIM)
+
+        timer.lap_and_show("Slim repo")
+
+    if not start_stage(checkpoint, timer, STAGE_COMMIT_GRAPH, "Write commit graph"):
+        if commit_graph:
+            # 写入 commit-graph，之后按路径过滤的历史查询可以跳过大部分树比较
+            logger.info_print(get_sep("写入 commit-graph"))
+            write_commit_graph('.')
+            logger.info_print(str(get_commit_graph_info('.')))
+        finish_stage(checkpoint, STAGE_COMMIT_GRAPH)
+
+        if commit_graph:
+            timer.lap_and_show("Write commit graph")
+
+    if not start_stage(checkpoint, timer, STAGE_REMOTE, "Add virtual remote"):
+        # 为新仓库添加虚拟远程仓库
+        logger.info_print(get_sep("添加虚拟远程仓库"))
+        remove_all_git_remotes()
+        add_virtual_remote(new_repo_name)
+        finish_stage(checkpoint, STAGE_REMOTE)
+
+        timer.lap_and_show("Add virtual remote")
+
+    if not start_stage(checkpoint, timer, STAGE_BRANCH, "Create new branch"):
+        # 创建新分支
+        logger.info_print(get_sep("创建新分支"))
+        logger.info_print(f"New branch name: {new_branch_name}")
+        if checkpoint is not None and branch_exists(new_branch_name):
+            # 从检查点继续时，新分支可能已由之前的运行创建（如之后修改了瘦身参数）
+            logger.info_print(f"Branch {new_branch_name} already exists, check it out")
+            checkout_branch(new_branch_name)
+        else:
+            create_branch(new_branch_name)
+        finish_stage(checkpoint, STAGE_BRANCH)
+
+        timer.lap_and_show("Create new branch")
+
+
+def resplit_incremental(logger, timer, original_repo_path, new_repo_path, split_state: SplitState,
+                        source_refs: dict, commit_graph=True, slim_level=SLIM_LEVEL_AGGRESSIVE):
+    """
+    增量分割：只过滤原始仓库中上次分割之后新增的提交，追加到已有的新仓库中，已有提交的哈希不变。
+    沿用上次分割归并后的路径和日期窗口，不复制原始仓库，新分支快进到所基于的分支
+    :param split_state: 新仓库中保存的增量分割状态
+    :param source_refs: 原始仓库当前的引用
+    :param slim_level: 瘦身级别，增量分割时 repack、aggressive 级别降为 fast，避免重新计算全部对象的增量
+    """
+    subprocess_stdout_handler, subprocess_stderr_handler = get_subprocess_handlers(logger)
+
+    logger.info_print(get_sep("增量提取新增提交"))
+    # 之后在新仓库中运行，原始仓库的相对路径需要先转换为绝对路径
+    original_repo_path = os.path.abspath(original_repo_path)
+    new_repo_path = os.path.abspath(new_repo_path)
+    os.chdir(new_repo_path)
+    if source_refs == split_state.source_refs:
+        logger.info_print("The original repo has not changed since the last split.")
+        return
+    new_commit_count = count_new_commits(original_repo_path, split_state.source_refs, source_refs)
+    logger.info_print(f"New commits in original repo: {new_commit_count}")
+    request = split_state.request
+    logger.info_print(f"Date window: {request['start_date']} ~ {request['end_date']}")
+    # 原始仓库作为 --source、新仓库作为 --target，只导出新增或前进的引用上、旧的引用不可达的提交，
+    # 以哈希形式出现的边界父提交由提交对应关系转换为新仓库中的提交
+    refs_args = get_incremental_refs_args(split_state.source_refs, source_refs)
+    with SplitCommitMap(get_split_commit_map_path('.')) as commit_map:
+        logger.info(f"Split commit map size: {len(commit_map)}")
+        try:
+            filter_stats = run_filter_repo(
+                HistoryFilter(split_state.filter_targets, split_state.path_globs,
+                              request['start_date'], request['end_date']),
+                preserve_commit_hashes=request['preserve_commit_hashes'],
+                extra_args=['--source', original_repo_path, '--target', new_repo_path,
+                            '--refs'] + refs_args,
+                record_commit_map=True, parent_map=commit_map)
+        finally:
+            # 移除 filter-repo 残留数据
+            remove_dir('.git/filter-repo')
+        commit_map.update(filter_stats.commit_map)
+    logger.info_print(f"Filter stats: {filter_stats}")
+
+    timer.lap_and_show("Extract new commits")
+
+    if slim_level != SLIM_LEVEL_NONE:
+        slim_repo(logger, SLIM_LEVEL_FAST)
+
+        timer.lap_and_show("Slim repo")
+
+    if commit_graph:
+        logger.info_print(get_sep("写入 commit-graph"))
+        write_commit_graph('.')
+        logger.info_print(str(get_commit_graph_info('.')))
+
+        timer.lap_and_show("Write commit graph")
+
+    # 快进新分支
+    logger.info_print(get_sep("快进新分支"))
+    logger.info_print(f"Fast-forward {get_current_branch('.')} to {split_state.base_branch}")
+    run_cmd(cmd=['git', 'merge', '--ff-only', '--quiet', split_state.base_branch],
+            stdout_handler=subprocess_stdout_handler,
+            stderr_handler=subprocess_stderr_handler,
+            check=True)
+
+    split_state.source_refs = source_refs
+    split_state.save('.')
+
+    timer.lap_and_show("Fast-forward branch")
+
+
+def resolve_filter_targets(logger, original_repo_path, target_paths, track_gitignore=False,
+                           regex_with_glob=False, fold_dirs=False, revision='HEAD'):
+    """
+    得到 git filter-repo 实际使用的路径：加上 .gitignore 文件后归并目标路径，参数含义同 split_files
+    :param revision: 折叠目录时参照的原始仓库版本
+    :return: (归并后的路径列表, 通配符列表)
+    """
+    gitignore_files = []
+    if track_gitignore:
+        # 保留所有 gitignore 文件
+        # 从原始仓库列出：clone 复制的新仓库没有检出，暂存区为空
+        gitignore_files = list_gitignore_files(original_repo_path)
+        logger.info_print(
+            f"Target .gitignore file num: {len(gitignore_files)}")
+        logger.info(f"Target .gitignore files: {gitignore_files}")
+    # 归并目标路径，参照原始仓库 HEAD（或分割的分支）树折叠完全被覆盖的目录
+    tree_files = list_tree_files(original_repo_path, revision) if fold_dirs else None
+    collapsed_paths, path_globs = collapse_filter_targets(
+        target_paths, gitignore_files, regex_with_glob, tree_files)
+    logger.info_print(str(collapsed_paths))
+    logger.info_print(f"Target path and path-glob num: {len(collapsed_paths.paths) + len(path_globs)}")
+    return collapsed_paths.paths, path_globs
+
+
+def estimate_split_cost(logger, timer, original_repo_path, filter_targets, path_globs,
+                        start_date=None, end_date=None, slim_level=SLIM_LEVEL_AGGRESSIVE,
+                        source_refs=None, history_path=None) -> SplitEstimate:
+    """
+    试运行：不复制、不改写仓库，估计分割的规模，并按过去分割的耗时估计这次分割的耗时。
+    只读取原始仓库和分割耗时记录，不写入任何文件
+    :param source_refs: 分割的原始仓库引用（引用名 -> 对象哈希），为None时为所有引用
+    :param history_path: 分割耗时记录文件，为None时使用原始仓库的 .git/git-utils/split-history.jsonl
+    """
+    logger.info_print(get_sep("估计分割规模"))
+    logger.info_print(f"Date window: {start_date} ~ {end_date}")
+    split_estimate = estimate_split(original_repo_path, filter_targets, path_globs, start_date, end_date,
+                                    refs=sorted(set(source_refs.values())) if source_refs is not None else None)
+    logger.info_print(f"Split estimate: {split_estimate}")
+    history_path = history_path or get_split_history_path(original_repo_path)
+    records = SplitHistory(history_path).load()
+    lap_estimates = estimate_runtime(split_estimate, records, slim_level)
+    logger.info_print(format_runtime_estimate_msg(lap_estimates, len(records)))
+
+    timer.lap_and_show("Estimate split")
+    return split_estimate
+
+
+def record_split_history(logger, original_repo_path, new_repo_path, timer, slim_level, source_refs=None,
+                         history_path=None):
+    """
+    记录这次分割的规模和各阶段耗时，供之后试运行时校准耗时估计。
+    需要再遍历一次原始仓库和新仓库的历史统计规模
+    :param source_refs: 分割的原始仓库引用（引用名 -> 对象哈希），为None时为所有引用
+    :param history_path: 分割耗时记录文件，为None时使用原始仓库的 .git/git-utils/split-history.jsonl
+    """
+    blobs, blob_bytes = get_reachable_blob_bytes(new_repo_path)
+    metrics = {
+        'source_commits': count_all_commits(
+            original_repo_path, sorted(set(source_refs.values())) if source_refs is not None else None),
+        'commits': count_all_commits(new_repo_path),
+        'blobs': blobs,
+        'blob_bytes': blob_bytes,
+    }
+    history_path = history_path or get_split_history_path(original_repo_path)
+    SplitHistory(history_path).append(metrics, timer.laps, slim_level)
+    logger.info(f"Split history recorded to {history_path}: {metrics}")
+
+
 def split_files(original_repo_path="", target_paths: list = [],
                 new_repo_name="", new_repo_location="", new_branch_name="",
                 track_gitignore=False,
                 preserve_commit_hashes=True,
                 regex_with_glob=False,
-                start_date=None, end_date=None):
+                start_date=None, end_date=None,
+                commit_graph=True,
+                copy_strategy=COPY_STRATEGY_AUTO,
+                slim_level=SLIM_LEVEL_AGGRESSIVE,
+                repack_window=None, repack_depth=None, repack_threads=None,
+                write_bitmap=False,
+                filter_repo_in_process=True,
+                fold_dirs=False,
+                incremental=False,
+                checkpoint=True,
+                dry_run=False,
+                record_history=False,
+                split_history_path=None,
+                branch=None, tag_pattern=ALL_TAGS_PATTERN):
     """
     通用方法，用于提取指定文件及其历史记录到新的仓库
     :param original_repo_path: 原始仓库绝对路径
@@ -37,17 +394,40 @@ def split_files(original_repo_path="", target_paths: list = [],
     :param regex_with_glob: 是否使用正则表达式匹配路径
     :param start_date: 起始日期, 格式为 'YYYY-MM-DD'
     :param end_date: 结束日期, 格式为 'YYYY-MM-DD'
+    :param commit_graph: 是否为新仓库写入带修改路径布隆过滤器的 commit-graph，加速之后按路径过滤的历史查询
+    :param copy_strategy: 复制仓库的策略，auto（默认，依次尝试 clone、reflink、copy）、
+                          clone（硬链接对象的本地克隆，不复制工作区）、reflink、copy（完整复制）
+    :param slim_level: 仓库瘦身级别，none、fast（gc）、repack（按窗口、深度、线程数重新打包）、aggressive（默认，gc --aggressive）
+    :param repack_window: repack 级别的增量窗口
+    :param repack_depth: repack 级别的最大增量深度
+    :param repack_threads: repack 级别计算增量的线程数
+    :param write_bitmap: 是否写入可达性位图，加速之后从新仓库克隆
+    :param filter_repo_in_process: 是否通过 git_filter_repo 的 Python API 进程内运行 git filter-repo，
+                                   否则运行 git filter-repo 命令（路径通过 --paths-from-file 传入）
+    :param fold_dirs: 是否把原始仓库 HEAD 树中文件全部是目标的目录折叠为该目录，减少需要匹配的路径数，默认不折叠。
+                      折叠只参照 HEAD 树，该目录下只存在于历史中的文件也会被保留，分割结果可能多出这些文件
+    :param incremental: 是否增量分割。新仓库已存在、由相同参数的增量分割生成、且原始仓库的引用只是前进时，
+                        只过滤新增的提交并追加到新仓库中，已有提交的哈希不变；否则删除新仓库后完整分割，
+                        并在新仓库的 .git/git-utils 目录中保存分割参数、原始仓库的引用和原始提交到新提交的对应关系，
+                        供之后增量分割。增量分割总是进程内运行 git filter-repo
+    :param checkpoint: 是否在新仓库旁的 <新仓库名称>.split-state.json 中记录每个阶段（复制、过滤、瘦身、
+                       commit-graph、虚拟远程仓库、新分支）的输入哈希和完成状态。重新运行同样的分割时，
+                       跳过输入不变且已完成的阶段，从第一个未完成的阶段继续（如瘦身时磁盘不足失败后不需要重新过滤）。
+                       需要重新过滤时总是重新复制仓库
+    :param dry_run: 试运行，不复制、不改写仓库，只输出归并后的路径、日期窗口内修改过这些路径的提交数、
+                    这些提交中路径的 blob 字节数，以及按过去分割的耗时校准的估计耗时
+    :param record_history: 完整分割后是否记录规模和各阶段耗时，供试运行校准耗时估计。
+                           默认不记录：记录时需要再遍历一次原始仓库和新仓库的历史统计规模
+    :param split_history_path: 分割耗时记录文件，为None时使用原始仓库的 .git/git-utils/split-history.jsonl。
+                               试运行只读取该文件
+    :param branch: 只分割原始仓库的这个分支，新分支基于该分支创建；为None时分割所有分支
+    :param tag_pattern: 只保留名称匹配通配符的标签（只分割一个分支时还需要该分支可达），为None时不保留标签。
+                        复制后立即删除其余引用，git filter-repo 只改写保留的引用，只从其余引用可达的历史不会被处理，
+                        瘦身时也不再需要处理
+    :return: 试运行时返回 SplitEstimate
     """
     with LoggerFactory.create_logger(f"{TAG}#split_files") as logger:
-        def subprocess_stdout_handler(line):
-            if '\r' in line:
-                # 如果line中有\r，说明是进度信息，不换行
-                print(line, end='')
-            else:
-                print(line)
-
-        def subprocess_stderr_handler(line):
-            logger.log_msg(line.strip(), stdout=True)
+        subprocess_stdout_handler, subprocess_stderr_handler = get_subprocess_handlers(logger)
 
         timer = Timer(logger=logger)
 
@@ -79,139 +459,310 @@ def split_files(original_repo_path="", target_paths: list = [],
         if not dates_valid:
             logger.error_print(f"Invalid dates: {dates_error}")
             sys.exit(1)
+        # 检查分割的分支是否存在，并获取被选择的原始仓库引用
+        ref_selection = RefSelection(branch, tag_pattern)
+        try:
+            selected_source_refs = ref_selection.get_refs(original_repo_path)
+        except ValueError as e:
+            logger.error_print(str(e))
+            sys.exit(1)
+        logger.info_print(f"Ref selection: {ref_selection}, selected refs: {len(selected_source_refs)}")
         timer.lap_and_show("Check parameters")
 
-        logger.info_print(get_sep("复制仓库"))
-        # 复制原始仓库到新的位置
+        # 之后会切换到新仓库中运行，原始仓库的相对路径需要先转换为绝对路径
+        original_repo_path = os.path.abspath(original_repo_path)
+        # 折叠目录时参照的原始仓库版本
+        tree_revision = ref_selection.branch_ref or 'HEAD'
         new_repo_path = os.path.join(new_repo_location, new_repo_name)
-        logger.info_print(f"Original repo path: {original_repo_path}")
-        logger.info_print(f"New repo location: {new_repo_path}")
-        copy_dir(original_repo_path, new_repo_path)
+        split_request = {
+            'target_paths': sorted(target_paths),
+            'track_gitignore': track_gitignore,
+            'preserve_commit_hashes': preserve_commit_hashes,
+            'regex_with_glob': regex_with_glob,
+            'start_date': start_date,
+            'end_date': end_date,
+            'fold_dirs': fold_dirs,
+            'refs': ref_selection.to_dict(),
+        }
+        if dry_run:
+            split_estimate = estimate_split_cost(
+                logger, timer, original_repo_path,
+                *resolve_filter_targets(logger, original_repo_path, target_paths,
+                                        track_gitignore, regex_with_glob, fold_dirs, tree_revision),
+                start_date=start_date, end_date=end_date, slim_level=slim_level,
+                source_refs=None if ref_selection.is_all else selected_source_refs,
+                history_path=split_history_path)
+            timer.end_and_show()
+            return split_estimate
+
+        # 分割流水线的各个阶段及其输入，阶段的输入改变时该阶段及之后的阶段重新运行
+        split_stages = [
+            SplitStage(STAGE_COPY, {'original_repo_path': original_repo_path,
+                                    'refs': ref_selection.to_dict(),
+                                    'source_refs': selected_source_refs}),
+            # git filter-repo 直接改写复制的仓库，重新过滤前需要重新复制
+            SplitStage(STAGE_FILTER, {'split_request': split_request, 'incremental': incremental},
+                       restart_from=STAGE_COPY),
+            SplitStage(STAGE_SLIM, {'slim_level': slim_level, 'repack_window': repack_window,
+                                    'repack_depth': repack_depth, 'repack_threads': repack_threads,
+                                    'write_bitmap': write_bitmap}),
+            SplitStage(STAGE_COMMIT_GRAPH, {'commit_graph': commit_graph}),
+            SplitStage(STAGE_REMOTE, {'new_repo_name': new_repo_name}),
+            SplitStage(STAGE_BRANCH, {'new_branch_name': new_branch_name}),
+        ]
+        if incremental:
+            logger.info_print(get_sep("检查增量分割"))
+            source_refs = selected_source_refs
+            split_state = SplitState.load(new_repo_path) if os.path.isdir(new_repo_path) else None
+            full_split_reason = get_full_split_reason(
+                split_state, split_request, original_repo_path, new_repo_path, source_refs)
+            if full_split_reason is None:
+                timer.lap_and_show("Check incremental split")
+                working_dir = os.getcwd()
+                try:
+                    resplit_incremental(logger, timer, original_repo_path, new_repo_path,
+                                        split_state, source_refs,
+                                        commit_graph=commit_graph, slim_level=slim_level)
+                    logger.info_print(get_sep("处理完成"))
+                    timer.end_and_show()
+                    return
+                except KeyError as e:
+                    # 边界提交不在提交对应关系中（如状态文件与新仓库不一致），退回完整分割
+                    full_split_reason = f"commit {e} is not in the split commit map"
+                except RedundantBoundaryParentError as e:
+                    # 增量过滤无法得到与完整分割一致的合并提交，退回完整分割
+                    full_split_reason = str(e)
+                os.chdir(working_dir)
+            logger.info_print(f"Full split: {full_split_reason}")
+            # 之前的完整分割没有完成（没有增量分割状态）时，由检查点决定从哪个阶段继续
+            if os.path.isdir(new_repo_path) and (split_state is not None or not (
+                    checkpoint and os.path.isfile(get_split_checkpoint_path(new_repo_path)))):
+                remove_dir(new_repo_path)
+            timer.lap_and_show("Check incremental split")
+
+        split_checkpoint = SplitCheckpoint(new_repo_path, split_stages, enabled=checkpoint)
+        if split_checkpoint.resume_index > 0:
+            logger.info_print(f"Resume from checkpoint {split_checkpoint.state_path}, "
+                              f"first stage to run: {split_checkpoint.get_resume_stage() or 'none, all stages finished'}")
+
+        if not start_stage(split_checkpoint, timer, STAGE_COPY, "Copy repo"):
+            logger.info_print(get_sep("复制仓库"))
+            if os.path.isdir(new_repo_path) and split_checkpoint.has_state:
+                # 之前带检查点的分割生成的新仓库，重新复制
+                logger.info_print(f"Remove the new repo of the previous split: {new_repo_path}")
+                remove_dir(new_repo_path)
+            # 复制原始仓库到新的位置
+            logger.info_print(f"Original repo path: {original_repo_path}")
+            logger.info_print(f"New repo location: {new_repo_path}")
+            copy_repo_info = copy_repo(
+                original_repo_path, new_repo_path, copy_strategy)
+            if copy_repo_info.strategy != COPY_STRATEGY_CLONE:
+                # 移除从原始仓库复制过来的缓存（如头文件名缓存）
+                copied_cache_dir = os.path.join(new_repo_path, '.git', 'git-utils')
+                if os.path.isdir(copied_cache_dir):
+                    remove_dir(copied_cache_dir)
+            if not ref_selection.is_all:
+                # 删除没有被选择的引用，之后只改写保留的引用
+                pruned_ref_count = prune_refs(new_repo_path, ref_selection)
+                logger.info_print(f"Ref selection: {ref_selection}, pruned refs: {pruned_ref_count}")
+            # 复制得到的引用与原始仓库一致，作为这次处理到的原始仓库引用
+            finish_stage(split_checkpoint, STAGE_COPY, {'source_refs': get_refs(new_repo_path)})
+
+            timer.lap_and_show(f"Copy repo ({copy_repo_info})")
+        source_refs = split_checkpoint.get_outputs(STAGE_COPY)['source_refs']
 
-        timer.lap_and_show("Copy repo")
-
-        logger.info_print(get_sep("提取文件及其历史"))
         # 切换到仓库
         os.chdir(new_repo_path)
-        # 使用 git filter-repo 提取指定文件的历史记录
-        split_cmd = ['git', 'filter-repo']
-        target_num = 0
-        added_targets_set = set()
-        for target_file in target_paths:
-            # 处理路径分隔符
-            target_file = target_file.replace('\\', '/')
-            # 递归删除前置 '/' 和 './'
-            target_file = remove_prefix_slash_and_dot(target_file)
-            # 提取文件名
-            target_file_name = target_file.split('/')[-1]
-            # 如果 target_file 路径中包含 .. 则使用文件名，否则使用文件路径
-            if '..' in target_file:
-                target = target_file_name
-            else:
-                target = target_file
-            if target in added_targets_set:
-                continue
-            if not regex_with_glob:
-                split_cmd.extend(['--path', target])
-                target_num += 1
+        if not start_stage(split_checkpoint, timer, STAGE_FILTER, "Extract files and history"):
+            logger.info_print(get_sep("提取文件及其历史"))
+            # 使用 git filter-repo 提取指定文件的历史记录
+            filter_targets, path_globs = resolve_filter_targets(
+                logger, original_repo_path, target_paths, track_gitignore, regex_with_glob, fold_dirs,
+                tree_revision)
+            # 增量分割需要记录原始提交到新提交的对应关系，只能在进程内获取，因此总是进程内过滤
+            if filter_repo_in_process or incremental:
+                # 通过 git_filter_repo.RepoFilter 进程内过滤，路径使用前缀树匹配，日期边界预先转换为时间戳
+                logger.info_print(f"Date window: {start_date} ~ {end_date}")
+                filter_stats = run_filter_repo(
+                    HistoryFilter(filter_targets, path_globs, start_date, end_date),
+                    preserve_commit_hashes=preserve_commit_hashes,
+                    record_commit_map=incremental)
+                logger.info_print(f"Filter stats: {filter_stats}")
             else:
-                split_cmd.extend(['--path', target])
-                split_cmd.extend(['--path-glob', f'*/{target}'])
-                target_num += 2
-            added_targets_set.add(target)
+                # 路径写入 .git 目录下的文件，通过 --paths-from-file 传入
+                paths_file = os.path.join('.git', 'split-paths.txt')
+                write_paths_file(paths_file, filter_targets, path_globs)
+                split_cmd = get_filter_repo_cmd(paths_file, start_date, end_date,
+                                                preserve_commit_hashes)
+                logger.info(f"Running command: {' '.join(split_cmd)}")
+                try:
+                    run_cmd(cmd=split_cmd,
+                            stdout_handler=subprocess_stdout_handler,
+                            stderr_handler=subprocess_stderr_handler,
+                            check=True)
+                finally:
+                    os.remove(paths_file)
+
+            # 移除 filter-repo 残留数据
+            remove_dir('.git/filter-repo')
+            if incremental:
+                with SplitCommitMap(get_split_commit_map_path('.')) as commit_map:
+                    commit_map.update(filter_stats.commit_map)
+            # 增量分割状态使用的过滤路径和新分支所基于的分支，跳过该阶段时从检查点中读取
+            finish_stage(split_checkpoint, STAGE_FILTER, {
+                'filter_targets': filter_targets,
+                'path_globs': path_globs,
+                'base_branch': get_current_branch('.'),
+            })
+
+            timer.lap_and_show("Extract files and history")
+        filter_outputs = split_checkpoint.get_outputs(STAGE_FILTER)
+
+        finish_new_repo(logger, timer, new_repo_name, new_branch_name,
+                        commit_graph=commit_graph, slim_level=slim_level,
+                        repack_window=repack_window, repack_depth=repack_depth,
+                        repack_threads=repack_threads, write_bitmap=write_bitmap,
+                        checkpoint=split_checkpoint)
+        if incremental:
+            SplitState(split_request, filter_outputs['filter_targets'], filter_outputs['path_globs'],
+                       source_refs, filter_outputs['base_branch']).save('.')
+        if record_history:
+            record_split_history(logger, original_repo_path, '.', timer, slim_level,
+                                 source_refs=None if ref_selection.is_all else source_refs,
+                                 history_path=split_history_path)
+
+        logger.info_print(get_sep("处理完成"))
+
+        timer.end_and_show()
+
+
+def split_files_multi(original_repo_path="", targets: list = [],
+                      new_repo_location="", new_branch_name="",
+                      track_gitignore=False,
+                      regex_with_glob=False,
+                      start_date=None, end_date=None,
+                      refs=None,
+                      commit_graph=True,
+                      slim_level=SLIM_LEVEL_AGGRESSIVE,
+                      repack_window=None, repack_depth=None, repack_threads=None,
+                      write_bitmap=False,
+                      fold_dirs=False):
+    """
+    一次读取原始仓库的历史，同时分割出多个新仓库，每个新仓库有各自的目标路径和日期窗口。
+    与多次调用 split_files 不同，不复制原始仓库，也不为每个新仓库重新运行 git filter-repo：
+    git fast-export --no-data 的输出只读取一次，每个提交过滤后的文件修改分发到各个新仓库的 git fast-import，
+    新仓库通过 alternates 借用原始仓库的对象，重新打包后移除 alternates。
+    新提交的哈希与原始提交不同（相当于 preserve_commit_hashes=False）
+    :param original_repo_path: 原始仓库绝对路径
+    :param targets: 分割目标列表，每个元素为 dict：
+                    new_repo_name（新仓库名称）、target_paths（目标文件路径列表）、
+                    start_date、end_date（可选，缺省时使用参数 start_date、end_date）
+    :param new_repo_location: 新仓库位置（所在文件夹的绝对路径）
+    :param new_branch_name: 新分支名称
+    :param track_gitignore: 是否跟踪 .gitignore 文件
+    :param regex_with_glob: 是否同时使用 */<路径> 通配符匹配路径
+    :param start_date: 默认的起始日期, 格式为 'YYYY-MM-DD'
+    :param end_date: 默认的结束日期, 格式为 'YYYY-MM-DD'
+    :param refs: 导出的引用（git rev-list 参数），为None时导出所有分支和标签
+    其余参数同 split_files
+    """
+    with LoggerFactory.create_logger(f"{TAG}#split_files_multi") as logger:
+        timer = Timer(logger=logger)
+
+        timer.lap()
+        logger.info_print(get_sep("参数检查"))
+        # 检查原始仓库是否存在
+        if not os.path.isdir(os.path.join(original_repo_path, ".git")):
+            logger.error_print(
+                f"The path {original_repo_path} does not appear to be a Git repository.")
+            sys.exit(1)
+        if not targets:
+            logger.error_print("The targets list is empty.")
+            sys.exit(1)
+        # 检查新仓库位置是否存在
+        if not os.path.isdir(new_repo_location):
+            logger.error_print(f"The path {new_repo_location} does not exist.")
+            sys.exit(1)
+        # 检查新分支名称是否为空字符串
+        if not new_branch_name:
+            logger.error_print("The new_branch_name is empty.")
+            sys.exit(1)
+        new_repo_names = [target.get('new_repo_name') for target in targets]
+        if not all(new_repo_names) or len(set(new_repo_names)) != len(new_repo_names):
+            logger.error_print(f"The new_repo_name of targets should be non-empty and unique: {new_repo_names}")
+            sys.exit(1)
+        for target in targets:
+            new_repo_path = os.path.join(new_repo_location, target['new_repo_name'])
+            if os.path.exists(new_repo_path):
+                logger.error_print(f"The path {new_repo_path} already exists.")
+                sys.exit(1)
+            if not target.get('target_paths'):
+                logger.error_print(f"The target_paths of {target['new_repo_name']} is empty.")
+                sys.exit(1)
+            dates_valid, dates_error = validate_dates(
+                target.get('start_date', start_date), target.get('end_date', end_date))
+            if not dates_valid:
+                logger.error_print(f"Invalid dates of {target['new_repo_name']}: {dates_error}")
+                sys.exit(1)
+        timer.lap_and_show("Check parameters")
+
+        logger.info_print(get_sep("提取文件及其历史"))
+        original_repo_path = os.path.abspath(original_repo_path)
+        logger.info_print(f"Original repo path: {original_repo_path}")
+        gitignore_files = list_gitignore_files(original_repo_path) if track_gitignore else []
         if track_gitignore:
-            # 保留所有 gitignore 文件
-            gitignore_files = list_gitignore_files(new_repo_path)
-            for gitignore_file in gitignore_files:
-                split_cmd.extend(['--path', gitignore_file])
-                target_num += 1
             logger.info_print(
                 f"Target .gitignore file num: {len(gitignore_files)}")
-            logger.info(f"Target .gitignore files: {gitignore_files}")
-        # 添加日期过滤
-        # 实现上使用自定义回调函数
-        # 参阅https://htmlpreview.github.io/?https://github.com/newren/git-filter-repo/blob/docs/html/git-filter-repo.html#CALLBACKS
-        # 在 git-filter-repo 中使用 --commit-callback 参数，传入一个自定义的回调函数（字符串形式的python代码）
-        # 提供了start_date或者end_date
-        should_skip_condition = ""
-        if start_date:
-            should_skip_condition += f' commit_date < "{start_date}T00:00:00" or'
-        if end_date:
-            should_skip_condition += f' commit_date > "{end_date}T00:00:00" or'
-        if should_skip_condition:
-            # 去掉前置空格
-            should_skip_condition = should_skip_condition[1:]
-            # 去掉最后一个 or
-            should_skip_condition = should_skip_condition[:-2]
-            commit_callback = f"\
-            import datetime\n\
-            timestamp = int(commit.committer_date.split()[0])\n\
-            commit_date = datetime.datetime.utcfromtimestamp(timestamp).strftime(\"%Y-%m-%dT%H:%M:%S\")\n\
-            if {should_skip_condition}:\n\
-            \tcommit.skip()"
-            logger.info_print(f"commit_callback: \n{commit_callback}")
-            split_cmd.extend(['--commit-callback', commit_callback])
-        # 保留原始提交哈希，而不是生成新的提交哈希
-        if preserve_commit_hashes:
-            split_cmd.extend(['--preserve-commit-hashes'])
-        split_cmd.extend(['--force'])
-        logger.info_print(f"Target path and path-glob num: {target_num}")
-        logger.info(f"Running command: {' '.join(split_cmd)}")
-        run_cmd(cmd=split_cmd,
-                stdout_handler=subprocess_stdout_handler,
-                stderr_handler=subprocess_stderr_handler,
-                check=True)
+        # 参照原始仓库 HEAD 树折叠完全被覆盖的目录
+        tree_files = list_tree_files(original_repo_path, 'HEAD') if fold_dirs else None
+        split_targets = []
+        for target in targets:
+            collapsed_paths, path_globs = collapse_filter_targets(
+                target['target_paths'], gitignore_files, regex_with_glob, tree_files)
+            target_start_date = target.get('start_date', start_date)
+            target_end_date = target.get('end_date', end_date)
+            new_repo_path = os.path.join(new_repo_location, target['new_repo_name'])
+            logger.info_print(f"New repo location: {new_repo_path}, dates: {target_start_date} ~ {target_end_date}")
+            logger.info_print(str(collapsed_paths))
+            split_targets.append(SplitTarget(
+                new_repo_path, collapsed_paths.paths, path_globs,
+                target_start_date, target_end_date))
+        head_ref = subprocess.run(
+            ['git', '-C', original_repo_path, 'symbolic-ref', '--quiet', 'HEAD'],
+            capture_output=True, text=True).stdout.strip() or None
+        all_stats = route_fast_export(original_repo_path, get_objects_dir(original_repo_path),
+                                      split_targets, refs=refs, head_ref=head_ref)
+        for target, stats in zip(targets, all_stats):
+            logger.info_print(f"{target['new_repo_name']}: {stats}")
 
         timer.lap_and_show("Extract files and history")
 
-        # 仓库瘦身
-        logger.info_print(get_sep("仓库瘦身"))
-        repo_size_before = get_repo_size_info()
-        # 移除 filter-repo 残留数据
-        remove_dir('.git/filter-repo')
-        # 清理未使用的对象
-        # git reflog expire --expire=now --all && git gc --prune=now --aggressive
-        reflog_cmd = ['git', 'reflog', 'expire', '--expire=now', '--all']
-        run_cmd(
-            cmd=reflog_cmd,
-            stdout_handler=subprocess_stdout_handler,
-            stderr_handler=subprocess_stderr_handler,
-            check=True
-        )
-        gc_cmd = ['git', 'gc', '--prune=now', '--aggressive']
-        run_cmd(
-            cmd=gc_cmd,
-            stdout_handler=subprocess_stdout_handler,
-            stderr_handler=subprocess_stderr_handler,
-            check=True
-        )
-        repo_size_after = get_repo_size_info()
-        change_info = get_repo_size_change_info(
-            repo_size_before, repo_size_after)
-        logger.info_print(change_info)
+        for target in targets:
+            new_repo_name = target['new_repo_name']
+            new_repo_path = os.path.join(new_repo_location, new_repo_name)
+            logger.info_print(get_sep(f"处理新仓库 {new_repo_name}"))
+            os.chdir(new_repo_path)
+            # 复制需要的对象后不再依赖原始仓库，再检出工作区
+            dissociate_target_repo('.')
+            subprocess.run(['git', 'reset', '--hard', '--quiet'], check=True)
 
-        timer.lap_and_show("Slim repo")
+            timer.lap_and_show("Dissociate and checkout")
 
-        # 为新仓库添加虚拟远程仓库
-        logger.info_print(get_sep("添加虚拟远程仓库"))
-        remove_all_git_remotes()
-        add_virtual_remote(new_repo_name)
-
-        timer.lap_and_show("Add virtual remote")
-
-        # 创建新分支
-        logger.info_print(get_sep("创建新分支"))
-        logger.info_print(f"New branch name: {new_branch_name}")
-        create_branch(new_branch_name)
-
-        timer.lap_and_show("Create new branch")
+            finish_new_repo(logger, timer, new_repo_name, new_branch_name,
+                            commit_graph=commit_graph, slim_level=slim_level,
+                            repack_window=repack_window, repack_depth=repack_depth,
+                            repack_threads=repack_threads, write_bitmap=write_bitmap)
 
         logger.info_print(get_sep("处理完成"))
 
         timer.end_and_show()
 
 
-def statistics_split_info(repo_path, cpp_file_relative_paths):
+def statistics_split_info(repo_path, cpp_file_relative_paths, write_commit_graph_if_missing=False):
+    """
+    统计仓库的文件、提交信息
+    :param write_commit_graph_if_missing: 仓库没有可用的修改路径布隆过滤器时是否先写入 commit-graph
+    """
     with LoggerFactory.create_logger(f"{TAG}#statistics_split_info") as logger:
         timer = Timer(logger=logger)
 
@@ -225,21 +776,29 @@ def statistics_split_info(repo_path, cpp_file_relative_paths):
             logger.info_print(format_file_ext_count_msg(file_ext, count))
         timer.lap_and_show('Counting all files')
 
-        logger.info_print(get_sep("Counting all commits"))
+        logger.info_print(get_sep("Checking commit graph"))
         timer.lap()
-        logger.info_print(format_get_commit_count_msg(repo_path))
-        timer.lap_and_show('Counting all commits')
+        logger.info_print(str(ensure_commit_graph(
+            repo_path, write=write_commit_graph_if_missing)))
+        timer.lap_and_show('Checking commit graph')
 
-        logger.info_print(get_sep("Counting commits of target files"))
-        timer.lap()
-        logger.info_print(format_count_files_commits_msg(
-            repo_path, cpp_file_relative_paths))
-        timer.lap_and_show('Counting commits of target files')
+        # 以下查询都从 HEAD 开始，只检查一次提交索引
+        with commit_index_batch(repo_path):
+            logger.info_print(get_sep("Counting all commits"))
+            timer.lap()
+            logger.info_print(format_get_commit_count_msg(repo_path))
+            timer.lap_and_show('Counting all commits')
 
-        logger.info_print(get_sep("Showing earliest commit time"))
-        timer.lap()
-        logger.info_print(format_get_earliest_commit_date_msg(repo_path))
-        timer.lap_and_show('Showing earliest commit time')
+            logger.info_print(get_sep("Counting commits of target files"))
+            timer.lap()
+            logger.info_print(format_count_files_commits_msg(
+                repo_path, cpp_file_relative_paths))
+            timer.lap_and_show('Counting commits of target files')
+
+            logger.info_print(get_sep("Showing earliest commit time"))
+            timer.lap()
+            logger.info_print(format_get_earliest_commit_date_msg(repo_path))
+            timer.lap_and_show('Showing earliest commit time')
 
         timer.end()
         timer.show_time_cost()
@@ -247,7 +806,17 @@ def statistics_split_info(repo_path, cpp_file_relative_paths):
 
 def split_cpp_files(repo_path, include_dirs_relative_pahts, target_c_files,
                     new_repo_name, new_repo_location, new_branch_name,
-                    track_gitignore, regex_with_glob):
+                    track_gitignore, regex_with_glob,
+                    parallel_scan=False, scan_workers=None,
+                    header_revision=None,
+                    use_include_cache=True, include_cache_dir=None):
+    """
+    :param parallel_scan: 是否使用进程池并行解析头文件
+    :param scan_workers: 解析头文件的进程数，为None时使用CPU核数
+    :param header_revision: 基于指定版本（提交哈希、分支名等）分析头文件，不需要检出；为None时基于工作区
+    :param use_include_cache: 是否使用以 blob 哈希为键的持久化头文件名缓存
+    :param include_cache_dir: 缓存目录，为None时使用仓库 .git 目录下的 git-utils 目录
+    """
     with LoggerFactory.create_logger(f"{TAG}#split_cpp_files") as logger:
         timer = Timer(logger=logger)
         try:
@@ -259,9 +828,18 @@ def split_cpp_files(repo_path, include_dirs_relative_pahts, target_c_files,
             #     repo_path, target_paths, include_dirs_relative_pahts,
             #     shouldRecursion=True, timer=timer)
             # 基于当前版本分析得到目标c文件所有的头文件（包括头文件嵌套的头文件）
-            headers, _ = get_relative_headers_of_files(
-                repo_path, target_paths, include_dirs_relative_pahts,
-                shouldRecursion=True)
+            logger.info_print(f"Header revision: {header_revision or 'working tree'}")
+            include_graph = build_include_graph(
+                repo_path, include_dirs_relative_pahts, revision=header_revision,
+                use_cache=use_include_cache, cache_dir=include_cache_dir)
+            try:
+                headers, _ = get_relative_headers_of_files(
+                    repo_path, target_paths, include_dirs_relative_pahts,
+                    shouldRecursion=True, include_graph=include_graph,
+                    parallel=parallel_scan, workers=scan_workers)
+            finally:
+                include_graph.close()
+            logger.info_print(include_graph.format_stats_msg())
             target_paths.extend(headers)
             logger.info_print(f"target file or dir num: {len(target_paths)}")
             timer.lap_and_show("Get headers")
@@ -291,7 +869,23 @@ def split_cpp_files(repo_path, include_dirs_relative_pahts, target_c_files,
 def split_cpp_modules(repo_path, include_dirs_relative_pahts, modules: list,
                       new_repo_name, new_repo_location, new_branch_name,
                       track_gitignore, regex_with_glob,
-                      start_date=None, end_date=None):
+                      start_date=None, end_date=None,
+                      parallel_scan=False, scan_workers=None,
+                      header_revision=None,
+                      use_include_cache=True, include_cache_dir=None,
+                      dry_run=False,
+                      branch=None, tag_pattern=ALL_TAGS_PATTERN):
+    """
+    :param parallel_scan: 是否使用进程池并行解析头文件
+    :param scan_workers: 解析头文件的进程数，为None时使用CPU核数
+    :param header_revision: 基于指定版本（提交哈希、分支名等）分析头文件，不需要检出；为None时基于工作区。
+                            可以使用 get_commit_before_date 获取 start_date 边界的提交
+    :param use_include_cache: 是否使用以 blob 哈希为键的持久化头文件名缓存
+    :param include_cache_dir: 缓存目录，为None时使用仓库 .git 目录下的 git-utils 目录
+    :param dry_run: 试运行，只解析头文件并估计分割的规模和耗时（见 split_files），不生成新仓库
+    :param branch: 只分割原始仓库的这个分支，为None时分割所有分支（见 split_files）
+    :param tag_pattern: 只保留名称匹配通配符的标签，为None时不保留标签（见 split_files）
+    """
     with LoggerFactory.create_logger(f"{TAG}#split_cpp_modules") as logger:
         timer = Timer(logger=logger)
 
@@ -299,9 +893,18 @@ def split_cpp_modules(repo_path, include_dirs_relative_pahts, modules: list,
             timer.lap()
             target_paths = []
             # 基于当前版本分析得到目标模块下所有C/CPP文件需要的头文件（包括头文件嵌套的头文件）
-            headers, unexist_headers, target_cpp_files = get_relative_headers_of_modules(
-                repo_path, modules, include_dirs_relative_pahts,
-                shouldRecursion=True)
+            logger.info_print(f"Header revision: {header_revision or 'working tree'}")
+            include_graph = build_include_graph(
+                repo_path, include_dirs_relative_pahts, revision=header_revision,
+                use_cache=use_include_cache, cache_dir=include_cache_dir)
+            try:
+                headers, unexist_headers, target_cpp_files = get_relative_headers_of_modules(
+                    repo_path, modules, include_dirs_relative_pahts,
+                    shouldRecursion=True, include_graph=include_graph,
+                    parallel=parallel_scan, workers=scan_workers)
+            finally:
+                include_graph.close()
+            logger.info_print(include_graph.format_stats_msg())
             target_paths.extend(headers)
             target_paths.extend(modules)
             logger.info_print(f"target file or dir num: {len(target_paths)}")
@@ -323,7 +926,12 @@ def split_cpp_modules(repo_path, include_dirs_relative_pahts, modules: list,
                         new_branch_name=new_branch_name,
                         track_gitignore=track_gitignore,
                         regex_with_glob=regex_with_glob,
-                        start_date=start_date, end_date=end_date)
+                        start_date=start_date, end_date=end_date,
+                        dry_run=dry_run,
+                        branch=branch, tag_pattern=tag_pattern)
+            if dry_run:
+                timer.lap_and_show("Estimate split")
+                return
             timer.lap_and_show("Split files")
             timer.show_time_cost("仓库剥离总时间")
 
@@ -338,3 +946,75 @@ def split_cpp_modules(repo_path, include_dirs_relative_pahts, modules: list,
         finally:
             timer.end()
             timer.show_time_cost()
+
+
+def split_cpp_modules_multi(repo_path, include_dirs_relative_pahts, module_targets: list,
+                            new_repo_location, new_branch_name,
+                            track_gitignore, regex_with_glob,
+                            start_date=None, end_date=None,
+                            parallel_scan=False, scan_workers=None,
+                            header_revision=None,
+                            use_include_cache=True, include_cache_dir=None):
+    """
+    一次分割出多个模块的新仓库，头文件依赖图只构建一次，原始仓库的历史只读取一次（见 split_files_multi）
+    :param module_targets: 分割目标列表，每个元素为 dict：
+                           new_repo_name（新仓库名称）、modules（模块路径列表）、start_date、end_date（可选）
+    其余参数同 split_cpp_modules
+    """
+    with LoggerFactory.create_logger(f"{TAG}#split_cpp_modules_multi") as logger:
+        timer = Timer(logger=logger)
+
+        try:
+            timer.lap()
+            targets = []
+            target_cpp_files_of_repos = {}
+            logger.info_print(f"Header revision: {header_revision or 'working tree'}")
+            include_graph = build_include_graph(
+                repo_path, include_dirs_relative_pahts, revision=header_revision,
+                use_cache=use_include_cache, cache_dir=include_cache_dir)
+            try:
+                for module_target in module_targets:
+                    modules = module_target['modules']
+                    headers, unexist_headers, target_cpp_files = get_relative_headers_of_modules(
+                        repo_path, modules, include_dirs_relative_pahts,
+                        shouldRecursion=True, include_graph=include_graph,
+                        parallel=parallel_scan, workers=scan_workers)
+                    new_repo_name = module_target['new_repo_name']
+                    logger.info_print(f"{new_repo_name}: target file or dir num: {len(headers) + len(modules)}")
+                    logger.info(f"{new_repo_name}: exist_headers: {len(headers)}, {headers}")
+                    logger.info(
+                        f"{new_repo_name}: unexist_headers: {len(unexist_headers)}, {unexist_headers}")
+                    target = {key: module_target[key] for key in ('start_date', 'end_date')
+                              if key in module_target}
+                    target['new_repo_name'] = new_repo_name
+                    target['target_paths'] = headers + modules
+                    targets.append(target)
+                    target_cpp_files_of_repos[new_repo_name] = target_cpp_files
+            finally:
+                include_graph.close()
+            logger.info_print(include_graph.format_stats_msg())
+            timer.lap_and_show("Get headers")
+
+            timer.lap()
+            split_files_multi(original_repo_path=repo_path,
+                              targets=targets,
+                              new_repo_location=new_repo_location,
+                              new_branch_name=new_branch_name,
+                              track_gitignore=track_gitignore,
+                              regex_with_glob=regex_with_glob,
+                              start_date=start_date, end_date=end_date)
+            timer.lap_and_show("Split files")
+            timer.show_time_cost("仓库剥离总时间")
+
+            # 统计新仓库信息
+            timer.lap()
+            for new_repo_name, target_cpp_files in target_cpp_files_of_repos.items():
+                new_repo_path = f"{new_repo_location}/{new_repo_name}"
+                statistics_split_info(new_repo_path, target_cpp_files)
+            timer.lap_and_show("Statistics split info")
+        except Exception as e:
+            logger.error_print(f"Error: {e}")
+            logger.error_print(traceback.format_exc())
+        finally:
+            timer.end()
+            timer.show_time_cost()
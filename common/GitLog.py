@@ -0,0 +1,113 @@
+from common.CmdUtils import iter_cmd_lines
+
+# git log 输出中每个提交的起始标记，以及字段分隔符
+COMMIT_START_MARKER = '\x01'
+FIELD_SEPARATOR = '\x02'
+COMMIT_RECORD_FORMAT = FIELD_SEPARATOR.join(['%H', '%P', '%at', '%ct', '%ci', '%s'])
+# 完整提交信息（%B，可能有多行）的结束标记
+MESSAGE_END_MARKER = '\x03'
+
+
+class CommitRecord:
+    """
+    单个提交的元信息
+    """
+    __slots__ = ('oid', 'parents', 'author_time', 'committer_time', 'committer_date', 'subject', 'files',
+                 'message')
+
+    def __init__(self, oid, parents, author_time, committer_time, committer_date, subject, files,
+                 message=None):
+        """
+        :param oid: 提交哈希
+        :param parents: 父提交哈希元组
+        :param author_time: 作者时间戳（秒）
+        :param committer_time: 提交者时间戳（秒）
+        :param committer_date: 提交时间字符串（git log %ci 格式）
+        :param subject: 提交信息的标题行
+        :param files: 修改的文件列表（合并提交默认只包含与所有父提交都不同的文件），不读取文件时为None
+        :param message: 完整的提交信息（git log %B），不读取时为None
+        """
+        self.oid = oid
+        self.parents = parents
+        self.author_time = author_time
+        self.committer_time = committer_time
+        self.committer_date = committer_date
+        self.subject = subject
+        self.files = files
+        self.message = message
+
+    @property
+    def parent_count(self):
+        return len(self.parents)
+
+    @property
+    def is_merge(self):
+        return len(self.parents) > 1
+
+    def __repr__(self):
+        return f"CommitRecord({self.oid}, parents={len(self.parents)}, subject={self.subject!r})"
+
+
+def iter_commit_records(repo_path, revisions=None, paths=None, with_files=True, with_message=False,
+                        per_parent_files=False):
+    """
+    一次流式的 git log 遍历，依次生成每个提交的 CommitRecord
+    :param repo_path: 仓库路径
+    :param revisions: 版本范围参数列表，如 ['HEAD', '^<commit>']，为None时为 HEAD
+    :param paths: 只遍历修改过这些路径的提交，为None时遍历所有提交
+    :param with_files: 是否读取每个提交修改的文件（git log -c --name-only）
+    :param with_message: 是否读取完整的提交信息（git log %B）
+    :param per_parent_files: 合并提交是否读取与任一父提交不同的文件（git log -m），
+                             与 git log --full-history -- <path> 归属合并提交的语义一致，
+                             同一文件可能出现多次
+    """
+    record_format = f'{COMMIT_START_MARKER}{COMMIT_RECORD_FORMAT}'
+    if with_message:
+        # 完整提交信息放在标题之后，以结束标记结尾，结束标记之前的行都属于提交信息
+        record_format += f'{FIELD_SEPARATOR}%B{MESSAGE_END_MARKER}'
+    cmd = ['git', '-C', repo_path, '-c', 'core.quotePath=false', 'log',
+           f'--format={record_format}']
+    if with_files:
+        cmd.extend(['-m' if per_parent_files else '-c', '--name-only'])
+    if revisions:
+        cmd.extend(revisions)
+    cmd.append('--')
+    if paths:
+        cmd.extend(paths)
+    record = None
+    message_lines = None
+    for line in iter_cmd_lines(cmd, text=True, errors='replace'):
+        line = line.rstrip('\n')
+        if message_lines is not None:
+            # 读取完整提交信息的后续行，直到结束标记
+            if MESSAGE_END_MARKER in line:
+                message_lines.append(line[:line.index(MESSAGE_END_MARKER)])
+                record.message = '\n'.join(message_lines).rstrip('\n')
+                message_lines = None
+            else:
+                message_lines.append(line)
+            continue
+        if line.startswith(COMMIT_START_MARKER):
+            # 标题行放在最后（或完整提交信息之前），其中出现的分隔符不影响解析
+            oid, parents, author_time, committer_time, committer_date, subject = \
+                line[1:].split(FIELD_SEPARATOR, 5)
+            message = None
+            if with_message:
+                # 标题中没有换行，第一个分隔符之后是完整提交信息的第一行
+                subject, first_message_line = subject.split(FIELD_SEPARATOR, 1)
+                if MESSAGE_END_MARKER in first_message_line:
+                    message = first_message_line[:first_message_line.index(MESSAGE_END_MARKER)]
+                else:
+                    message_lines = [first_message_line]
+            if record is not None and record.oid == oid:
+                # git log -m 对合并提交的每个父提交重复输出一次，文件合并到同一个记录中
+                continue
+            if record is not None:
+                yield record
+            record = CommitRecord(oid, tuple(parents.split()), int(author_time), int(committer_time),
+                                  committer_date, subject, [] if with_files else None, message)
+            continue
+        if line and record is not None and with_files:
+            record.files.append(line)
+    if record is not None:
+        yield record
@@ -5,6 +5,9 @@ import datetime
 from common.Logger import LoggerFactory, LogMetaInfo
 import traceback
 import json
+from common.CmdUtils import iter_cmd_lines
+from common.CommitIndex import open_commit_index_if_present
+from common.GitLog import CommitRecord, iter_commit_records, COMMIT_START_MARKER
 
 # 日志配置信息
 LOG_META_INFO = LogMetaInfo(__file__)
@@ -47,6 +50,122 @@ def copy_dir(src, dest):
         print("Command executed successfully.")
 
 
+# 复制仓库的策略：auto 依次尝试 clone、reflink、copy
+COPY_STRATEGY_AUTO = 'auto'
+# git clone --local --no-checkout，对象文件使用硬链接，不复制工作区
+COPY_STRATEGY_CLONE = 'clone'
+# cp -r --reflink=always，文件系统支持时（如 btrfs、xfs）共享数据块
+COPY_STRATEGY_REFLINK = 'reflink'
+# 完整复制目录
+COPY_STRATEGY_COPY = 'copy'
+COPY_STRATEGIES = [COPY_STRATEGY_AUTO, COPY_STRATEGY_CLONE,
+                   COPY_STRATEGY_REFLINK, COPY_STRATEGY_COPY]
+
+
+class CopyRepoInfo:
+    """
+    复制仓库的结果
+    """
+
+    def __init__(self, strategy, bytes_total, bytes_copied):
+        """
+        :param strategy: 实际使用的复制策略
+        :param bytes_total: 新仓库中文件的总字节数
+        :param bytes_copied: 实际复制的字节数（不包括硬链接和 reflink 共享的数据）
+        """
+        self.strategy = strategy
+        self.bytes_total = bytes_total
+        self.bytes_copied = bytes_copied
+
+    def __str__(self):
+        return f"Copy strategy: {self.strategy}, " \
+               f"bytes copied: {self.bytes_copied} / {self.bytes_total}"
+
+
+def get_dir_size(path, exclude_hardlinks=False):
+    """
+    统计目录下文件的总字节数
+    :param exclude_hardlinks: 是否不统计有多个硬链接的文件
+    """
+    total = 0
+    for root, _, files in os.walk(path):
+        for file_name in files:
+            stat = os.lstat(os.path.join(root, file_name))
+            if exclude_hardlinks and stat.st_nlink > 1:
+                continue
+            total += stat.st_size
+    return total
+
+
+def clone_repo_local(src, dest):
+    """
+    使用 git clone --local --no-checkout 复制仓库：对象文件使用硬链接，不检出工作区。
+    再从原始仓库获取所有引用（包括原始仓库的远程跟踪分支），使新仓库的引用与原始仓库一致
+    :return: 是否成功，失败时只删除本次创建的目录
+    """
+    created = not os.path.exists(dest)
+    try:
+        subprocess.run(['git', 'clone', '--local', '--no-checkout', '--quiet', src, dest],
+                       check=True, capture_output=True, text=True)
+        # 移除 clone 创建的 origin 及其远程跟踪分支，避免被 git filter-repo 当作本地分支
+        subprocess.run(['git', '-C', dest, 'remote', 'remove', 'origin'],
+                       check=True, capture_output=True, text=True)
+        # 当前分支也需要更新，因此使用 --update-head-ok
+        subprocess.run(['git', '-C', dest, 'fetch', '--quiet', '--update-head-ok', '--no-tags',
+                        os.path.abspath(src), '+refs/*:refs/*'],
+                       check=True, capture_output=True, text=True)
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"Error: {e.stderr}")
+        if created and os.path.isdir(dest):
+            remove_dir(dest)
+        return False
+
+
+def reflink_copy_dir(src, dest):
+    """
+    使用 cp -r --reflink=always 复制目录，文件系统不支持 reflink 时失败
+    :return: 是否成功，失败时只删除本次创建的目录
+    """
+    if os.name != 'posix':
+        return False
+    created = not os.path.exists(dest)
+    result = subprocess.run(['cp', '-r', '--reflink=always', src, dest],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"Error: {result.stderr.strip()}")
+        if created and os.path.isdir(dest):
+            remove_dir(dest)
+        return False
+    return True
+
+
+def copy_repo(src, dest, strategy=COPY_STRATEGY_AUTO) -> CopyRepoInfo:
+    """
+    按指定策略复制仓库，策略不可用时依次退回 reflink、完整复制
+    :param src: 原始仓库路径
+    :param dest: 新仓库路径，不能是已存在的非空目录或文件
+    :param strategy: 复制策略，见 COPY_STRATEGIES
+    :raise ValueError: 未知的复制策略，或 dest 已存在且不是空目录
+    """
+    if strategy not in COPY_STRATEGIES:
+        raise ValueError(f"Unknown copy strategy: {strategy}, available: {COPY_STRATEGIES}")
+    if os.path.exists(dest):
+        if not os.path.isdir(dest) or os.listdir(dest):
+            raise ValueError(f"Destination {dest} already exists and is not an empty directory")
+        # 已存在的空目录先删除，cp -r 复制到已存在的目录时会复制为其中的子目录
+        os.rmdir(dest)
+    if strategy in (COPY_STRATEGY_AUTO, COPY_STRATEGY_CLONE) and clone_repo_local(src, dest):
+        return CopyRepoInfo(COPY_STRATEGY_CLONE, get_dir_size(dest),
+                            get_dir_size(dest, exclude_hardlinks=True))
+    if strategy != COPY_STRATEGY_COPY and reflink_copy_dir(src, dest):
+        # reflink 共享数据块，只复制了元数据
+        return CopyRepoInfo(COPY_STRATEGY_REFLINK, get_dir_size(dest), 0)
+    copy_dir(src, dest)
+    bytes_total = get_dir_size(dest)
+    return CopyRepoInfo(COPY_STRATEGY_COPY, bytes_total, bytes_total)
+
+
 def remove_dir(path):
     """
     删除指定目录及其内容。
@@ -63,6 +182,16 @@ def remove_dir(path):
         print(f"路径 {path} 不存在或不是一个目录。")
 
 
+def normalize_path(path):
+    """
+    将相对路径归一化为 git 输出中的形式：使用 / 分隔，不带前置的 ./ 和结尾的 /
+    """
+    normalized_path = path.replace('\\', '/').strip('/')
+    while normalized_path.startswith('./'):
+        normalized_path = normalized_path[2:]
+    return normalized_path
+
+
 def list_gitignore_files(repo_path):
     """
     返回所有 .gitignore 文件相对于仓库根目录的路径。
@@ -142,6 +271,14 @@ def create_branch(new_branch_name):
     subprocess.run(['git', 'checkout', '-b', new_branch_name], check=True)
 
 
+def branch_exists(branch_name):
+    return subprocess.run(['git', 'show-ref', '--verify', '--quiet', f'refs/heads/{branch_name}']).returncode == 0
+
+
+def checkout_branch(branch_name):
+    subprocess.run(['git', 'checkout', '--quiet', branch_name], check=True)
+
+
 def delete_branch(branch_name):
     subprocess.run(['git', 'branch', '-D', branch_name], check=True)
 
@@ -150,7 +287,12 @@ def get_commit_count(repo_path='.'):
     """
     获取项目中的提交数 
     git rev-list --count HEAD
+    仓库建立了提交索引时直接从索引中读取
     """
+    commit_index = open_commit_index_if_present(repo_path)
+    if commit_index is not None:
+        with commit_index:
+            return str(commit_index.count_commits())
     working_dir = os.getcwd()
     os.chdir(repo_path)
     result = subprocess.run(
@@ -163,6 +305,10 @@ def get_all_commits(repo_path='.') -> list:
     """
     获取所有提交记录
     """
+    commit_index = open_commit_index_if_present(repo_path)
+    if commit_index is not None:
+        with commit_index:
+            return commit_index.get_all_commits()
     result = subprocess.run(
         ['git', '-C', repo_path, 'log', '--pretty=format:%H'],
         capture_output=True,
@@ -178,22 +324,66 @@ def get_all_commits(repo_path='.') -> list:
 
 def get_file_commits(repo_path, file_relative_path) -> list:
     """
-    获取文件的提交记录
+    获取文件的提交记录。
+    使用 git log --full-history：不按路径简化历史，所有分支上修改过路径的提交都会被统计（与 git filter-repo 保留的提交一致），
+    合并提交与至少一个父提交在路径上不同时被统计，结果与 get_paths_commits 中该路径的提交记录一致
     """
+    commit_index = open_commit_index_if_present(repo_path)
+    if commit_index is not None:
+        with commit_index:
+            return commit_index.get_path_commits(normalize_path(file_relative_path))
     # 使用git log命令获取文件的提交记录
     result = subprocess.run(
-        ['git', '-C', repo_path, 'log', '--pretty=format:%H', file_relative_path],
+        ['git', '-C', repo_path, 'log', '--full-history', '--pretty=format:%H', '--', file_relative_path],
         capture_output=True,
         text=True,
         check=True
     )
 
-    # 提交记录以换行符分隔
-    commits = result.stdout.strip().split('\n')
+    # 提交记录以换行符分隔，没有提交记录的路径返回空列表（与提交索引一致）
+    commits = result.stdout.split()
 
     return commits
 
 
+def iter_rev_list(repo_path, ref='HEAD', paths=None):
+    """
+    流式运行 git rev-list，依次生成提交哈希，不需要一次读入所有输出。
+    与 get_file_commits、get_paths_commits 一样使用 --full-history，不按路径简化历史
+    :param repo_path: 仓库路径
+    :param ref: 从哪个引用开始遍历
+    :param paths: 只遍历修改过这些路径的提交，为None时遍历所有提交
+    """
+    cmd = ['git', '-C', repo_path, 'rev-list', '--full-history', ref, '--']
+    if paths:
+        cmd.extend(paths)
+    for line in iter_cmd_lines(cmd, text=True):
+        yield line.rstrip('\n')
+
+
+def iter_all_commits(repo_path='.', ref='HEAD'):
+    """
+    依次生成所有提交记录
+    """
+    return iter_rev_list(repo_path, ref)
+
+
+def iter_file_commits(repo_path, file_relative_path, ref='HEAD'):
+    """
+    依次生成文件的提交记录
+    """
+    return iter_rev_list(repo_path, ref, [file_relative_path])
+
+
+def iter_files_commits(repo_path, file_relative_paths, ref='HEAD'):
+    """
+    依次生成修改过任意一个文件的提交记录。路径过多时按 MAX_PATHS_PER_CMD 分批遍历，
+    不同批次的结果可能重复，需要由调用方去重（如构建 CommitSet）
+    """
+    for paths in chunk_paths(file_relative_paths):
+        yield from iter_rev_list(repo_path, ref, paths)
+
+
 def count_file_commits(repo_path, file_relative_path):
     """
     获取文件的提交记录
@@ -201,22 +391,114 @@ def count_file_commits(repo_path, file_relative_path):
     return len(get_file_commits(repo_path, file_relative_path))
 
 
+# 单条 git 命令中最多传入的路径数，避免超出命令行长度限制
+MAX_PATHS_PER_CMD = 1000
+
+
+def chunk_paths(paths, chunk_size=MAX_PATHS_PER_CMD):
+    """
+    将路径列表按 chunk_size 分组
+    """
+    paths = list(paths)
+    for i in range(0, len(paths), chunk_size):
+        yield paths[i:i + chunk_size]
+
+
+class PathsCommitsInfo:
+    """
+    多个路径的提交记录
+    """
+
+    def __init__(self, commits: list, path_commits: dict, unseen_paths: list):
+        """
+        :param commits: 所有路径的提交记录（去重）
+        :param path_commits: 路径 -> 该路径的提交记录
+        :param unseen_paths: 历史中从未出现过的路径
+        """
+        self.commits = commits
+        self.path_commits = path_commits
+        self.unseen_paths = unseen_paths
+
+
+def walk_paths_commits(repo_path, paths, normalized_paths, commits, path_commits):
+    """
+    遍历一次修改过 paths 的历史，将提交记录到 commits，并归属到 path_commits 中对应的原始路径。
+    默认的历史简化依赖路径：合并提交与某个父提交在所有路径上都相同时只沿该父提交遍历，
+    不同的路径集合会剪掉不同的分支，合并遍历的结果无法归属到单个路径。
+    因此使用 --full-history 不简化历史，合并提交使用 -m 列出与每个父提交的差异，
+    合并提交与至少一个父提交在路径上不同时归属到该路径，与逐个路径运行 get_file_commits 的结果一致
+    :param paths: 本次遍历的归一化路径
+    :param normalized_paths: 归一化路径 -> 原始路径列表
+    """
+    cmd = ['git', '-C', repo_path, '-c', 'core.quotePath=false', 'log', '--full-history',
+           '-m', '--name-only', f'--format={COMMIT_START_MARKER}%H', '--']
+    cmd.extend(paths)
+    commit = None
+    for line in iter_cmd_lines(cmd, text=True, errors='replace'):
+        line = line.rstrip('\n')
+        if line.startswith(COMMIT_START_MARKER):
+            # -m 时合并提交与每个父提交的差异各输出一次
+            commit = line[1:]
+            commits[commit] = None
+            continue
+        if not line or commit is None:
+            continue
+        # 修改的文件归属到自身及其所有上级目录中被查询的路径
+        path = line
+        while True:
+            for original_path in normalized_paths.get(path, ()):
+                path_commits[original_path][commit] = None
+            if '/' not in path:
+                break
+            path = path.rsplit('/', 1)[0]
+
+
+def get_paths_commits(repo_path, file_relative_paths, chunk_size=MAX_PATHS_PER_CMD) -> PathsCommitsInfo:
+    """
+    批量获取多个路径（文件或目录）的提交记录。
+    所有路径只需一次 git log --full-history -m --name-only 历史遍历（路径过多时按 chunk_size 分批），
+    再根据每个提交修改的文件归属到各个路径，每个路径的结果与 get_file_commits 一致。
+    仓库建立了提交索引时直接从索引中查询
+    :param repo_path: 仓库路径
+    :param file_relative_paths: 文件或目录的相对路径列表
+    :param chunk_size: 单条 git 命令中最多传入的路径数
+    """
+    # 归一化后的路径 -> 原始路径列表
+    normalized_paths = {}
+    for path in file_relative_paths:
+        normalized_paths.setdefault(normalize_path(path), []).append(path)
+
+    commits = {}
+    path_commits = {path: {} for path in file_relative_paths}
+    commit_index = open_commit_index_if_present(repo_path)
+    if commit_index is not None:
+        # 仓库建立了提交索引时直接从索引中查询，不需要遍历历史
+        with commit_index:
+            for normalized_path, original_paths in normalized_paths.items():
+                for commit in commit_index.get_path_commits(normalized_path):
+                    for original_path in original_paths:
+                        path_commits[original_path][commit] = None
+            commits = dict.fromkeys(commit_index.get_paths_commits(list(normalized_paths)))
+    else:
+        for paths in chunk_paths(normalized_paths, chunk_size):
+            walk_paths_commits(repo_path, paths, normalized_paths,
+                               commits, path_commits)
+
+    unseen_paths = [path for path in file_relative_paths
+                    if not path_commits[path]]
+    return PathsCommitsInfo(list(commits),
+                            {path: list(path_commit) for path,
+                             path_commit in path_commits.items()},
+                            unseen_paths)
+
+
 def get_files_commits(repo_path, file_relative_paths):
     """
     获取多个文件的提交记录
-    :return: 提交记录列表, 不存在的文件列表
+    :return: 提交记录列表, 不存在的文件列表（历史中从未出现过的文件）
     """
-    commits = set()
-    unexist_files = []
-    with LoggerFactory.create_logger(tag=f"{TAG}#get_files_commits") as logger:
-        for file_relative_path in file_relative_paths:
-            try:
-                commits.update(get_file_commits(repo_path, file_relative_path))
-            except Exception as e:
-                unexist_files.append(file_relative_path)
-                logger.error_print(f"Error: {e}")
-                logger.error_print(traceback.format_exc())
-    return list(commits), unexist_files
+    paths_commits_info = get_paths_commits(repo_path, file_relative_paths)
+    return paths_commits_info.commits, paths_commits_info.unseen_paths
 
 
 def count_files_commits(repo_path, file_relative_paths):
@@ -234,12 +516,17 @@ def format_count_files_commits_msg(repo_path, file_relative_paths):
     :param repo_path: 仓库路径
     :param file_relative_paths: 文件相对路径列表
     """
-    commits_count, unexist_files = count_files_commits(
-        repo_path, file_relative_paths)
+    paths_commits_info = get_paths_commits(repo_path, file_relative_paths)
+    commits_count = len(paths_commits_info.commits)
+    unexist_files = paths_commits_info.unseen_paths
+    path_commits_count = {path: len(commits) for path,
+                          commits in paths_commits_info.path_commits.items()}
+    path_commits_count_json = json.dumps(path_commits_count, ensure_ascii=False)
 
     if len(unexist_files) > 0:
+        unexist_files_set = set(unexist_files)
         exist_files = [
-            file for file in file_relative_paths if file not in unexist_files]
+            file for file in file_relative_paths if file not in unexist_files_set]
 
         # 使用 json.dumps 将列表转换为 JSON 字符串
         exist_files_json = json.dumps(exist_files, ensure_ascii=False)
@@ -250,12 +537,14 @@ def format_count_files_commits_msg(repo_path, file_relative_paths):
         return f"Commits count of {exist_files_json}: \n\
             \tpaths_count: {len(exist_files)}, commits_count: {commits_count}\n\
             \tAll paths({len(file_relative_paths)}): {file_relative_paths_json}\n\
-            \tUnexist paths({len(unexist_files)}): {unexist_files_json}"
+            \tUnexist paths({len(unexist_files)}): {unexist_files_json}\n\
+            \tCommits count of each path: {path_commits_count_json}"
     else:
         file_relative_paths_json = json.dumps(
             file_relative_paths, ensure_ascii=False)
         return f"Commits count of {file_relative_paths_json}: \n\
-        \tpaths_count: {len(file_relative_paths)}, commits_count: {commits_count}"
+        \tpaths_count: {len(file_relative_paths)}, commits_count: {commits_count}\n\
+        \tCommits count of each path: {path_commits_count_json}"
 
 
 def show_count_files_commits(repo_path, file_relative_paths):
@@ -284,13 +573,16 @@ def checkout_commit(repo_path, commit_hash):
         return False
 
 
-def get_commit_message(repo_path, commit_hash):
+def get_commit_message(repo_path, commit_hash, session=None):
     """
     获取指定提交的提交信息
     :param repo_path: 仓库路径
     :param commit_hash: 提交哈希
+    :param session: 仓库的 GitSession，传入时通过常驻进程查询，不再启动新的 git 进程
     :return: 提交信息，如果失败则返回None
     """
+    if session is not None:
+        return session.get_commit_message(commit_hash)
     try:
         # 使用git log命令获取提交信息
         result = subprocess.run(
@@ -302,13 +594,16 @@ def get_commit_message(repo_path, commit_hash):
         return None
 
 
-def get_commit_files(repo_path, commit_hash) -> list:
+def get_commit_files(repo_path, commit_hash, session=None) -> list:
     """
     获取指定提交修改的文件
     :param repo_path: 仓库路径
     :param commit_hash: 提交哈希
+    :param session: 仓库的 GitSession，传入时通过常驻进程查询，不再启动新的 git 进程
     :return: 修改的文件列表
     """
+    if session is not None:
+        return session.get_commit_files(commit_hash) or []
     result = subprocess.run(
         ['git', '-C', repo_path, 'show', '--name-only',
             '--pretty=format:', commit_hash],
@@ -332,10 +627,13 @@ def show_commit_count(repo_path='.'):
     print(format_get_commit_count_msg(repo_path=repo_path))
 
 
-def get_commit_diff(repo_path, commit_hash):
+def get_commit_diff(repo_path, commit_hash, session=None):
     """
     获取指定提交的差异内容
+    :param session: 仓库的 GitSession，传入时通过常驻进程查询，不再启动新的 git 进程
     """
+    if session is not None:
+        return session.get_commit_diff(commit_hash)
     try:
         result = subprocess.run(['git', '-C', repo_path, 'show', commit_hash], check=True,
                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
@@ -346,6 +644,464 @@ def get_commit_diff(repo_path, commit_hash):
         return None
 
 
+def get_commit_before_date(repo_path, date, ref='HEAD'):
+    """
+    获取指定日期之前（含）的最后一个提交
+    :param repo_path: 仓库路径
+    :param date: 日期, 格式为 'YYYY-MM-DD'
+    :param ref: 从哪个引用开始查找
+    :return: 提交哈希，如果没有则返回None
+    """
+    result = subprocess.run(
+        ['git', '-C', repo_path, 'rev-list', '-1',
+            f'--before={date}T00:00:00', ref],
+        capture_output=True, text=True, check=True)
+    commit = result.stdout.strip()
+    return commit if commit else None
+
+
+def get_git_dir(repo_path):
+    """
+    获取仓库的 .git 目录的绝对路径
+    """
+    result = subprocess.run(
+        ['git', '-C', repo_path, 'rev-parse', '--absolute-git-dir'],
+        capture_output=True, text=True, check=True)
+    return result.stdout.strip()
+
+
+def get_objects_dir(repo_path):
+    """
+    获取仓库的对象目录的绝对路径（工作树共享主仓库的对象目录）
+    """
+    result = subprocess.run(
+        ['git', '-C', repo_path, 'rev-parse', '--git-path', 'objects'],
+        capture_output=True, text=True, check=True)
+    objects_dir = result.stdout.strip()
+    if not os.path.isabs(objects_dir):
+        objects_dir = os.path.join(repo_path, objects_dir)
+    return os.path.abspath(objects_dir)
+
+
+# commit-graph 文件中的块：提交哈希扇出表、修改路径布隆过滤器索引和数据
+COMMIT_GRAPH_SIGNATURE = b'CGPH'
+COMMIT_GRAPH_CHUNK_OID_FANOUT = b'OIDF'
+COMMIT_GRAPH_CHUNK_BLOOM_INDEXES = b'BIDX'
+COMMIT_GRAPH_CHUNK_BLOOM_DATA = b'BDAT'
+
+
+def read_commit_graph_chunks(graph_file_path):
+    """
+    读取 commit-graph 文件的块表
+    :return: (块 ID 集合, 文件中的提交数)，不是有效的 commit-graph 文件时返回None
+    """
+    with open(graph_file_path, 'rb') as f:
+        # 签名(4) 版本(1) 哈希版本(1) 块数(1) 基础文件数(1)
+        header = f.read(8)
+        if len(header) != 8 or header[:4] != COMMIT_GRAPH_SIGNATURE:
+            return None
+        chunk_count = header[6]
+        # 块表：每项为 块 ID(4) + 偏移(8)，最后一项为结束标记
+        table = f.read(12 * (chunk_count + 1))
+        chunks = {}
+        for i in range(chunk_count):
+            entry = table[i * 12:(i + 1) * 12]
+            chunks[entry[:4]] = int.from_bytes(entry[4:], 'big')
+        commit_count = 0
+        fanout_offset = chunks.get(COMMIT_GRAPH_CHUNK_OID_FANOUT)
+        if fanout_offset is not None:
+            # 扇出表的最后一项为文件中的提交总数
+            f.seek(fanout_offset + 255 * 4)
+            commit_count = int.from_bytes(f.read(4), 'big')
+    return set(chunks), commit_count
+
+
+class CommitGraphInfo:
+    """
+    仓库的 commit-graph 状态
+    """
+
+    def __init__(self, enabled, graph_files, commit_count, has_changed_paths):
+        """
+        :param enabled: git 是否会读取 commit-graph 及其中的布隆过滤器（core.commitGraph、commitGraph.readChangedPaths）
+        :param graph_files: commit-graph 文件列表（单个文件或分层的 commit-graph 链）
+        :param commit_count: commit-graph 中的提交数
+        :param has_changed_paths: 是否所有 commit-graph 文件都包含修改路径布隆过滤器
+        """
+        self.enabled = enabled
+        self.graph_files = graph_files
+        self.commit_count = commit_count
+        self.has_changed_paths = has_changed_paths
+
+    @property
+    def is_used_for_paths(self):
+        """
+        按路径过滤的历史查询是否能使用布隆过滤器跳过不相关的提交
+        """
+        return self.enabled and bool(self.graph_files) and self.has_changed_paths
+
+    def __str__(self):
+        return f"Commit graph: files: {len(self.graph_files)}, commits: {self.commit_count}, " \
+               f"changed-path Bloom filters: {self.has_changed_paths}, enabled: {self.enabled}, " \
+               f"used for path-limited queries: {self.is_used_for_paths}"
+
+
+def get_git_config_bool(repo_path, key, default):
+    result = subprocess.run(['git', '-C', repo_path, 'config', '--type=bool', '--get', key],
+                            capture_output=True, text=True)
+    value = result.stdout.strip()
+    return value == 'true' if value else default
+
+
+def get_commit_graph_info(repo_path) -> CommitGraphInfo:
+    """
+    检测仓库的 commit-graph 及修改路径布隆过滤器是否存在、是否会被使用
+    """
+    info_dir = os.path.join(get_objects_dir(repo_path), 'info')
+    graph_files = []
+    single_graph_file = os.path.join(info_dir, 'commit-graph')
+    chain_file = os.path.join(info_dir, 'commit-graphs', 'commit-graph-chain')
+    if os.path.isfile(chain_file):
+        with open(chain_file) as f:
+            graph_files = [os.path.join(info_dir, 'commit-graphs', f'graph-{line.strip()}.graph')
+                           for line in f if line.strip()]
+    elif os.path.isfile(single_graph_file):
+        graph_files = [single_graph_file]
+
+    commit_count = 0
+    has_changed_paths = bool(graph_files)
+    for graph_file in graph_files:
+        chunks_info = read_commit_graph_chunks(graph_file) if os.path.isfile(graph_file) else None
+        if chunks_info is None:
+            has_changed_paths = False
+            continue
+        chunks, graph_commit_count = chunks_info
+        commit_count += graph_commit_count
+        if COMMIT_GRAPH_CHUNK_BLOOM_INDEXES not in chunks or COMMIT_GRAPH_CHUNK_BLOOM_DATA not in chunks:
+            has_changed_paths = False
+
+    enabled = get_git_config_bool(repo_path, 'core.commitGraph', True) and \
+        get_git_config_bool(repo_path, 'commitGraph.readChangedPaths', True)
+    return CommitGraphInfo(enabled, graph_files, commit_count, has_changed_paths)
+
+
+def write_commit_graph(repo_path, changed_paths=True):
+    """
+    为所有可达的提交写入 commit-graph
+    git commit-graph write --reachable --changed-paths
+    :param changed_paths: 是否计算修改路径布隆过滤器，按路径过滤的历史查询（git log -- <path>）可以跳过大部分树比较
+    """
+    cmd = ['git', '-C', repo_path, 'commit-graph', 'write', '--reachable']
+    if changed_paths:
+        cmd.append('--changed-paths')
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+
+
+def ensure_commit_graph(repo_path, write=False) -> CommitGraphInfo:
+    """
+    在运行历史查询之前检测 commit-graph，write 为True且布隆过滤器不可用时生成
+    :return: 检测（或生成）后的 commit-graph 状态
+    """
+    commit_graph_info = get_commit_graph_info(repo_path)
+    if write and commit_graph_info.enabled and not commit_graph_info.is_used_for_paths:
+        write_commit_graph(repo_path)
+        commit_graph_info = get_commit_graph_info(repo_path)
+    return commit_graph_info
+
+
+def get_worktree_blob_oids(repo_path) -> dict:
+    """
+    获取工作区中内容与暂存区一致的已跟踪文件的 blob 哈希，不需要读取文件内容
+    :param repo_path: 仓库路径
+    :return: 文件相对路径 -> blob 哈希
+    """
+    # 刷新暂存区中的文件状态信息，避免复制出来的仓库中所有文件都被认为已修改
+    subprocess.run(['git', '-C', repo_path, 'update-index', '-q', '--refresh'],
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    result = subprocess.run(
+        ['git', '-C', repo_path, 'ls-files', '-s', '-z'],
+        capture_output=True, check=True)
+    files = {}
+    for entry in result.stdout.split(b'\0'):
+        if not entry:
+            continue
+        # <mode> SP <object> SP <stage> TAB <file>
+        info, file_path = entry.split(b'\t', 1)
+        _, object_hash, _ = info.split(b' ')
+        files[os.fsdecode(file_path)] = object_hash.decode('ascii')
+    # 排除工作区中已修改的文件
+    result = subprocess.run(
+        ['git', '-C', repo_path, 'diff-files', '--name-only', '-z'],
+        capture_output=True, check=True)
+    for file_path in result.stdout.split(b'\0'):
+        if file_path:
+            files.pop(os.fsdecode(file_path), None)
+    return files
+
+
+def list_tree_files(repo_path, revision, paths=None) -> dict:
+    """
+    列出指定版本的树中的所有文件，不需要检出
+    :param repo_path: 仓库路径
+    :param revision: 版本，如提交哈希、分支名
+    :param paths: 只列出这些路径下的文件，为None时列出所有文件
+    :return: 文件相对路径 -> blob 哈希
+    """
+    cmd = ['git', '-C', repo_path, 'ls-tree', '-r', '-z', '--full-tree', revision]
+    if paths:
+        cmd.append('--')
+        cmd.extend(paths)
+    result = subprocess.run(cmd, capture_output=True, check=True)
+    files = {}
+    for entry in result.stdout.split(b'\0'):
+        if not entry:
+            continue
+        # <mode> SP <type> SP <object> TAB <file>
+        info, file_path = entry.split(b'\t', 1)
+        _, object_type, object_hash = info.split(b' ')
+        if object_type == b'blob':
+            files[os.fsdecode(file_path)] = object_hash.decode('ascii')
+    return files
+
+
+class GitObjectReader:
+    """
+    通过常驻的 git cat-file --batch 进程读取对象，避免每读取一个对象都启动一个 git 进程
+    """
+
+    def __init__(self, repo_path):
+        self.repo_path = repo_path
+        self.proc = subprocess.Popen(
+            ['git', '-C', repo_path, 'cat-file', '--batch'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def read_object(self, object_name):
+        """
+        读取对象
+        :param object_name: 对象名，如 blob 哈希、<revision>:<path>
+        :return: (对象哈希, 对象类型, 对象内容 bytes)，对象不存在时返回None
+        """
+        self.proc.stdin.write(object_name.encode('utf-8') + b'\n')
+        self.proc.stdin.flush()
+        return self.read_response()
+
+    def read_response(self):
+        """
+        读取一个请求的结果
+        """
+        header = self.proc.stdout.readline()
+        if not header:
+            raise Exception(f"git cat-file exited unexpectedly in {self.repo_path}")
+        parts = header.split()
+        # <object_name> missing / <object_name> ambiguous
+        if len(parts) != 3:
+            return None
+        object_hash, object_type, object_size = parts
+        content = self.proc.stdout.read(int(object_size))
+        # 内容后面的换行符
+        self.proc.stdout.read(1)
+        return object_hash.decode('ascii'), object_type.decode('ascii'), content
+
+    def read_objects(self, object_names) -> list:
+        """
+        流水线读取多个对象：先一次写入所有对象名，再依次读取结果。
+        对象名过多时由调用方分批，保证一批请求小于管道缓冲区
+        :return: 每个对象的 (对象哈希, 对象类型, 对象内容 bytes)，对象不存在时为None
+        """
+        self.proc.stdin.write(b''.join(name.encode('utf-8') + b'\n' for name in object_names))
+        self.proc.stdin.flush()
+        return [self.read_response() for _ in object_names]
+
+    def read_blob(self, object_name) -> bytes:
+        """
+        读取 blob 对象的内容，对象不存在时返回None
+        """
+        result = self.read_object(object_name)
+        return result[2] if result else None
+
+    def close(self):
+        if self.proc.poll() is None:
+            self.proc.stdin.close()
+            self.proc.wait()
+        self.proc.stdout.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+        return False
+
+
+# 流水线请求时每批写入的对象名数，保证一批请求小于管道缓冲区，避免与 git 进程互相等待
+PIPELINE_CHUNK_SIZE = 256
+# 常驻 git diff-tree --stdin 进程的输出分隔行：不是提交哈希的输入行会被原样输出
+DIFF_TREE_END_MARKER = '\x01end-of-diff-tree\x01'
+
+
+class GitSession:
+    """
+    仓库的常驻 git 会话：保持 git cat-file --batch / --batch-check 以及 git diff-tree --stdin 进程，
+    逐个提交的查询通过管道完成，不再为每个提交启动一个 git 进程。
+    批量查询（get_commit_messages 等）按 PIPELINE_CHUNK_SIZE 分批一次写入请求再依次读取结果。
+    进程在第一次使用时启动，close 时关闭，可以用作上下文管理器
+    """
+
+    def __init__(self, repo_path):
+        self.repo_path = repo_path
+        self.object_reader = None
+        self.check_proc = None
+        # diff-tree 参数 -> 常驻进程
+        self.diff_tree_procs = {}
+
+    def get_object_reader(self) -> GitObjectReader:
+        if self.object_reader is None:
+            self.object_reader = GitObjectReader(self.repo_path)
+        return self.object_reader
+
+    def check_objects(self, object_names) -> list:
+        """
+        批量查询对象信息（git cat-file --batch-check）
+        :param object_names: 对象名列表，如提交哈希、分支名、<revision>:<path>
+        :return: 每个对象的 (对象哈希, 对象类型, 对象大小)，对象不存在时为None
+        """
+        if self.check_proc is None:
+            self.check_proc = subprocess.Popen(
+                ['git', '-C', self.repo_path, 'cat-file', '--batch-check'],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, errors='replace')
+        results = []
+        for names in chunk_paths(object_names, PIPELINE_CHUNK_SIZE):
+            self.check_proc.stdin.write(''.join(f'{name}\n' for name in names))
+            self.check_proc.stdin.flush()
+            for _ in names:
+                line = self.check_proc.stdout.readline()
+                if not line:
+                    raise Exception(f"git cat-file exited unexpectedly in {self.repo_path}")
+                parts = line.split()
+                # <object_name> missing / <object_name> ambiguous
+                if len(parts) != 3:
+                    results.append(None)
+                else:
+                    results.append((parts[0], parts[1], int(parts[2])))
+        return results
+
+    def resolve_commits(self, commits) -> list:
+        """
+        :return: 每个提交的完整哈希，不是提交时为None
+        """
+        return [info[0] if info and info[1] == 'commit' else None
+                for info in self.check_objects(commits)]
+
+    def get_commit_messages(self, commits):
+        """
+        批量获取提交信息，与 git log --format=%B 的结果一致（去除首尾空白）
+        :return: 依次生成每个提交的提交信息，不是提交时为None
+        """
+        reader = self.get_object_reader()
+        for names in chunk_paths(commits, PIPELINE_CHUNK_SIZE):
+            for result in reader.read_objects(names):
+                if result is None or result[1] != 'commit':
+                    yield None
+                    continue
+                headers, _, message = result[2].partition(b'\n\n')
+                encoding = 'utf-8'
+                for header in headers.split(b'\n'):
+                    if header.startswith(b'encoding '):
+                        encoding = header[len(b'encoding '):].decode('ascii', errors='replace')
+                try:
+                    yield message.decode(encoding, errors='replace').strip()
+                except LookupError:
+                    yield message.decode('utf-8', errors='replace').strip()
+
+    def get_commit_message(self, commit):
+        return next(self.get_commit_messages([commit]))
+
+    def run_diff_tree(self, commits, args):
+        """
+        通过常驻的 git diff-tree --stdin 进程获取提交的差异输出
+        :param args: diff-tree 参数
+        :return: 依次生成每个提交的输出行列表，不是提交时为None
+        """
+        proc = self.diff_tree_procs.get(args)
+        if proc is None:
+            proc = subprocess.Popen(
+                ['git', '-C', self.repo_path, 'diff-tree', '--stdin', '--root'] + list(args),
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, errors='replace')
+            self.diff_tree_procs[args] = proc
+        end_line = f'{DIFF_TREE_END_MARKER}\n'
+        for names in chunk_paths(commits, PIPELINE_CHUNK_SIZE):
+            # diff-tree --stdin 只接受完整的提交哈希
+            oids = self.resolve_commits(names)
+            proc.stdin.write(''.join(f'{oid}\n{end_line}' for oid in oids if oid))
+            proc.stdin.flush()
+            # 先读完这一批的所有输出，调用方中途停止迭代也不会在管道中留下未读的输出
+            outputs = []
+            for oid in oids:
+                if oid is None:
+                    outputs.append(None)
+                    continue
+                lines = []
+                while True:
+                    line = proc.stdout.readline()
+                    if not line:
+                        raise Exception(f"git diff-tree exited unexpectedly in {self.repo_path}")
+                    if line == end_line:
+                        break
+                    lines.append(line)
+                outputs.append(lines)
+            yield from outputs
+
+    def get_commits_files(self, commits):
+        """
+        批量获取提交修改的文件，与 git show --name-only 的结果一致（合并提交只包含与所有父提交都不同的文件）
+        :return: 依次生成每个提交修改的文件列表，不是提交时为None
+        """
+        for lines in self.run_diff_tree(commits, ('-r', '--name-only', '-c', '--format=')):
+            yield None if lines is None else [line.rstrip('\n') for line in lines if line != '\n']
+
+    def get_commit_files(self, commit) -> list:
+        return next(self.get_commits_files([commit]))
+
+    def get_commit_diffs(self, commits):
+        """
+        批量获取提交的差异内容，与 git show 的输出一致（合并提交 Merge 行中的父提交为完整哈希）
+        :return: 依次生成每个提交的差异内容，不是提交时为None
+        """
+        for lines in self.run_diff_tree(commits, ('--cc', '--pretty=medium')):
+            if lines is None:
+                yield None
+                continue
+            # 第二个及之后的提交前会输出一个空行
+            if lines and lines[0] == '\n':
+                lines = lines[1:]
+            yield ''.join(lines)
+
+    def get_commit_diff(self, commit):
+        return next(self.get_commit_diffs([commit]))
+
+    def close(self):
+        if self.object_reader is not None:
+            self.object_reader.close()
+            self.object_reader = None
+        procs = list(self.diff_tree_procs.values())
+        if self.check_proc is not None:
+            procs.append(self.check_proc)
+        for proc in procs:
+            if proc.poll() is None:
+                proc.stdin.close()
+                proc.wait()
+            proc.stdout.close()
+        self.check_proc = None
+        self.diff_tree_procs = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+        return False
+
+
 class RepoSizeInfo:
     """
     size: 0
@@ -376,8 +1132,12 @@ class RepoSizeInfo:
                f"size-garbage: {self.size_garbage}"
 
 
-def get_repo_size_change_info(before: RepoSizeInfo, after: RepoSizeInfo) -> str:
-    return \
+def get_repo_size_change_info(before: RepoSizeInfo, after: RepoSizeInfo, seconds=None) -> str:
+    """
+    格式化仓库大小的变化
+    :param seconds: 瘦身花费的秒数，提供时同时显示每秒减少的大小
+    """
+    change_info = \
         f"size: {before.size} -> {after.size}\n" \
         f"in-pack: {before.in_pack} -> {after.in_pack}\n" \
         f"packs: {before.packs} -> {after.packs}\n" \
@@ -385,24 +1145,84 @@ def get_repo_size_change_info(before: RepoSizeInfo, after: RepoSizeInfo) -> str:
         f"prune-packable: {before.prune_packable} -> {after.prune_packable}\n" \
         f"garbage: {before.garbage} -> {after.garbage}\n" \
         f"size-garbage: {before.size_garbage} -> {after.size_garbage}"
+    if seconds is not None:
+        # 松散对象、包和垃圾文件的总大小（KiB）
+        reduced = (before.size + before.size_pack + before.size_garbage) - \
+            (after.size + after.size_pack + after.size_garbage)
+        per_second = reduced / seconds if seconds > 0 else 0.0
+        change_info += f"\nreduced: {reduced} KiB in {seconds:.2f}s, {per_second:.2f} KiB/s"
+    return change_info
+
+
+# 仓库瘦身级别
+# 不瘦身（git filter-repo 已经清理过引用日志并打包）
+SLIM_LEVEL_NONE = 'none'
+# git gc --prune=now，复用已有的增量
+SLIM_LEVEL_FAST = 'fast'
+# git repack -a -d -f，按指定的窗口、深度、线程数重新计算增量
+SLIM_LEVEL_REPACK = 'repack'
+# git gc --prune=now --aggressive，最小但最慢
+SLIM_LEVEL_AGGRESSIVE = 'aggressive'
+SLIM_LEVELS = [SLIM_LEVEL_NONE, SLIM_LEVEL_FAST,
+               SLIM_LEVEL_REPACK, SLIM_LEVEL_AGGRESSIVE]
+# repack 级别的默认增量窗口和深度
+DEFAULT_REPACK_WINDOW = 50
+DEFAULT_REPACK_DEPTH = 50
+
+
+def get_slim_repo_cmds(slim_level=SLIM_LEVEL_AGGRESSIVE, repack_window=None, repack_depth=None,
+                       repack_threads=None, write_bitmap=False) -> list:
+    """
+    获取仓库瘦身需要依次运行的命令
+    :param slim_level: 瘦身级别，见 SLIM_LEVELS
+    :param repack_window: repack 级别的增量窗口，为None时使用 DEFAULT_REPACK_WINDOW
+    :param repack_depth: repack 级别的最大增量深度，为None时使用 DEFAULT_REPACK_DEPTH
+    :param repack_threads: repack 级别计算增量的线程数，为None时由 git 根据 CPU 核数决定
+    :param write_bitmap: 是否写入可达性位图，加速之后从新仓库克隆、获取（none 级别不重新打包，不写入）
+    :return: 命令列表
+    """
+    if slim_level not in SLIM_LEVELS:
+        raise ValueError(f"Unknown slim level: {slim_level}, available: {SLIM_LEVELS}")
+    if slim_level == SLIM_LEVEL_NONE:
+        return []
+    # git reflog expire --expire=now --all
+    cmds = [['git', 'reflog', 'expire', '--expire=now', '--all']]
+    if slim_level == SLIM_LEVEL_REPACK:
+        repack_cmd = ['git', 'repack', '-a', '-d', '-f',
+                      f'--window={repack_window or DEFAULT_REPACK_WINDOW}',
+                      f'--depth={repack_depth or DEFAULT_REPACK_DEPTH}']
+        if repack_threads is not None:
+            repack_cmd.append(f'--threads={repack_threads}')
+        if write_bitmap:
+            repack_cmd.append('--write-bitmap-index')
+        cmds.append(repack_cmd)
+        cmds.append(['git', 'prune', '--expire=now'])
+    else:
+        gc_cmd = ['git']
+        if write_bitmap:
+            gc_cmd.extend(['-c', 'repack.writeBitmaps=true'])
+        gc_cmd.extend(['gc', '--prune=now'])
+        if slim_level == SLIM_LEVEL_AGGRESSIVE:
+            gc_cmd.append('--aggressive')
+        cmds.append(gc_cmd)
+    return cmds
 
 
-def get_repo_size_info() -> RepoSizeInfo:
+def get_repo_size_info(repo_path=None) -> RepoSizeInfo:
     """
-    获取仓库的大小信息 git count-objects -v
+    获取仓库的大小信息 git count-objects -v，按字段名解析（第一行是松散对象数 count）
+    :param repo_path: 仓库路径，为None时为当前目录
     """
-    result = subprocess.run(
-        ['git', 'count-objects', '-v'], stdout=subprocess.PIPE)
-    repo_size = result.stdout.decode('utf-8').split('\n')
-    # 提取信息
-    size = int(repo_size[0].split(': ')[1])
-    in_pack = int(repo_size[1].split(': ')[1])
-    packs = int(repo_size[2].split(': ')[1])
-    size_pack = int(repo_size[3].split(': ')[1])
-    prune_packable = int(repo_size[4].split(': ')[1])
-    garbage = int(repo_size[5].split(': ')[1])
-    size_garbage = int(repo_size[6].split(': ')[1])
-    return RepoSizeInfo(size, in_pack, packs, size_pack, prune_packable, garbage, size_garbage)
+    cmd = ['git', 'count-objects', '-v'] if repo_path is None \
+        else ['git', '-C', repo_path, 'count-objects', '-v']
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, check=True)
+    # <字段名>: <值>
+    fields = {}
+    for line in result.stdout.decode('utf-8').splitlines():
+        key, _, value = line.partition(': ')
+        fields[key] = int(value)
+    return RepoSizeInfo(fields['size'], fields['in-pack'], fields['packs'], fields['size-pack'],
+                        fields['prune-packable'], fields['garbage'], fields['size-garbage'])
 
 
 def show_repo_size_info():
@@ -410,40 +1230,118 @@ def show_repo_size_info():
     print(repo_size)
 
 
-def get_earliest_commit_date(repo_path):
-    """
-    获取仓库最早提交时间的函数（通用版本）
-    """
-    # Navigate to the repository path
-    command = ["git", "-C", repo_path, "log",
-               "--reverse", "--pretty=format:%ci"]
+# (仓库路径, 引用指向的提交, since, until) -> 最早提交时间，只在当前进程内有效
+EARLIEST_COMMIT_DATE_CACHE = {}
+# 持久化的最早提交时间缓存文件名，与提交索引一样位于仓库 .git 目录下的 git-utils 目录
+EARLIEST_COMMIT_DATE_CACHE_FILE_NAME = 'earliest-commit-date.json'
 
-    # Execute the command and capture the output
-    result = subprocess.run(command, stdout=subprocess.PIPE,
-                            stderr=subprocess.PIPE, universal_newlines=True)
 
-    # Check if there was an error
-    if result.returncode != 0:
-        raise Exception(f"Error running git command: {result.stderr.strip()}")
+def get_earliest_commit_date_cache_path(git_dir):
+    return os.path.join(git_dir, 'git-utils', EARLIEST_COMMIT_DATE_CACHE_FILE_NAME)
 
-    # Get the output, which is the list of commit dates
-    commit_dates = result.stdout.strip().split('\n')
 
-    # The first date in the list is the earliest commit date
-    earliest_commit_date_str = commit_dates[0]
+def load_earliest_commit_dates(cache_path) -> dict:
+    """
+    :return: "引用指向的提交 since until" -> 最早提交时间字符串（git log %ci 格式），没有提交时为None
+    """
+    if not os.path.isfile(cache_path):
+        return {}
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        # 缓存损坏时重新计算
+        return {}
 
-    # Convert the date string to a datetime object
-    earliest_commit_date = datetime.datetime.strptime(
-        earliest_commit_date_str, "%Y-%m-%d %H:%M:%S %z")
 
+def save_earliest_commit_date(cache_path, key, earliest_commit_date_str):
+    """
+    提交的历史不会改变，同一个提交和时间范围的最早提交时间可以跨进程复用；写入失败（如只读仓库）时只是不缓存
+    """
+    earliest_commit_dates = load_earliest_commit_dates(cache_path)
+    earliest_commit_dates[key] = earliest_commit_date_str
+    temp_path = cache_path + '.tmp'
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(earliest_commit_dates, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        pass
+
+
+def get_earliest_commit_date(repo_path, ref='HEAD', since=None, until=None):
+    """
+    获取仓库最早提交时间的函数（通用版本）
+    不指定时间范围时只需要查找根提交（git log --max-parents=0），有多个根提交时取最早的一个；
+    指定时间范围时流式遍历范围内的提交取最早的提交时间。
+    仓库建立了提交索引时直接从索引中读取。
+    结果按引用指向的提交和时间范围缓存在进程内，并持久化到 .git/git-utils/earliest-commit-date.json，
+    之后的进程查询同一个提交时不需要再遍历历史
+    :param repo_path: 仓库路径
+    :param ref: 从哪个引用开始查找
+    :param since: 只查找该时间之后的提交，格式为 'YYYY-MM-DD'
+    :param until: 只查找该时间之前的提交，格式为 'YYYY-MM-DD'
+    :return: 最早提交时间 datetime，没有提交时返回None
+    """
+    result = subprocess.run(['git', '-C', repo_path, 'rev-parse', '--absolute-git-dir', '--verify', '-q', ref],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(f"Error resolving {ref} in {repo_path}: {result.stderr.strip()}")
+    git_dir, tip = result.stdout.split()
+    cache_key = (os.path.abspath(repo_path), tip, since, until)
+    if cache_key in EARLIEST_COMMIT_DATE_CACHE:
+        return EARLIEST_COMMIT_DATE_CACHE[cache_key]
+
+    cache_path = get_earliest_commit_date_cache_path(git_dir)
+    persisted_key = f"{tip} {since or ''} {until or ''}"
+    earliest_commit_dates = load_earliest_commit_dates(cache_path)
+    if persisted_key in earliest_commit_dates:
+        earliest_commit_date_str = earliest_commit_dates[persisted_key]
+    else:
+        earliest_commit_date_str = None
+        commit_index = None
+        if since is None and until is None and ref == 'HEAD':
+            commit_index = open_commit_index_if_present(repo_path)
+        if commit_index is not None:
+            with commit_index:
+                earliest_commit_date_str = commit_index.get_earliest_commit_date()
+        else:
+            command = ['git', '-C', repo_path, 'log', '--format=%ct %ci']
+            if since is None and until is None:
+                command.append('--max-parents=0')
+            if since is not None:
+                command.append(f'--since={since}T00:00:00')
+            if until is not None:
+                command.append(f'--until={until}T00:00:00')
+            command.append(tip)
+            # 流式读取，只保留最早的提交时间
+            earliest_commit_time = None
+            try:
+                for line in iter_cmd_lines(command, text=True):
+                    commit_time, commit_date_str = line.rstrip('\n').split(' ', 1)
+                    if earliest_commit_time is None or int(commit_time) < earliest_commit_time:
+                        earliest_commit_time = int(commit_time)
+                        earliest_commit_date_str = commit_date_str
+            except subprocess.CalledProcessError as e:
+                raise Exception(f"Error running git command: {e.stderr.strip()}")
+        save_earliest_commit_date(cache_path, persisted_key, earliest_commit_date_str)
+
+    earliest_commit_date = None
+    if earliest_commit_date_str:
+        # Convert the date string to a datetime object
+        earliest_commit_date = datetime.datetime.strptime(
+            earliest_commit_date_str, "%Y-%m-%d %H:%M:%S %z")
+    EARLIEST_COMMIT_DATE_CACHE[cache_key] = earliest_commit_date
     return earliest_commit_date
 
 
-def format_get_earliest_commit_date_msg(repo_path='.'):
+def format_get_earliest_commit_date_msg(repo_path='.', since=None, until=None):
     """
     获取并格式化仓库最早提交时间信息
     """
-    earliest_commit_date = get_earliest_commit_date(repo_path=repo_path)
+    earliest_commit_date = get_earliest_commit_date(
+        repo_path=repo_path, since=since, until=until)
     return f"Earliest commit date: {earliest_commit_date}"
 
 
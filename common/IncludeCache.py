@@ -0,0 +1,153 @@
+import os
+import sqlite3
+import time
+from common.GitUtils import get_git_dir
+
+# 缓存文件名
+INCLUDE_CACHE_FILE_NAME = 'include-cache.sqlite'
+# 默认最多保留的缓存条目数
+DEFAULT_MAX_ENTRIES = 1000000
+# 默认缓存条目最长保留天数（自最后一次使用起）
+DEFAULT_MAX_AGE_DAYS = 90
+# 待写入的条目数达到该值时写回数据库
+FLUSH_THRESHOLD = 1000
+
+
+class IncludeCache:
+    """
+    持久化的头文件名缓存：blob 哈希 -> 文件中 #include 的头文件名列表。
+    内容相同的文件 blob 哈希相同，因此重复运行、在相邻提交上运行时只需要解析内容发生变化的文件。
+    不同扫描引擎的结果分开缓存。
+    """
+
+    def __init__(self, cache_path, max_entries=DEFAULT_MAX_ENTRIES, max_age_days=DEFAULT_MAX_AGE_DAYS):
+        """
+        :param cache_path: 缓存数据库文件路径
+        :param max_entries: 最多保留的缓存条目数，关闭时淘汰最久未使用的条目，为None时不限制
+        :param max_age_days: 缓存条目最长保留天数，关闭时淘汰超时的条目，为None时不限制
+        """
+        cache_dir = os.path.dirname(cache_path)
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.conn = sqlite3.connect(cache_path)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS include_cache ('
+            'oid TEXT NOT NULL, engine TEXT NOT NULL, include_names TEXT NOT NULL, '
+            'last_used INTEGER NOT NULL, PRIMARY KEY (oid, engine))')
+        self.conn.execute(
+            'CREATE INDEX IF NOT EXISTS include_cache_last_used ON include_cache (last_used)')
+        self.conn.commit()
+        self.now = int(time.time())
+        # 待写入的条目 (oid, engine) -> include_names
+        self.pending = {}
+        # 命中过、需要更新最后使用时间的条目
+        self.touched = set()
+        self.hit_count = 0
+        self.miss_count = 0
+
+    def get(self, oid, engine):
+        """
+        :return: 头文件名列表，未缓存时返回None
+        """
+        key = (oid, engine)
+        include_names = self.pending.get(key)
+        if include_names is None:
+            row = self.conn.execute(
+                'SELECT include_names FROM include_cache WHERE oid = ? AND engine = ?', key).fetchone()
+            if row is None:
+                self.miss_count += 1
+                return None
+            include_names = row[0].split('\n') if row[0] else []
+            self.touched.add(key)
+        self.hit_count += 1
+        return include_names
+
+    def put(self, oid, engine, include_names):
+        self.pending[(oid, engine)] = list(include_names)
+        if len(self.pending) >= FLUSH_THRESHOLD:
+            self.flush()
+
+    def flush(self):
+        """
+        将待写入的条目和最后使用时间写回数据库
+        """
+        if self.pending:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO include_cache (oid, engine, include_names, last_used) VALUES (?, ?, ?, ?)',
+                [(oid, engine, '\n'.join(include_names), self.now)
+                 for (oid, engine), include_names in self.pending.items()])
+            self.pending.clear()
+        if self.touched:
+            self.conn.executemany(
+                'UPDATE include_cache SET last_used = ? WHERE oid = ? AND engine = ?',
+                [(self.now, oid, engine) for oid, engine in self.touched])
+            self.touched.clear()
+        self.conn.commit()
+
+    def evict(self, max_entries=None, max_age_days=None):
+        """
+        淘汰缓存条目
+        :param max_entries: 最多保留的条目数，超出时淘汰最久未使用的条目
+        :param max_age_days: 淘汰超过该天数未使用的条目
+        :return: 淘汰的条目数
+        """
+        self.flush()
+        evicted_count = 0
+        if max_age_days is not None:
+            expire_time = self.now - int(max_age_days * 24 * 3600)
+            evicted_count += self.conn.execute(
+                'DELETE FROM include_cache WHERE last_used < ?', (expire_time,)).rowcount
+        if max_entries is not None:
+            evicted_count += self.conn.execute(
+                'DELETE FROM include_cache WHERE rowid IN ('
+                'SELECT rowid FROM include_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)',
+                (max_entries,)).rowcount
+        self.conn.commit()
+        return evicted_count
+
+    def count(self):
+        self.flush()
+        return self.conn.execute('SELECT COUNT(*) FROM include_cache').fetchone()[0]
+
+    def format_stats_msg(self):
+        total = self.hit_count + self.miss_count
+        hit_ratio = self.hit_count / total if total else 0.0
+        return f"Include cache: hits: {self.hit_count}, misses: {self.miss_count}, " \
+               f"hit ratio: {hit_ratio:.2%}, path: {self.cache_path}"
+
+    def close(self):
+        if self.conn is None:
+            return
+        self.evict(self.max_entries, self.max_age_days)
+        self.conn.close()
+        self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+        return False
+
+
+def get_include_cache_path(repo_path, cache_dir=None):
+    """
+    获取缓存数据库文件路径
+    :param repo_path: 仓库路径
+    :param cache_dir: 缓存目录，为None时使用仓库 .git 目录下的 git-utils 目录
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(get_git_dir(repo_path), 'git-utils')
+    return os.path.join(cache_dir, INCLUDE_CACHE_FILE_NAME)
+
+
+def open_include_cache(repo_path, cache_dir=None) -> IncludeCache:
+    """
+    打开仓库的头文件名缓存
+    :param repo_path: 仓库路径
+    :param cache_dir: 缓存目录，为None时使用仓库 .git 目录下的 git-utils 目录
+    """
+    return IncludeCache(get_include_cache_path(repo_path, cache_dir))
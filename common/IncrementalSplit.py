@@ -0,0 +1,194 @@
+import os
+import json
+import sqlite3
+import subprocess
+from common.GitUtils import get_git_dir
+
+# 增量分割状态文件名，位于新仓库 .git 目录下的 git-utils 目录
+SPLIT_STATE_FILE_NAME = 'incremental-split.json'
+# 原始提交到新提交的对应关系文件名，位于新仓库 .git 目录下的 git-utils 目录
+SPLIT_COMMIT_MAP_FILE_NAME = 'split-commit-map.sqlite'
+# 每批写入数据库的提交数
+INSERT_BATCH_SIZE = 5000
+
+
+def get_split_state_path(repo_path):
+    return os.path.join(get_git_dir(repo_path), 'git-utils', SPLIT_STATE_FILE_NAME)
+
+
+def get_split_commit_map_path(repo_path):
+    return os.path.join(get_git_dir(repo_path), 'git-utils', SPLIT_COMMIT_MAP_FILE_NAME)
+
+
+class SplitState:
+    """
+    新仓库的增量分割状态：分割请求（目标路径、日期窗口等）、实际过滤使用的路径，以及上次处理到的原始仓库引用。
+    分割请求不变、原始仓库的引用只是前进时，只需要过滤新增的提交并追加到新仓库中
+    """
+
+    def __init__(self, request: dict, filter_targets, path_globs, source_refs: dict, base_branch):
+        """
+        :param request: 分割请求参数，不同时不能增量分割
+        :param filter_targets: 归并后 git filter-repo 使用的路径，增量分割时沿用，保证过滤结果与上次一致
+        :param path_globs: git filter-repo 使用的路径通配符
+        :param source_refs: 上次处理到的原始仓库引用，引用名 -> 对象哈希
+        :param base_branch: 新分支所基于的分支，增量分割后新分支快进到该分支
+        """
+        self.request = request
+        self.filter_targets = list(filter_targets)
+        self.path_globs = list(path_globs)
+        self.source_refs = dict(source_refs)
+        self.base_branch = base_branch
+
+    def save(self, repo_path):
+        state_path = get_split_state_path(repo_path)
+        os.makedirs(os.path.dirname(state_path), exist_ok=True)
+        with open(state_path, 'w', encoding='utf-8') as f:
+            json.dump(self.__dict__, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, repo_path):
+        """
+        :return: 仓库中保存的增量分割状态，不存在时返回None
+        """
+        state_path = get_split_state_path(repo_path)
+        if not os.path.isfile(state_path):
+            return None
+        with open(state_path, 'r', encoding='utf-8') as f:
+            return cls(**json.load(f))
+
+
+class SplitCommitMap:
+    """
+    持久化的原始提交到新提交的对应关系，被跳过的提交对应替代它的提交（祖先全部被跳过时为空）。
+    增量分割只过滤新增的提交，新增提交的父提交、新的引用和标签指向已经分割过的提交时，由它转换为新仓库中的提交
+    """
+
+    def __init__(self, map_path):
+        map_dir = os.path.dirname(map_path)
+        if map_dir and not os.path.exists(map_dir):
+            os.makedirs(map_dir)
+        self.map_path = map_path
+        self.conn = sqlite3.connect(map_path)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS commit_map ('
+            'source TEXT PRIMARY KEY, target TEXT)')
+        self.conn.commit()
+
+    def __getitem__(self, source_hash: bytes):
+        """
+        :return: 新提交哈希，祖先全部被跳过时为None
+        :raise KeyError: 原始提交没有被分割过
+        """
+        row = self.conn.execute('SELECT target FROM commit_map WHERE source = ?',
+                                (source_hash.decode(),)).fetchone()
+        if row is None:
+            raise KeyError(source_hash)
+        return row[0].encode() if row[0] else None
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM commit_map').fetchone()[0]
+
+    def update(self, commit_map: dict):
+        """
+        :param commit_map: 原始提交哈希 -> 新提交哈希（或None），见 FilterRepoStats.commit_map
+        """
+        rows = [(source.decode(), target.decode() if target else None)
+                for source, target in commit_map.items()]
+        for start in range(0, len(rows), INSERT_BATCH_SIZE):
+            self.conn.executemany('INSERT OR REPLACE INTO commit_map VALUES (?, ?)',
+                                  rows[start:start + INSERT_BATCH_SIZE])
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def get_refs(repo_path) -> dict:
+    """
+    获取仓库的所有引用，引用名 -> 对象哈希（附注标签为标签对象的哈希）
+    """
+    result = subprocess.run(
+        ['git', '-C', repo_path, 'for-each-ref', '--format=%(objectname) %(refname)'],
+        capture_output=True, text=True, check=True)
+    refs = {}
+    for line in result.stdout.splitlines():
+        oid, refname = line.split(' ', 1)
+        refs[refname] = oid
+    return refs
+
+
+def is_ancestor(repo_path, ancestor, descendant):
+    result = subprocess.run(
+        ['git', '-C', repo_path, 'merge-base', '--is-ancestor', ancestor, descendant],
+        capture_output=True)
+    return result.returncode == 0
+
+
+def get_rewritten_refs(repo_path, old_refs: dict, new_refs: dict) -> list:
+    """
+    获取被改写的引用：旧的指向不再是新的指向的祖先（如强制推送），此时无法增量分割。
+    被删除的引用不影响已经分割的历史，不计入
+    """
+    return [refname for refname, old_oid in old_refs.items()
+            if refname in new_refs and new_refs[refname] != old_oid
+            and not is_ancestor(repo_path, old_oid, new_refs[refname])]
+
+
+def get_changed_refs(old_refs: dict, new_refs: dict) -> list:
+    """
+    获取新增或前进的引用
+    """
+    return sorted(refname for refname, oid in new_refs.items() if old_refs.get(refname) != oid)
+
+
+def get_incremental_refs_args(old_refs: dict, new_refs: dict) -> list:
+    """
+    git filter-repo --refs 的参数：新增或前进的引用，排除旧的引用可达的提交
+    """
+    return get_changed_refs(old_refs, new_refs) + [f'^{oid}' for oid in sorted(set(old_refs.values()))]
+
+
+def count_new_commits(repo_path, old_refs: dict, new_refs: dict):
+    """
+    统计新的引用可达、旧的引用不可达的提交数
+    """
+    new_oids = sorted(set(new_refs.values()) - set(old_refs.values()))
+    if not new_oids:
+        return 0
+    # git rev-list --stdin 不支持 --not，使用 ^<oid> 排除
+    revs = new_oids + [f'^{oid}' for oid in sorted(set(old_refs.values()))]
+    result = subprocess.run(['git', '-C', repo_path, 'rev-list', '--count', '--stdin'],
+                            input='\n'.join(revs) + '\n',
+                            capture_output=True, text=True, check=True)
+    return int(result.stdout.strip())
+
+
+def get_full_split_reason(split_state: SplitState, request: dict, original_repo_path,
+                          new_repo_path, source_refs: dict):
+    """
+    检查能否增量分割
+    :return: 不能增量分割（需要完整分割）的原因，可以增量分割时返回None
+    """
+    if split_state is None:
+        return "no incremental split state in the new repo"
+    if split_state.request != request:
+        return f"split request changed: {split_state.request} -> {request}"
+    if not os.path.isfile(get_split_commit_map_path(new_repo_path)):
+        return "split commit map is missing"
+    rewritten_refs = get_rewritten_refs(original_repo_path, split_state.source_refs, source_refs)
+    if rewritten_refs:
+        return f"refs rewritten in the original repo: {rewritten_refs}"
+    return None
+
+
+def get_current_branch(repo_path):
+    result = subprocess.run(['git', '-C', repo_path, 'symbolic-ref', '--short', 'HEAD'],
+                            capture_output=True, text=True, check=True)
+    return result.stdout.strip()
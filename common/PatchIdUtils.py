@@ -0,0 +1,266 @@
+import os
+import subprocess
+import threading
+from common.CommitSet import CommitSet, new_buckets, sort_buckets, iter_oids
+from common.FileUtils import collapse_paths, remove_prefix_slash_and_dot
+from common.GitUtils import iter_all_commits, iter_files_commits, chunk_paths, MAX_PATHS_PER_CMD
+
+# 默认的并行流水线数
+DEFAULT_PATCH_ID_WORKERS = os.cpu_count() or 4
+# 每次分配给同一条流水线的连续提交数，相邻提交的树对象更可能命中 git 的缓存
+COMMITS_PER_BLOCK = 64
+# patch-id 和提交哈希的二进制长度
+OID_SIZE = 20
+# 记录：patch-id(20) + 提交哈希(20)
+RECORD_SIZE = OID_SIZE * 2
+
+
+class PatchIdPipeline:
+    """
+    一条 git diff-tree --stdin -p | git patch-id --stable 流水线。
+    写入的提交哈希由 diff-tree 生成差异，patch-id 计算与提交哈希无关的差异指纹，
+    后台线程读取结果并按 patch-id 的第一个字节追加到桶中
+    """
+
+    def __init__(self, repo_path, paths=None):
+        diff_tree_cmd = ['git', '-C', repo_path, 'diff-tree', '--stdin', '--root', '-p']
+        if paths:
+            diff_tree_cmd.append('--')
+            diff_tree_cmd.extend(paths)
+        self.diff_tree = subprocess.Popen(
+            diff_tree_cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self.patch_id = subprocess.Popen(
+            ['git', '-C', repo_path, 'patch-id', '--stable'],
+            stdin=self.diff_tree.stdout, stdout=subprocess.PIPE)
+        # 只由 patch-id 进程读取 diff-tree 的输出
+        self.diff_tree.stdout.close()
+        self.buckets = new_buckets()
+        self.reader = threading.Thread(target=self.read_patch_ids, daemon=True)
+        self.reader.start()
+
+    def read_patch_ids(self):
+        for line in self.patch_id.stdout:
+            # <patch-id> SP <commit>
+            patch_id, commit = line.split()
+            record = bytes.fromhex(patch_id.decode('ascii')) + bytes.fromhex(commit.decode('ascii'))
+            self.buckets[record[0]] += record
+
+    def write(self, commits):
+        self.diff_tree.stdin.write(''.join(f'{commit}\n' for commit in commits).encode('ascii'))
+
+    def finish(self):
+        """
+        结束输入并等待流水线处理完所有提交
+        """
+        self.diff_tree.stdin.close()
+        diff_tree_returncode = self.diff_tree.wait()
+        self.reader.join()
+        patch_id_returncode = self.patch_id.wait()
+        self.patch_id.stdout.close()
+        if diff_tree_returncode != 0:
+            raise subprocess.CalledProcessError(diff_tree_returncode, self.diff_tree.args)
+        if patch_id_returncode != 0:
+            raise subprocess.CalledProcessError(patch_id_returncode, self.patch_id.args)
+
+
+class PatchIdTable:
+    """
+    按 patch-id 排序的 (patch-id, 提交哈希) 定长记录表，每条记录 40 字节
+    """
+    __slots__ = ('data',)
+
+    def __init__(self, data=b''):
+        self.data = data
+
+    def __len__(self):
+        return len(self.data) // RECORD_SIZE
+
+    def iter_records(self):
+        """
+        按序生成 (patch-id, 提交哈希) 二进制记录
+        """
+        for record in iter_oids(self.data, RECORD_SIZE):
+            yield record[:OID_SIZE], record[OID_SIZE:]
+
+
+def get_path_chunks(paths, chunk_size=MAX_PATHS_PER_CMD) -> list:
+    """
+    将限定的路径分组，每组路径由单独的流水线通过命令行参数传给 git diff-tree。
+    路径过多时先归并为互不覆盖的路径再分组，每个文件的差异只出现在一组中
+    :return: 路径组列表，不限定路径时为 [None]
+    """
+    if not paths:
+        return [None]
+    if len(paths) <= chunk_size:
+        return [list(paths)]
+    return list(chunk_paths(collapse_paths([remove_prefix_slash_and_dot(path) for path in paths]).paths,
+                            chunk_size))
+
+
+def sum_patch_ids(buckets_list) -> bytearray:
+    """
+    合并同一提交在不同路径组上的 patch-id。
+    git patch-id --stable 是每个文件差异的哈希按字节从低到高带进位相加（即小端序整数相加，丢弃最高位的进位），
+    因此同一提交在互不覆盖的路径组上的 patch-id 之和等于在所有路径上的 patch-id。
+    例外是二进制文件之后的文本差异（git patch-id 把它的文件头一起计入上一个文件的哈希），
+    此时和与一次计算的结果不同，但两侧仓库使用相同的路径分组，相同的差异仍然得到相同的 patch-id
+    :param buckets_list: 各条流水线的桶
+    :return: 按 patch-id 第一个字节分桶的 (patch-id, 提交哈希) 记录
+    """
+    modulus = 1 << (OID_SIZE * 8)
+    patch_id_sums = {}
+    for buckets in buckets_list:
+        for bucket in buckets:
+            for record in iter_oids(bucket, RECORD_SIZE):
+                commit = bytes(record[OID_SIZE:])
+                patch_id_sums[commit] = (patch_id_sums.get(commit, 0)
+                                         + int.from_bytes(record[:OID_SIZE], 'little')) % modulus
+    summed_buckets = new_buckets()
+    for commit, patch_id_sum in patch_id_sums.items():
+        record = patch_id_sum.to_bytes(OID_SIZE, 'little') + commit
+        summed_buckets[record[0]] += record
+    return summed_buckets
+
+
+def compute_patch_ids(repo_path, commits, paths=None, workers=None,
+                      chunk_size=MAX_PATHS_PER_CMD) -> PatchIdTable:
+    """
+    并行计算多个提交的 patch-id（git patch-id --stable）
+    合并提交、限定路径后差异为空的提交没有 patch-id
+    :param repo_path: 仓库路径
+    :param commits: 不重复的提交哈希的可迭代对象，可以是生成器
+    :param paths: 只比较这些路径下的差异，为None时比较完整的差异
+    :param workers: 并行的流水线数，为None时为 CPU 核数
+    :param chunk_size: 单条 git diff-tree 命令中最多传入的路径数，超过时分组计算后按提交合并 patch-id
+    """
+    workers = workers or DEFAULT_PATCH_ID_WORKERS
+    path_chunks = get_path_chunks(paths, chunk_size)
+    # 每个提交需要经过每个路径组的流水线，总的流水线数约为 workers
+    chunk_workers = max(1, workers // len(path_chunks))
+    chunk_pipelines = [[PatchIdPipeline(repo_path, chunk) for _ in range(chunk_workers)]
+                       for chunk in path_chunks]
+    try:
+        block = []
+        block_count = 0
+        for commit in commits:
+            block.append(commit)
+            if len(block) >= COMMITS_PER_BLOCK:
+                for pipelines in chunk_pipelines:
+                    pipelines[block_count % chunk_workers].write(block)
+                block_count += 1
+                block = []
+        if block:
+            for pipelines in chunk_pipelines:
+                pipelines[block_count % chunk_workers].write(block)
+    finally:
+        for pipelines in chunk_pipelines:
+            for pipeline in pipelines:
+                pipeline.finish()
+    all_pipelines = [pipeline for pipelines in chunk_pipelines for pipeline in pipelines]
+    if len(path_chunks) > 1:
+        return PatchIdTable(sort_buckets(sum_patch_ids(pipeline.buckets for pipeline in all_pipelines),
+                                         RECORD_SIZE))
+    # 合并各条流水线的桶，再逐桶排序
+    buckets = new_buckets()
+    for i in range(256):
+        for pipeline in all_pipelines:
+            buckets[i] += pipeline.buckets[i]
+            pipeline.buckets[i] = None
+    return PatchIdTable(sort_buckets(buckets, RECORD_SIZE))
+
+
+class PatchIdComparison:
+    """
+    两个仓库按 patch-id 对应提交的结果
+    """
+
+    def __init__(self, matched, left_only: CommitSet, right_only: CommitSet,
+                 left_commit_count=0, right_commit_count=0):
+        """
+        :param matched: 对应的提交对，(左侧提交, 右侧提交) 二进制哈希拼接而成的 bytearray
+        :param left_only: 只在左侧出现的 patch-id 对应的提交
+        :param right_only: 只在右侧出现的 patch-id 对应的提交
+        :param left_commit_count: 左侧参与比较的提交数（包括没有 patch-id 的提交）
+        :param right_commit_count: 右侧参与比较的提交数（包括没有 patch-id 的提交）
+        """
+        self.matched = matched
+        self.left_only = left_only
+        self.right_only = right_only
+        self.left_commit_count = left_commit_count
+        self.right_commit_count = right_commit_count
+
+    @property
+    def matched_count(self):
+        return len(self.matched) // RECORD_SIZE
+
+    def iter_matched(self):
+        """
+        依次生成 (左侧提交, 右侧提交) 十六进制哈希
+        """
+        for record in iter_oids(self.matched, RECORD_SIZE):
+            yield record[:OID_SIZE].hex(), record[OID_SIZE:].hex()
+
+    def __str__(self):
+        return f"Patch-id comparison: left commits: {self.left_commit_count}, " \
+               f"right commits: {self.right_commit_count}, matched: {self.matched_count}, " \
+               f"left only: {len(self.left_only)}, right only: {len(self.right_only)}"
+
+
+def join_patch_ids(left: PatchIdTable, right: PatchIdTable) -> PatchIdComparison:
+    """
+    对两个按 patch-id 排序的表做归并连接。
+    同一个 patch-id 在两侧各有多个提交时（如 cherry-pick），按顺序一一对应，多出的提交计入只在一侧出现
+    """
+    matched = bytearray()
+    left_only = new_buckets()
+    right_only = new_buckets()
+    left_records, right_records = left.iter_records(), right.iter_records()
+    left_record, right_record = next(left_records, None), next(right_records, None)
+    while left_record is not None or right_record is not None:
+        if right_record is None or (left_record is not None and left_record[0] < right_record[0]):
+            left_only[left_record[1][0]] += left_record[1]
+            left_record = next(left_records, None)
+        elif left_record is None or left_record[0] > right_record[0]:
+            right_only[right_record[1][0]] += right_record[1]
+            right_record = next(right_records, None)
+        else:
+            matched += left_record[1] + right_record[1]
+            left_record, right_record = next(left_records, None), next(right_records, None)
+    return PatchIdComparison(matched,
+                             CommitSet(sort_buckets(left_only, OID_SIZE)),
+                             CommitSet(sort_buckets(right_only, OID_SIZE)))
+
+
+def count_iter(items, counter: list):
+    """
+    依次生成 items 中的元素，并在 counter[0] 中累计数量
+    """
+    for item in items:
+        counter[0] += 1
+        yield item
+
+
+def compare_repos_by_patch_id(left_repo_path, right_repo_path, paths=None, workers=None) -> PatchIdComparison:
+    """
+    按 patch-id 对应两个仓库中的提交，适用于提交哈希不同的仓库（如 preserve_commit_hashes=False 分割出的仓库）
+    :param left_repo_path: 左侧仓库路径（如原始仓库）
+    :param right_repo_path: 右侧仓库路径（如分割出的仓库）
+    :param paths: 只比较修改过这些路径的提交在这些路径下的差异，为None时比较所有提交的完整差异
+    :param workers: 每个仓库并行的流水线数，为None时为 CPU 核数
+    """
+    tables = []
+    counts = []
+    for repo_path in (left_repo_path, right_repo_path):
+        counter = [0]
+        if not paths:
+            commits = iter_all_commits(repo_path)
+        elif len(paths) > MAX_PATHS_PER_CMD:
+            # 路径分批遍历时不同批次的提交可能重复，通过 CommitSet 去重
+            commits = CommitSet.from_hex(iter_files_commits(repo_path, paths))
+        else:
+            commits = iter_files_commits(repo_path, paths)
+        tables.append(compute_patch_ids(repo_path, count_iter(commits, counter), paths, workers))
+        counts.append(counter[0])
+    comparison = join_patch_ids(*tables)
+    comparison.left_commit_count, comparison.right_commit_count = counts
+    return comparison
@@ -0,0 +1,85 @@
+import fnmatch
+import subprocess
+from common.IncrementalSplit import get_refs
+
+# 保留所有标签的通配符
+ALL_TAGS_PATTERN = '*'
+
+
+class RefSelection:
+    """
+    新仓库保留的引用：单个分支或所有分支，匹配通配符的标签或不保留标签。
+    复制后删除其余引用，git filter-repo 只改写保留的引用，只从其余引用可达的历史不会被处理，之后瘦身时被清理
+    """
+
+    def __init__(self, branch=None, tag_pattern=ALL_TAGS_PATTERN):
+        """
+        :param branch: 保留的分支名，为None时保留所有分支（以及 refs/notes 等其他引用）
+        :param tag_pattern: 保留的标签名通配符（如 v5.10.*），为None时不保留标签。
+                            只保留一个分支时，只保留该分支可达的标签
+        """
+        self.branch = branch
+        self.tag_pattern = tag_pattern
+
+    @property
+    def is_all(self):
+        return self.branch is None and self.tag_pattern == ALL_TAGS_PATTERN
+
+    @property
+    def branch_ref(self):
+        return f'refs/heads/{self.branch}' if self.branch is not None else None
+
+    def to_dict(self) -> dict:
+        return {'branch': self.branch, 'tag_pattern': self.tag_pattern}
+
+    def get_refs(self, repo_path) -> dict:
+        """
+        获取仓库中被选择的引用，引用名 -> 对象哈希
+        :raise ValueError: 选择的分支不存在
+        """
+        refs = get_refs(repo_path)
+        if self.is_all:
+            return refs
+        if self.branch is not None and self.branch_ref not in refs:
+            raise ValueError(f"Branch {self.branch} does not exist in {repo_path}")
+        merged_tags = None
+        if self.branch is not None and self.tag_pattern is not None:
+            # 只保留选择的分支可达的标签，避免标签把其他分支的历史带入新仓库
+            result = subprocess.run(
+                ['git', '-C', repo_path, 'for-each-ref', f'--merged={refs[self.branch_ref]}',
+                 '--format=%(refname)', 'refs/tags/'],
+                capture_output=True, text=True, check=True)
+            merged_tags = set(result.stdout.splitlines())
+        selected_refs = {}
+        for refname, oid in refs.items():
+            if refname.startswith('refs/tags/'):
+                if self.tag_pattern is None \
+                        or not fnmatch.fnmatchcase(refname[len('refs/tags/'):], self.tag_pattern) \
+                        or (merged_tags is not None and refname not in merged_tags):
+                    continue
+            elif self.branch is not None and refname != self.branch_ref:
+                continue
+            selected_refs[refname] = oid
+        return selected_refs
+
+    def __str__(self):
+        return f"branch: {self.branch or 'all'}, tags: {self.tag_pattern if self.tag_pattern is not None else 'none'}"
+
+
+def prune_refs(repo_path, ref_selection: RefSelection) -> int:
+    """
+    删除复制的仓库中没有被选择的引用，只保留一个分支时 HEAD 指向该分支
+    :return: 删除的引用数
+    """
+    if ref_selection.is_all:
+        return 0
+    selected_refs = ref_selection.get_refs(repo_path)
+    if ref_selection.branch is not None:
+        subprocess.run(['git', '-C', repo_path, 'symbolic-ref', 'HEAD', ref_selection.branch_ref],
+                       check=True)
+    removed_refs = sorted(set(get_refs(repo_path)) - set(selected_refs))
+    if removed_refs:
+        subprocess.run(['git', '-C', repo_path, 'update-ref', '--stdin'],
+                       input=''.join(f'delete {refname}\n' for refname in removed_refs),
+                       text=True, check=True)
+    return len(removed_refs)
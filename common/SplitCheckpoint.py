@@ -0,0 +1,136 @@
+import os
+import json
+import hashlib
+
+# 检查点文件名后缀，检查点文件与新仓库位于同一目录：<新仓库路径>.split-state.json
+SPLIT_CHECKPOINT_FILE_SUFFIX = '.split-state.json'
+
+# 分割流水线的阶段
+STAGE_COPY = 'copy'
+STAGE_FILTER = 'filter'
+STAGE_SLIM = 'slim'
+STAGE_COMMIT_GRAPH = 'commit-graph'
+STAGE_REMOTE = 'remote'
+STAGE_BRANCH = 'branch'
+
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+
+
+def get_split_checkpoint_path(new_repo_path):
+    """
+    检查点文件放在新仓库之外，删除、重新复制新仓库时不受影响
+    """
+    return os.path.normpath(os.path.abspath(new_repo_path)) + SPLIT_CHECKPOINT_FILE_SUFFIX
+
+
+class SplitStage:
+    def __init__(self, name, inputs: dict, restart_from=None):
+        """
+        :param name: 阶段名称
+        :param inputs: 阶段的输入参数，需要可以序列化为 json
+        :param restart_from: 该阶段需要重新运行时，从哪个阶段开始重新运行。
+                             如 git filter-repo 直接改写复制的仓库，重新过滤前需要重新复制
+        """
+        self.name = name
+        self.inputs = inputs
+        self.restart_from = restart_from
+
+
+class SplitCheckpoint:
+    """
+    分割流水线的检查点：按顺序记录每个阶段的输入哈希和完成状态。
+    输入哈希由上一阶段的输入哈希和本阶段的输入链式计算，前面任一阶段的输入改变时，之后的阶段都需要重新运行。
+    重新运行同样的分割时，从第一个未完成或输入改变的阶段继续，跳过之前已完成的阶段
+    """
+
+    def __init__(self, new_repo_path, stages: list, enabled=True):
+        """
+        :param new_repo_path: 新仓库路径，新仓库不存在时忽略已有的检查点
+        :param stages: 按顺序排列的 SplitStage 列表
+        :param enabled: 是否使用检查点，不使用时删除已有的检查点文件，所有阶段都重新运行
+        """
+        self.state_path = get_split_checkpoint_path(new_repo_path)
+        self.stages = stages
+        self.stage_names = [stage.name for stage in stages]
+        self.stage_hashes = []
+        prev_hash = ''
+        for stage in stages:
+            prev_hash = hashlib.sha256(json.dumps(
+                [prev_hash, stage.name, stage.inputs], sort_keys=True,
+                ensure_ascii=False).encode('utf-8')).hexdigest()
+            self.stage_hashes.append(prev_hash)
+        self.enabled = enabled
+        # 是否存在检查点文件，即新仓库是否由之前带检查点的分割生成
+        self.has_state = enabled and os.path.isfile(self.state_path)
+        self.records = []
+        if not enabled:
+            self.remove()
+        elif self.has_state and os.path.isdir(new_repo_path):
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                self.records = json.load(f)['stages']
+        self.resume_index = self._get_resume_index()
+
+    def _get_resume_index(self):
+        for index, stage in enumerate(self.stages):
+            if index < len(self.records):
+                record = self.records[index]
+                if record['stage'] == stage.name and record['input_hash'] == self.stage_hashes[index] \
+                        and record['status'] == STATUS_DONE:
+                    continue
+            if stage.restart_from is not None:
+                index = min(index, self.stage_names.index(stage.restart_from))
+            return index
+        return len(self.stages)
+
+    def get_resume_stage(self):
+        """
+        :return: 需要从哪个阶段继续，全部阶段都已完成时返回None
+        """
+        if self.resume_index < len(self.stages):
+            return self.stage_names[self.resume_index]
+        return None
+
+    def is_done(self, stage_name):
+        """
+        阶段在之前的运行中已经完成，且它和之前所有阶段的输入都没有改变
+        """
+        return self.stage_names.index(stage_name) < self.resume_index
+
+    def start(self, stage_name):
+        """
+        记录阶段开始运行，之后阶段的记录全部失效
+        """
+        index = self.stage_names.index(stage_name)
+        self.records = self.records[:index] + [{
+            'stage': stage_name,
+            'input_hash': self.stage_hashes[index],
+            'status': STATUS_RUNNING,
+            'outputs': None,
+        }]
+        self.save()
+
+    def finish(self, stage_name, outputs: dict = None):
+        """
+        记录阶段运行完成
+        :param outputs: 阶段的输出，跳过该阶段时由 get_outputs 获取，需要可以序列化为 json
+        """
+        record = self.records[self.stage_names.index(stage_name)]
+        record['status'] = STATUS_DONE
+        record['outputs'] = outputs
+        self.save()
+
+    def get_outputs(self, stage_name) -> dict:
+        return self.records[self.stage_names.index(stage_name)]['outputs']
+
+    def save(self):
+        if not self.enabled:
+            return
+        with open(self.state_path, 'w', encoding='utf-8') as f:
+            json.dump({'stages': self.records}, f, ensure_ascii=False, indent=2)
+        self.has_state = True
+
+    def remove(self):
+        if os.path.isfile(self.state_path):
+            os.remove(self.state_path)
+        self.has_state = False
@@ -0,0 +1,227 @@
+import os
+import json
+import time
+import statistics
+import subprocess
+from common.GitUtils import get_git_dir
+from common.TimeUtils import date_to_utc_timestamp, format_all_time
+
+# 分割耗时记录文件名，位于原始仓库 .git 目录下的 git-utils 目录，每行一次分割
+SPLIT_HISTORY_FILE_NAME = 'split-history.jsonl'
+# 校准时最多使用最近多少次分割的耗时
+MAX_HISTORY_RECORDS = 50
+# 用于估计耗时的计时阶段 -> 该阶段耗时大致成正比的规模
+# source_commits: 原始仓库的提交数，复制和 git filter-repo 需要遍历原始仓库的全部历史
+# blob_bytes: 新仓库的 blob 字节数，瘦身时重新计算增量
+# commits: 新仓库的提交数
+LAP_METRICS = {
+    'Copy repo': 'source_commits',
+    'Extract files and history': 'source_commits',
+    'Slim repo': 'blob_bytes',
+    'Write commit graph': 'commits',
+}
+
+
+def get_split_history_path(repo_path):
+    return os.path.join(get_git_dir(repo_path), 'git-utils', SPLIT_HISTORY_FILE_NAME)
+
+
+class SplitEstimate:
+    """
+    分割的规模估计：不复制、不改写仓库，只读取原始仓库的历史
+    """
+
+    def __init__(self, path_count, source_commits, commits, blobs, blob_bytes):
+        """
+        :param path_count: 归并后的目标路径和通配符数
+        :param source_commits: 原始仓库所有引用可达的提交数
+        :param commits: 日期窗口内修改过目标路径的提交数
+        :param blobs: 这些提交中目标路径的不同 blob 数
+        :param blob_bytes: 这些 blob 的总字节数（未压缩）
+        """
+        self.path_count = path_count
+        self.source_commits = source_commits
+        self.commits = commits
+        self.blobs = blobs
+        self.blob_bytes = blob_bytes
+
+    def get_metrics(self) -> dict:
+        return {'source_commits': self.source_commits, 'commits': self.commits,
+                'blob_bytes': self.blob_bytes}
+
+    def __str__(self):
+        return f"paths: {self.path_count}, source commits: {self.source_commits}, " \
+               f"commits touching paths: {self.commits}, blobs: {self.blobs}, " \
+               f"blob bytes: {self.blob_bytes} ({self.blob_bytes / 1024 / 1024:.2f} MiB)"
+
+
+def get_date_window_args(start_date=None, end_date=None) -> list:
+    """
+    与 HistoryFilter.in_date_window 一致的提交日期窗口（提交者时间，起止日期 0 点 UTC）
+    """
+    args = []
+    if start_date:
+        args.append(f'--max-age={date_to_utc_timestamp(start_date)}')
+    if end_date:
+        args.append(f'--min-age={date_to_utc_timestamp(end_date)}')
+    return args
+
+
+def get_revs_args(refs=None):
+    """
+    :param refs: 遍历的引用或对象哈希，通过 --stdin 传入；为None时遍历所有引用
+    :return: (命令行参数, 标准输入中路径之前的部分)
+    """
+    if refs is None:
+        return ['--all'], ''
+    return [], ''.join(f'{ref}\n' for ref in refs)
+
+
+def count_all_commits(repo_path, refs=None):
+    """
+    统计引用可达的提交数
+    :param refs: 遍历的引用或对象哈希，为None时遍历所有引用
+    """
+    if refs is not None and not refs:
+        return 0
+    revs_args, revs_input = get_revs_args(refs)
+    result = subprocess.run(['git', '-C', repo_path, 'rev-list', '--count', *revs_args, '--stdin'],
+                            input=revs_input, capture_output=True, text=True, check=True)
+    return int(result.stdout.strip())
+
+
+def get_object_sizes(repo_path, oids) -> dict:
+    """
+    通过一次 git cat-file --batch-check 批量查询对象大小
+    :return: 对象哈希 -> (对象类型, 对象大小)，不存在的对象不在结果中
+    """
+    if not oids:
+        return {}
+    result = subprocess.run(
+        ['git', '-C', repo_path, 'cat-file', '--batch-check=%(objectname) %(objecttype) %(objectsize)'],
+        input='\n'.join(oids) + '\n', capture_output=True, text=True, check=True)
+    sizes = {}
+    for line in result.stdout.splitlines():
+        parts = line.split()
+        # <oid> missing
+        if len(parts) == 3:
+            sizes[parts[0]] = (parts[1], int(parts[2]))
+    return sizes
+
+
+def get_reachable_blob_bytes(repo_path):
+    """
+    所有引用可达的 blob 数和总字节数（未压缩）
+    """
+    result = subprocess.run(['git', '-C', repo_path, 'rev-list', '--objects', '--all'],
+                            capture_output=True, text=True, check=True)
+    oids = [line.split(' ', 1)[0] for line in result.stdout.splitlines()]
+    blob_sizes = [size for object_type, size in get_object_sizes(repo_path, oids).values()
+                  if object_type == 'blob']
+    return len(blob_sizes), sum(blob_sizes)
+
+
+def estimate_split(repo_path, filter_targets, path_globs=(), start_date=None, end_date=None,
+                   refs=None) -> SplitEstimate:
+    """
+    估计分割的规模：遍历一次日期窗口内修改过目标路径的提交，收集这些提交中目标路径的 blob，
+    再批量查询 blob 大小。路径通过 --stdin 传入，避免命令行参数过长
+    :param filter_targets: 归并后的目标路径（同 git filter-repo --path）
+    :param path_globs: 路径通配符（同 git filter-repo --path-glob）
+    :param refs: 分割的引用或对象哈希（见 RefSelection），为None时为所有引用
+    """
+    if refs is not None and not refs:
+        return SplitEstimate(len(filter_targets) + len(path_globs), 0, 0, 0, 0)
+    revs_args, revs_input = get_revs_args(refs)
+    # --full-history 不简化历史，与 git filter-repo 一样处理所有分支上的提交
+    cmd = ['git', '-C', repo_path, 'log', *revs_args, '--full-history', '--root', '--no-renames',
+           '--raw', '--no-abbrev', '--format=%x00%H'] + get_date_window_args(start_date, end_date) + ['--stdin']
+    # 目标路径按字面匹配，通配符与 git filter-repo --path-glob 一样 * 可以匹配 /
+    pathspecs = [f':(literal){target}' for target in filter_targets] + list(path_globs)
+    result = subprocess.run(cmd, input=revs_input + '--\n' + '\n'.join(pathspecs) + '\n',
+                            capture_output=True, text=True, check=True)
+    commits = 0
+    blob_oids = set()
+    for line in result.stdout.splitlines():
+        if line.startswith('\x00'):
+            commits += 1
+        elif line.startswith(':'):
+            # :<旧模式> <新模式> <旧哈希> <新哈希> <状态>\t<路径>
+            new_mode, _, new_oid = line[1:].split('\t', 1)[0].split(' ')[1:4]
+            # 跳过删除和子模块
+            if new_mode.startswith(('100', '120')):
+                blob_oids.add(new_oid)
+    blob_sizes = [size for _, size in get_object_sizes(repo_path, sorted(blob_oids)).values()]
+    return SplitEstimate(len(filter_targets) + len(path_globs), count_all_commits(repo_path, refs),
+                         commits, len(blob_sizes), sum(blob_sizes))
+
+
+def get_lap_name(message):
+    """
+    计时信息中的阶段名，去掉括号中的附加信息，如 "Copy repo (Copy strategy: clone, ...)" -> "Copy repo"
+    """
+    return message.split(' (', 1)[0]
+
+
+class SplitHistory:
+    """
+    原始仓库过去分割的规模和各阶段耗时，用于校准耗时估计
+    """
+
+    def __init__(self, history_path):
+        self.history_path = history_path
+
+    def load(self) -> list:
+        if not os.path.isfile(self.history_path):
+            return []
+        with open(self.history_path, 'r', encoding='utf-8') as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        return records[-MAX_HISTORY_RECORDS:]
+
+    def append(self, metrics: dict, laps: list, slim_level):
+        """
+        :param metrics: 分割的规模，见 SplitEstimate.get_metrics
+        :param laps: Timer.laps，(计时信息, 秒数) 列表，同一阶段的耗时累加
+        :param slim_level: 瘦身级别，不同级别的瘦身耗时不能互相校准
+        """
+        lap_seconds = {}
+        for message, seconds in laps:
+            lap_name = get_lap_name(message)
+            lap_seconds[lap_name] = lap_seconds.get(lap_name, 0) + seconds
+        record = {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime()),
+            'metrics': metrics,
+            'slim_level': slim_level,
+            'laps': lap_seconds,
+        }
+        history_dir = os.path.dirname(self.history_path)
+        if history_dir and not os.path.exists(history_dir):
+            os.makedirs(history_dir)
+        with open(self.history_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def estimate_runtime(split_estimate: SplitEstimate, records: list, slim_level) -> dict:
+    """
+    按过去分割中每个阶段的耗时与规模之比（取中位数）估计各阶段的耗时
+    :return: 计时阶段 -> 估计的秒数，没有可以校准的记录时为None
+    """
+    metrics = split_estimate.get_metrics()
+    lap_estimates = {}
+    for lap_name, metric in LAP_METRICS.items():
+        rates = [record['laps'][lap_name] / record['metrics'][metric] for record in records
+                 if record['laps'].get(lap_name) and record['metrics'].get(metric)
+                 and (lap_name != 'Slim repo' or record.get('slim_level') == slim_level)]
+        lap_estimates[lap_name] = statistics.median(rates) * metrics[metric] if rates else None
+    return lap_estimates
+
+
+def format_runtime_estimate_msg(lap_estimates: dict, record_count) -> str:
+    if not record_count:
+        return "Estimated runtime: unknown, no split history to calibrate from"
+    lines = [f"Estimated runtime (calibrated from {record_count} past splits):"]
+    for lap_name, seconds in lap_estimates.items():
+        lines.append(f"  {lap_name}: {format_all_time(seconds) if seconds is not None else 'unknown'}")
+    total = sum(seconds for seconds in lap_estimates.values() if seconds is not None)
+    lines.append(f"  Total: {format_all_time(total)}")
+    return '\n'.join(lines)
@@ -1,5 +1,5 @@
 import time
-from datetime import datetime
+from datetime import datetime, timezone
 
 
 def format_date_now(date_format="%Y-%m-%d") -> str:
@@ -76,3 +76,11 @@ def format_time(seconds):
 
 def format_all_time(seconds):
     return f'{format_time_in_seconds(seconds)} or {format_time_in_minutes(seconds)} or {format_time_in_hours(seconds)}'
+
+
+def date_to_utc_timestamp(date, date_format="%Y-%m-%d") -> int:
+    """
+    日期当天 0 点（UTC）的时间戳
+    :param date: 日期, 默认格式为 YYYY-MM-DD
+    """
+    return int(validate_convert_date(date, date_format).replace(tzinfo=timezone.utc).timestamp())
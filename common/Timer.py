@@ -9,13 +9,22 @@ class Timer:
         self.time_cur = time.time()
         self.time_end = None
         self.logger = logger
+        # 显示过的计时，(计时信息, 秒数) 列表，不包括被跳过的阶段，用于记录分割耗时
+        self.laps = []
 
     def lap(self):
         self.time_cur = time.time()
 
-    def lap_and_show(self, message="Lap time"):
+    def lap_and_show(self, message="Lap time", skipped=False):
+        """
+        :param skipped: 该阶段是否被跳过（如检查点中已完成），显示时标记为 skipped
+        """
         time_now = time.time()
         time_cost = time_now - self.time_cur
+        if skipped:
+            message = f'{message} (skipped)'
+        else:
+            self.laps.append((message, time_cost))
         msg = f'{message}: {format_all_time(time_cost)}'
         if self.logger:
             self.logger.info_print(msg)
@@ -1,10 +1,18 @@
-from common.GitUtils import get_files_commits
+from common.GitUtils import iter_files_commits
+from common.CommitSet import CommitSet
+from common.PatchIdUtils import compare_repos_by_patch_id
+
+# 按 patch-id 对应提交（分割时 preserve_commit_hashes=False，提交哈希不同时使用）
+compare_by_patch_id = True
+# 计算 patch-id 的并行流水线数，为None时为 CPU 核数
+patch_id_workers = None
 
 cpp_file_relative_paths = ['mm/memory.c', 'mm/hugetlb.c']  # 需要解析的C/CPP文件路径
 
 
-def get_commits(repo_path):
-    return get_files_commits(repo_path, cpp_file_relative_paths)
+def get_commits(repo_path) -> CommitSet:
+    # 流式读取提交记录并构建紧凑的提交集合
+    return CommitSet.from_hex(iter_files_commits(repo_path, cpp_file_relative_paths))
 
 
 if __name__ == '__main__':
@@ -17,11 +25,18 @@ if __name__ == '__main__':
     print(f"linux-stable commits: {len(linux_stable_commits)}")
     print(f"linux-stable-clean commits: {len(linux_stable_clean_commits)}")
 
-    common_commits = set(linux_stable_commits) & set(linux_stable_clean_commits)
+    common_commits = linux_stable_commits & linux_stable_clean_commits
     print(f"common commits: {len(common_commits)}")
-    print(f"common commits: {common_commits}")
-    
-    different_commits = set(linux_stable_commits) - set(linux_stable_clean_commits)
+    print(f"common commits: {list(common_commits)}")
+
+    different_commits = linux_stable_commits - linux_stable_clean_commits
     print(f"different commits: {len(different_commits)}")
-    print(f"different commits: {different_commits}")
-     
+    print(f"different commits: {list(different_commits)}")
+
+    if compare_by_patch_id:
+        comparison = compare_repos_by_patch_id(
+            linux_stable_repo_path, linux_stable_clean_repo_path,
+            cpp_file_relative_paths, patch_id_workers)
+        print(comparison)
+        print(f"linux-stable only commits: {list(comparison.left_only)}")
+        print(f"linux-stable-clean only commits: {list(comparison.right_only)}")
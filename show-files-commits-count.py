@@ -1,8 +1,14 @@
 from common.GitUtils import count_files_commits
+from common.AsyncGitUtils import count_each_file_commits
+
+# 并发地逐个统计每个路径各自的提交数时最多同时运行的 git 进程数，为None时为 CPU 核数
+async_concurrency = None
 
 if __name__ == '__main__':
     repo_path = r'/mnt/d/coding/zhurong-CodeWisdom/test_codes/linux-stable/linux-stable'
     cpp_file_relative_paths = ['mm/memory.c', 'mm/hugetlb.c']  # 需要解析的C/CPP文件路径
 
     commits = count_files_commits(repo_path, cpp_file_relative_paths)
-    print(commits)
\ No newline at end of file
+    print(commits)
+    # 每个路径各自的提交数
+    print(count_each_file_commits(repo_path, cpp_file_relative_paths, async_concurrency))
@@ -1,7 +1,16 @@
+import argparse
 from common.GitFilesFilter import split_cpp_files
 
 
 def main():
+    parser = argparse.ArgumentParser(
+        description="Split C/C++ files with their headers into a new repository.")
+    parser.add_argument("--no-cache", action='store_true', default=False,
+                        help="Do not use the persistent include cache.")
+    parser.add_argument("--cache-dir", default=None,
+                        help="Directory of the persistent include cache, defaults to <repo>/.git/git-utils.")
+    args = parser.parse_args()
+
     repo_path = r'/home/app/repository/linux'
     # TODO 不同的提取可能需要不同的头文件路径
     include_dirs_relative_pahts = [
@@ -22,6 +31,9 @@ def main():
     new_branch_name = 'demo'
     track_gitignore = True
     regex_with_glob = False
+    # 是否使用进程池并行解析头文件，进程数为None时使用CPU核数
+    parallel_scan = False
+    scan_workers = None
 
     split_cpp_files(repo_path=repo_path,
                     include_dirs_relative_pahts=include_dirs_relative_pahts,
@@ -30,7 +42,11 @@ def main():
                     new_repo_location=new_repo_location,
                     new_branch_name=new_branch_name,
                     track_gitignore=track_gitignore,
-                    regex_with_glob=regex_with_glob)
+                    regex_with_glob=regex_with_glob,
+                    parallel_scan=parallel_scan,
+                    scan_workers=scan_workers,
+                    use_include_cache=not args.no_cache,
+                    include_cache_dir=args.cache_dir)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,74 @@
+import argparse
+from common.GitFilesFilter import split_cpp_modules_multi
+from common.GitUtils import get_commit_before_date
+from common.Logger import LoggerFactory, LogMetaInfo
+
+# 日志配置信息
+LOG_META_INFO = LogMetaInfo(__file__)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Split several C/C++ modules with their headers into new repositories in one pass.")
+    parser.add_argument("--no-cache", action='store_true', default=False,
+                        help="Do not use the persistent include cache.")
+    parser.add_argument("--cache-dir", default=None,
+                        help="Directory of the persistent include cache, defaults to <repo>/.git/git-utils.")
+    args = parser.parse_args()
+
+    repo_path = r'/home/app/repository/linux'
+    include_dirs_relative_pahts = [
+        './arch/x86/include',
+        './arch/x86/include/generated',
+        './include',
+        './arch/x86/include/uapi',
+        './arch/x86/include/generated/uapi',
+        './include/uapi',
+        './include/generated/uapi',
+        './include/linux/compiler-version.h',
+        './include/linux/kconfig.h',
+        './include/linux/compiler_types.h'
+    ]
+    # 每个分割目标：新仓库名称、模块，可选的 start_date、end_date 覆盖下面的默认日期
+    module_targets = [
+        {'new_repo_name': 'linux-split-mm', 'modules': ['mm']},
+        {'new_repo_name': 'linux-split-fs-ext4', 'modules': ['fs/ext4']},
+        {'new_repo_name': 'linux-split-net-ipv4', 'modules': ['net/ipv4'], 'start_date': '2023-01-01'},
+    ]
+    new_repo_location = r"/home/app/repository"
+    new_branch_name = 'demo'
+    track_gitignore = True
+    regex_with_glob = False
+    # 是否使用进程池并行解析头文件，进程数为None时使用CPU核数
+    parallel_scan = False
+    scan_workers = None
+    start_date = '2021-01-01'
+    end_date = LOG_META_INFO.get_date_now()
+    # 是否基于 start_date 边界的提交分析头文件（直接读取对象库，不需要检出），否则基于工作区
+    headers_at_start_date = False
+
+    header_revision = get_commit_before_date(
+        repo_path, start_date) if headers_at_start_date else None
+
+    LoggerFactory.main_set_log_file_path(
+        LOG_META_INFO.get_log_file_path(file_suffix='multi'))
+    with LoggerFactory.create_logger(tag=LOG_META_INFO.get_file_tag()) as logger:
+        logger.info_print("Start to split cpp modules in one pass.")
+        split_cpp_modules_multi(repo_path=repo_path,
+                                include_dirs_relative_pahts=include_dirs_relative_pahts,
+                                module_targets=module_targets,
+                                new_repo_location=new_repo_location,
+                                new_branch_name=new_branch_name,
+                                track_gitignore=track_gitignore,
+                                regex_with_glob=regex_with_glob,
+                                start_date=start_date,
+                                end_date=end_date,
+                                parallel_scan=parallel_scan,
+                                scan_workers=scan_workers,
+                                header_revision=header_revision,
+                                use_include_cache=not args.no_cache,
+                                include_cache_dir=args.cache_dir)
+
+
+if __name__ == "__main__":
+    main()
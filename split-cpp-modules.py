@@ -1,4 +1,6 @@
+import argparse
 from common.GitFilesFilter import split_cpp_modules
+from common.GitUtils import get_commit_before_date
 from common.Logger import LoggerFactory, LogMetaInfo
 
 # 日志配置信息
@@ -6,6 +8,16 @@ LOG_META_INFO = LogMetaInfo(__file__)
 
 
 def main():
+    parser = argparse.ArgumentParser(
+        description="Split C/C++ modules with their headers into a new repository.")
+    parser.add_argument("--no-cache", action='store_true', default=False,
+                        help="Do not use the persistent include cache.")
+    parser.add_argument("--cache-dir", default=None,
+                        help="Directory of the persistent include cache, defaults to <repo>/.git/git-utils.")
+    parser.add_argument("--dry-run", action='store_true', default=False,
+                        help="Only estimate the size and runtime of the split, do not create the new repository.")
+    args = parser.parse_args()
+
     repo_path = r'/home/app/repository/linux'
     # TODO 不同的提取可能需要不同的头文件路径
     include_dirs_relative_pahts = [
@@ -26,8 +38,19 @@ def main():
     new_branch_name = 'demo'
     track_gitignore = True
     regex_with_glob = False
+    # 是否使用进程池并行解析头文件，进程数为None时使用CPU核数
+    parallel_scan = False
+    scan_workers = None
     start_date = '2021-01-01'
     end_date = LOG_META_INFO.get_date_now()
+    # 只分割的分支，为None时分割所有分支；只保留名称匹配的标签，为None时不保留标签
+    branch = None
+    tag_pattern = '*'
+    # 是否基于 start_date 边界的提交分析头文件（直接读取对象库，不需要检出），否则基于工作区
+    headers_at_start_date = False
+
+    header_revision = get_commit_before_date(
+        repo_path, start_date) if headers_at_start_date else None
 
     LoggerFactory.main_set_log_file_path(
         LOG_META_INFO.get_log_file_path(file_suffix=new_repo_name))
@@ -42,7 +65,15 @@ def main():
                           track_gitignore=track_gitignore,
                           regex_with_glob=regex_with_glob,
                           start_date=start_date,
-                          end_date=end_date)
+                          end_date=end_date,
+                          parallel_scan=parallel_scan,
+                          scan_workers=scan_workers,
+                          header_revision=header_revision,
+                          use_include_cache=not args.no_cache,
+                          include_cache_dir=args.cache_dir,
+                          dry_run=args.dry_run,
+                          branch=branch,
+                          tag_pattern=tag_pattern)
 
 
 if __name__ == "__main__":
@@ -1,6 +1,8 @@
 import argparse
 from common.Timer import Timer
 from common.GitFilesFilter import split_files
+from common.RefSelection import ALL_TAGS_PATTERN
+from common.GitUtils import COPY_STRATEGIES, COPY_STRATEGY_AUTO, SLIM_LEVELS, SLIM_LEVEL_AGGRESSIVE
 
 
 if __name__ == "__main__":
@@ -20,6 +22,43 @@ if __name__ == "__main__":
     # 是否跟踪 .gitignore 文件
     parser.add_argument("-ig", "--track_gitignore", action='store_true', default=False,
                         help="Track .gitignore files.")
+    parser.add_argument("--copy-strategy", choices=COPY_STRATEGIES, default=COPY_STRATEGY_AUTO,
+                        help="How to copy the original repository: hardlinked local clone, "
+                             "reflink copy or plain copy; auto tries them in this order.")
+    parser.add_argument("--slim-level", choices=SLIM_LEVELS, default=SLIM_LEVEL_AGGRESSIVE,
+                        help="How hard to slim the new repository: none, fast (gc), "
+                             "repack (tuned window/depth/threads) or aggressive (gc --aggressive).")
+    parser.add_argument("--repack-window", type=int, default=None,
+                        help="Delta window of the repack slim level.")
+    parser.add_argument("--repack-depth", type=int, default=None,
+                        help="Maximum delta depth of the repack slim level.")
+    parser.add_argument("--repack-threads", type=int, default=None,
+                        help="Delta search threads of the repack slim level.")
+    parser.add_argument("--write-bitmap", action='store_true',
+                        help="Write a reachability bitmap for faster clones of the new repository.")
+    parser.add_argument("--incremental", action='store_true',
+                        help="Only filter commits added to the original repository since the last "
+                             "incremental split and append them to the existing new repository.")
+    parser.add_argument("--no-checkpoint", action='store_true',
+                        help="Do not record finished stages in <new_repo_name>.split-state.json; "
+                             "by default rerunning the same split resumes from the first unfinished stage.")
+    parser.add_argument("--dry-run", action='store_true',
+                        help="Only print the resolved paths, the commits and blob bytes within the date window "
+                             "and the estimated runtime, without copying or rewriting anything.")
+    parser.add_argument("--record-history", action='store_true',
+                        help="After a full split, record its size and stage times so that later "
+                             "--dry-run runs can estimate the runtime (costs one more history walk).")
+    parser.add_argument("--split-history", default=None, metavar="PATH",
+                        help="Split history file used by --record-history and --dry-run, "
+                             "defaults to <original_repo>/.git/git-utils/split-history.jsonl.")
+    parser.add_argument("--branch", default=None,
+                        help="Only split this branch of the original repository (default: all branches).")
+    tags_group = parser.add_mutually_exclusive_group()
+    tags_group.add_argument("--tags", default=ALL_TAGS_PATTERN, metavar="PATTERN",
+                            help="Only keep tags matching this glob, e.g. 'v5.10.*' (default: all tags). "
+                                 "With --branch only tags reachable from the branch are kept.")
+    tags_group.add_argument("--no-tags", action='store_true',
+                            help="Do not keep any tags.")
     args = parser.parse_args()
 
     original_repo_path = args.original_repo_path
@@ -35,7 +74,20 @@ if __name__ == "__main__":
                     new_repo_name=new_repo_name,
                     new_repo_location=new_repo_location,
                     new_branch_name=new_branch_name,
-                    track_gitignore=track_gitignore)
+                    track_gitignore=track_gitignore,
+                    copy_strategy=args.copy_strategy,
+                    slim_level=args.slim_level,
+                    repack_window=args.repack_window,
+                    repack_depth=args.repack_depth,
+                    repack_threads=args.repack_threads,
+                    write_bitmap=args.write_bitmap,
+                    incremental=args.incremental,
+                    checkpoint=not args.no_checkpoint,
+                    dry_run=args.dry_run,
+                    record_history=args.record_history,
+                    split_history_path=args.split_history,
+                    branch=args.branch,
+                    tag_pattern=None if args.no_tags else args.tags)
     except Exception as e:
         print(f"Error: {e}")
 
@@ -40,10 +40,10 @@ def split_module(original_repo_path, module_path, new_repo_name, new_repo_locati
     print("========================处理完成========================")
     print(
         f"Module {module_path} has been successfully split into a new repository at {new_repo_path}.")
-    # 展示提交数
-    show_commit_count()
-    # 展示最早的提交时间
-    show_earliest_commit_time()
+    # 展示新仓库的提交数
+    show_commit_count(new_repo_path)
+    # 展示新仓库最早的提交时间
+    show_earliest_commit_time(new_repo_path)
 
 
 if __name__ == "__main__":
@@ -8,9 +8,13 @@ if __name__ == '__main__':
                         help='The path to the Git repository.')
     parser.add_argument('-tf', '--target_files', nargs='+',
                         required=False, default=[], help='The target files to be counted.')
+    parser.add_argument('--write-commit-graph', action='store_true',
+                        help='Write a commit-graph with changed-path Bloom filters if missing, '
+                             'which speeds up the path-limited history queries.')
     args = parser.parse_args()
     repo_path = args.repo
     cpp_file_relative_paths = args.target_files
     print('repo_path:', repo_path)
     print('cpp_file_relative_paths:', cpp_file_relative_paths)
-    statistics_split_info(repo_path, cpp_file_relative_paths)
+    statistics_split_info(repo_path, cpp_file_relative_paths,
+                          write_commit_graph_if_missing=args.write_commit_graph)
@@ -0,0 +1,52 @@
+import os
+import subprocess
+
+# 测试仓库使用固定的提交者，不依赖本机的 git 配置
+GIT_ENV = dict(os.environ, GIT_AUTHOR_NAME='test', GIT_AUTHOR_EMAIL='test@example.com',
+               GIT_COMMITTER_NAME='test', GIT_COMMITTER_EMAIL='test@example.com',
+               GIT_CONFIG_NOSYSTEM='1', GIT_CONFIG_GLOBAL=os.devnull)
+
+
+def git(repo_path, *args) -> str:
+    return subprocess.run(['git', '-C', repo_path, *args], env=GIT_ENV, check=True,
+                          capture_output=True, text=True).stdout
+
+
+def init_repo(repo_path):
+    subprocess.run(['git', 'init', '--quiet', '-b', 'master', repo_path], env=GIT_ENV, check=True)
+
+
+def commit_files(repo_path, files: dict, message, timestamp=1600000000):
+    """
+    写入文件并提交
+    :param files: 相对路径 -> 文件内容，内容为None时删除文件
+    :return: 新提交的哈希
+    """
+    for path, content in files.items():
+        full_path = os.path.join(repo_path, path)
+        if content is None:
+            git(repo_path, 'rm', '--quiet', path)
+            continue
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'w') as f:
+            f.write(content)
+        git(repo_path, 'add', path)
+    env_date = f'{timestamp} +0000'
+    subprocess.run(['git', '-C', repo_path, 'commit', '--quiet', '--allow-empty', '-m', message],
+                   env=dict(GIT_ENV, GIT_AUTHOR_DATE=env_date, GIT_COMMITTER_DATE=env_date), check=True)
+    return git(repo_path, 'rev-parse', 'HEAD').strip()
+
+
+def create_discarded_branch_repo(repo_path):
+    """
+    分支修改了 src/a.c，合并时保留主线的版本：默认的历史简化只沿主线遍历，看不到分支上的提交
+    :return: 分支上修改 src/a.c 的提交
+    """
+    init_repo(repo_path)
+    commit_files(repo_path, {'src/a.c': 'a\n', 'src/b.c': 'b\n'}, 'init')
+    git(repo_path, 'checkout', '--quiet', '-b', 'topic')
+    topic_commit = commit_files(repo_path, {'src/a.c': 'topic\n'}, 'topic change')
+    git(repo_path, 'checkout', '--quiet', 'master')
+    commit_files(repo_path, {'src/b.c': 'master\n'}, 'master change')
+    git(repo_path, 'merge', '--quiet', '--no-ff', '-s', 'ours', '-m', 'merge topic', 'topic')
+    return topic_commit
@@ -0,0 +1,29 @@
+import os
+import tempfile
+import unittest
+from tests.repo_utils import create_discarded_branch_repo
+from common.AsyncGitUtils import count_each_file_commits, get_each_file_commits
+from common.GitUtils import count_file_commits, get_file_commits
+
+
+class AsyncFileCommitsTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.repo_path = os.path.join(self.temp_dir.name, 'repo')
+        create_discarded_branch_repo(self.repo_path)
+        self.paths = ['src/a.c', 'src/b.c', 'src', 'src/missing.c']
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_counts_match_sync(self):
+        self.assertEqual(count_each_file_commits(self.repo_path, self.paths, max_concurrency=2),
+                         {path: count_file_commits(self.repo_path, path) for path in self.paths})
+
+    def test_commits_match_sync(self):
+        self.assertEqual(get_each_file_commits(self.repo_path, self.paths, max_concurrency=2),
+                         {path: get_file_commits(self.repo_path, path) for path in self.paths})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,22 @@
+import sys
+import subprocess
+import unittest
+from common.CmdUtils import iter_cmd_lines
+
+
+class IterCmdLinesTest(unittest.TestCase):
+    def test_large_stderr_does_not_block(self):
+        # 先写出远超管道缓冲区的标准错误，再写标准输出
+        script = "import sys; sys.stderr.write('w' * (1 << 20)); print('a'); print('b')"
+        self.assertEqual(list(iter_cmd_lines([sys.executable, '-c', script], text=True)), ['a\n', 'b\n'])
+
+    def test_failure_raises_with_stderr(self):
+        script = "import sys; print('a'); sys.stderr.write('boom'); sys.exit(3)"
+        with self.assertRaises(subprocess.CalledProcessError) as context:
+            list(iter_cmd_lines([sys.executable, '-c', script], text=True))
+        self.assertEqual(context.exception.returncode, 3)
+        self.assertEqual(context.exception.stderr, 'boom')
+
+
+if __name__ == '__main__':
+    unittest.main()
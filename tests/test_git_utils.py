@@ -0,0 +1,132 @@
+import datetime
+import os
+import tempfile
+import unittest
+from unittest import mock
+from tests.repo_utils import git, init_repo, commit_files, create_discarded_branch_repo
+from common.CommitIndex import build_commit_index, commit_index_batch
+from common.GitUtils import get_repo_size_info, get_repo_size_change_info, get_file_commits, count_file_commits, \
+    get_paths_commits, iter_file_commits, iter_files_commits, get_earliest_commit_date, EARLIEST_COMMIT_DATE_CACHE
+
+
+class RepoSizeInfoTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.repo_path = os.path.join(self.temp_dir.name, 'repo')
+        init_repo(self.repo_path)
+        for i in range(3):
+            commit_files(self.repo_path, {f'file{i}.txt': f'content {i}\n' * 1000}, f'commit {i}')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_fields_match_count_objects(self):
+        # 3 个提交，每个提交 1 个 blob 和 1 个树，共 9 个松散对象
+        before = get_repo_size_info(self.repo_path)
+        self.assertGreater(before.size, 0)
+        self.assertEqual((before.in_pack, before.packs, before.size_pack), (0, 0, 0))
+        git(self.repo_path, 'repack', '-a', '-d', '-q')
+        git(self.repo_path, 'prune-packed')
+        after = get_repo_size_info(self.repo_path)
+        self.assertEqual((after.size, after.in_pack, after.packs), (0, 9, 1))
+        self.assertGreater(after.size_pack, 0)
+        expected = {}
+        for line in git(self.repo_path, 'count-objects', '-v').splitlines():
+            key, value = line.split(': ')
+            expected[key] = int(value)
+        self.assertEqual(after.size_pack, expected['size-pack'])
+        self.assertEqual(after.size_garbage, expected['size-garbage'])
+
+    def test_change_info_reduced(self):
+        before = get_repo_size_info(self.repo_path)
+        git(self.repo_path, 'repack', '-a', '-d', '-q')
+        git(self.repo_path, 'prune-packed')
+        after = get_repo_size_info(self.repo_path)
+        reduced = before.size + before.size_pack + before.size_garbage \
+            - after.size - after.size_pack - after.size_garbage
+        change_info = get_repo_size_change_info(before, after, seconds=2)
+        self.assertIn(f"packs: 0 -> 1\n", change_info)
+        self.assertIn(f"reduced: {reduced} KiB in 2.00s, {reduced / 2:.2f} KiB/s", change_info)
+
+
+class FileCommitsTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.repo_path = os.path.join(self.temp_dir.name, 'repo')
+        init_repo(self.repo_path)
+        self.first = commit_files(self.repo_path, {'src/a.c': 'a\n'}, 'add a')
+        self.second = commit_files(self.repo_path, {'src/b.c': 'b\n'}, 'add b')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def assert_file_commits(self):
+        self.assertEqual(get_file_commits(self.repo_path, 'src/a.c'), [self.first])
+        self.assertEqual(get_file_commits(self.repo_path, 'src'), [self.second, self.first])
+        # 没有提交记录的路径
+        self.assertEqual(get_file_commits(self.repo_path, 'src/missing.c'), [])
+        self.assertEqual(count_file_commits(self.repo_path, 'src/missing.c'), 0)
+
+    def test_without_index(self):
+        self.assert_file_commits()
+
+    def test_with_index(self):
+        build_commit_index(self.repo_path)
+        self.assert_file_commits()
+
+    def test_with_index_batch(self):
+        build_commit_index(self.repo_path)
+        with commit_index_batch(self.repo_path):
+            # 批次内的查询复用开始时的检查结果，不再运行 git 命令
+            with mock.patch('subprocess.run', side_effect=AssertionError('git should not run')):
+                self.assert_file_commits()
+
+
+class FullHistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.repo_path = os.path.join(self.temp_dir.name, 'repo')
+        self.topic_commit = create_discarded_branch_repo(self.repo_path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_iter_commits_match_get_commits(self):
+        file_commits = get_file_commits(self.repo_path, 'src/a.c')
+        self.assertIn(self.topic_commit, file_commits)
+        self.assertEqual(list(iter_file_commits(self.repo_path, 'src/a.c')), file_commits)
+        paths = ['src/a.c', 'src/b.c']
+        self.assertEqual(set(iter_files_commits(self.repo_path, paths)),
+                         set(get_paths_commits(self.repo_path, paths).commits))
+
+
+class EarliestCommitDateTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.repo_path = os.path.join(self.temp_dir.name, 'repo')
+        init_repo(self.repo_path)
+        commit_files(self.repo_path, {'a.txt': 'a\n'}, 'first', timestamp=1600000000)
+        commit_files(self.repo_path, {'b.txt': 'b\n'}, 'second', timestamp=1700000000)
+        EARLIEST_COMMIT_DATE_CACHE.clear()
+
+    def tearDown(self):
+        EARLIEST_COMMIT_DATE_CACHE.clear()
+        self.temp_dir.cleanup()
+
+    def test_persisted_across_processes(self):
+        earliest = datetime.datetime.fromtimestamp(1600000000, datetime.timezone.utc)
+        ranged = datetime.datetime.fromtimestamp(1700000000, datetime.timezone.utc)
+        self.assertEqual(get_earliest_commit_date(self.repo_path), earliest)
+        self.assertEqual(get_earliest_commit_date(self.repo_path, since='2021-01-01'), ranged)
+        self.assertIsNone(get_earliest_commit_date(self.repo_path, since='2030-01-01'))
+        self.assertTrue(os.path.isfile(os.path.join(self.repo_path, '.git', 'git-utils', 'earliest-commit-date.json')))
+        # 模拟新的进程：进程内缓存为空，结果从持久化的缓存读取，不再遍历历史
+        EARLIEST_COMMIT_DATE_CACHE.clear()
+        with mock.patch('common.GitUtils.iter_cmd_lines', side_effect=AssertionError('history should not be walked')):
+            self.assertEqual(get_earliest_commit_date(self.repo_path), earliest)
+            self.assertEqual(get_earliest_commit_date(self.repo_path, since='2021-01-01'), ranged)
+            self.assertIsNone(get_earliest_commit_date(self.repo_path, since='2030-01-01'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,19 +1,29 @@
-from common.GitUtils import get_files_commits, get_all_commits, get_commit_message, get_commit_files
+from common.GitUtils import get_files_commits, iter_commit_records
 
 cpp_file_relative_paths = ['mm/memory.c', 'mm/hugetlb.c']  # 需要解析的C/CPP文件路径
 
 
+def format_commit_content(record):
+    return {
+        "commit": record.oid,
+        "parents": record.parent_count,
+        "files": record.files,
+        "msg": record.message
+    }
+
+
 if __name__ == '__main__':
     repo_path = r'/mnt/d/coding/zhurong-CodeWisdom/test_codes/linux-stable-split-demo2-no-h'
 
-    files_commits = get_files_commits(repo_path, cpp_file_relative_paths)
-    all_commits = get_all_commits(repo_path=repo_path)
+    files_commits, _ = get_files_commits(repo_path, cpp_file_relative_paths)
+    # 一次 git log 遍历获取所有提交的父提交数、完整提交信息和修改的文件
+    all_records = {record.oid: record for record in iter_commit_records(repo_path, with_message=True)}
 
     set_files_commits = set(files_commits)
-    set_all_commits = set(all_commits)
+    set_all_commits = set(all_records)
 
     print(f"files_commits: {len(files_commits)}")
-    print(f"all_commits: {len(all_commits)}")
+    print(f"all_commits: {len(all_records)}")
 
     print(f"set_files_commits: {len(set_files_commits)}")
     print(f"set_all_commits: {len(set_all_commits)}")
@@ -21,47 +31,34 @@ if __name__ == '__main__':
     same_commits = set_files_commits & set_all_commits
     print(f"same_commits: {len(same_commits)}")
     for commit in same_commits:
-        msg = get_commit_message(repo_path, commit)
-        files = get_commit_files(repo_path, commit)
-        # msg 是否包含 "Merge" 字符串
-        commit_content = {
-            "commit": commit,
-            "files": files,
-            "msg": msg
-        }
-        print(commit_content)
+        print(format_commit_content(all_records[commit]))
 
     different_commits = set_all_commits - set_files_commits
     print(f"different_commits: {len(different_commits)}")
-    none_commits = []
+    # 按父提交数分类：合并提交、没有修改文件的提交、其他提交
     merge_commits = []
+    empty_commits = []
     un_match_commits = []
     for commit in different_commits:
-        msg = get_commit_message(repo_path, commit)
-        files = get_commit_files(repo_path, commit)
-        # msg 是否包含 "Merge" 字符串
-        commit_content = {
-            "commit": commit,
-            "files": files,
-            "msg": msg
-        }
-        if msg is None:
-            none_commits.append(commit_content)
-        elif "Merge" in msg:
+        record = all_records[commit]
+        commit_content = format_commit_content(record)
+        if record.is_merge:
             merge_commits.append(commit_content)
+        elif not record.files:
+            empty_commits.append(commit_content)
         else:
             un_match_commits.append(commit_content)
 
     print(f"total different_commits: {len(different_commits)}")
-    print(f"none_commits: {len(none_commits)}")
     print(f"merge_commits: {len(merge_commits)}")
+    print(f"empty_commits: {len(empty_commits)}")
     print(f"un_match_commits: {len(un_match_commits)}")
-    print("none_commits:")
-    for none_commit in none_commits:
-        print(none_commit)
     print("merge_commits:")
     for merge_commit in merge_commits:
         print(merge_commit)
+    print("empty_commits:")
+    for empty_commit in empty_commits:
+        print(empty_commit)
     print("un_match_commits:")
     for un_match_commit in un_match_commits:
-        print(un_match_commit)
\ No newline at end of file
+        print(un_match_commit)